@@ -0,0 +1,377 @@
+"""Benchmark suite with stored baselines.
+
+    python benchmarks/run.py                    compare against baseline.json
+    python benchmarks/run.py --update-baseline  record new baselines
+    python benchmarks/run.py -k ai              run only matching benchmarks
+
+Each benchmark reports seconds per operation (the best of several
+repeats).  A benchmark that is slower than its baseline by more than
+--threshold (25% by default) is a regression and makes the run exit with
+status 1; benchmarks under 10 us per operation, which swing more than
+that from run to run, are allowed 50%.  Qt runs on the offscreen platform and the stats and record
+files go to a temporary home directory, so this works on a headless box
+and never touches real data.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+
+# Must be set before Qt and the game modules are imported
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+os.environ['HOME'] = tempfile.mkdtemp(prefix='ttt-bench-')
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+BENCHMARKS = []
+
+
+# Benchmarks this short swing by more than the default threshold from run to run
+NOISY_SECONDS = 1e-5
+NOISY_THRESHOLD = 0.5
+
+
+def benchmark(name, repeat=5):
+    """Register a function returning (operations, setup-free callable)"""
+    def register(function):
+        BENCHMARKS.append((name, repeat, function))
+        return function
+    return register
+
+
+def measure(run, operations, repeat):
+    """Best seconds per operation over `repeat` calls of `run`, after a warm-up"""
+    run()
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        elapsed = (time.perf_counter() - start) / operations
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+# Scripted games that end in a win, one per board size
+BOARDS = {
+    '3x3': (3, 3, 3),
+    '7x7k4': (7, 7, 4),
+    '15x15k5': (15, 15, 5),
+    '19x19k5': (19, 19, 5),
+}
+
+
+def scripted_moves(rows, cols, k):
+    """Moves where X builds a row along the top while O plays the bottom"""
+    moves = []
+    for i in range(k):
+        moves.append((0, i))
+        if i < k - 1:
+            moves.append((rows - 1, cols - 1 - i))
+    return moves
+
+
+def register_rules(label, size):
+    from game.game_logic import GameLogic
+    moves = scripted_moves(*size)
+
+    @benchmark(f'rules.make_move.{label}', repeat=15)
+    def make_move():
+        game = GameLogic(*size)
+
+        def run():
+            for _ in range(1000):
+                game.reset()
+                for row, col in moves:
+                    game.make_move(row, col)
+        return 1000 * len(moves), run
+
+    @benchmark(f'rules.check_winner.{label}', repeat=15)
+    def check_winner():
+        game = GameLogic(*size)
+        for row, col in moves:
+            game.make_move(row, col)
+        # The full check through the winning move, as make_move does it
+        find_line, mask, cell = game.shape.find_line, game.masks[0], game.last_move
+
+        def run():
+            for _ in range(20000):
+                find_line(mask, cell)
+                game.is_board_full()
+        return 20000, run
+
+
+for _label, _size in BOARDS.items():
+    register_rules(_label, _size)
+
+
+@benchmark('ai.alphabeta.3x3_solve', repeat=3)
+def alphabeta_solve():
+    from game.ai import AlphaBetaEngine
+    from game.game_logic import GameLogic
+
+    def run():
+        AlphaBetaEngine().choose_move(GameLogic())
+    return 1, run
+
+
+@benchmark('ai.alphabeta.3x3_nodes', repeat=3)
+def alphabeta_nodes():
+    from game.ai import AlphaBetaEngine
+    from game.game_logic import GameLogic
+    engine = AlphaBetaEngine()
+    engine.choose_move(GameLogic())
+    nodes = engine.nodes
+
+    def run():
+        AlphaBetaEngine().choose_move(GameLogic())
+    # Seconds per node; nodes per second is the inverse
+    return nodes, run
+
+
+@benchmark('ai.alphabeta.4x4_depth4', repeat=3)
+def alphabeta_4x4():
+    from game.ai import AlphaBetaEngine
+    from game.game_logic import GameLogic
+
+    def run():
+        AlphaBetaEngine(max_depth=4).choose_move(GameLogic(4, 4, 4))
+    return 1, run
+
+
+@benchmark('ai.table.3x3_move')
+def table_move():
+    from game.game_logic import GameLogic
+    from game.solved_table import TableEngine
+    engine = TableEngine()
+    game = GameLogic()
+    game.make_move(0, 0)
+
+    def run():
+        for _ in range(5000):
+            engine.choose_move(game)
+    return 5000, run
+
+
+@benchmark('ai.mcts.9x9_playout')
+def mcts_playouts():
+    from game.game_logic import GameLogic
+    from game.mcts import MCTSEngine
+
+    def run():
+        MCTSEngine(time_limit=None, playouts=300, seed=1).choose_move(GameLogic(9, 9, 5))
+    return 300, run
+
+
+@benchmark('ai.ultimate.nodes', repeat=3)
+def ultimate_nodes():
+    from game.ultimate import UltimateEngine, UltimateGame
+    game = UltimateGame()
+    for move in [(4, 4), (3, 3), (0, 0), (1, 1)]:
+        game.make_move(*move)
+    engine = UltimateEngine(time_limit=None, max_depth=5)
+    engine.choose_move(game)
+    nodes = engine.nodes
+
+    def run():
+        UltimateEngine(time_limit=None, max_depth=5).choose_move(game)
+    # Seconds per position; 1e-5 is the 100k positions per second target
+    return nodes, run
+
+
+@benchmark('rules.make_move.ultimate', repeat=15)
+def ultimate_make_move():
+    from game.ultimate import UltimateGame
+    game = UltimateGame()
+    moves = [(4, 4), (3, 3), (0, 0), (1, 1), (3, 4), (0, 3), (2, 2), (8, 8)]
+
+    def run():
+        for _ in range(1000):
+            game.reset()
+            for row, col in moves:
+                game.make_move(row, col)
+    return 1000 * len(moves), run
+
+
+@benchmark('ai.threats.15x15_vcf', repeat=3)
+def threat_search():
+    from game.game_logic import GameLogic
+    from game.threats import LineIndex, ThreatSearch
+    # X to move wins with four fours in a row
+    game = GameLogic(15, 15, 5)
+    for cell in [99, 95, 156, 65, 140, 142, 125, 68, 159, 81, 114, 83, 110, 158, 145, 69,
+                 128, 109, 82, 70]:
+        game.make_move(*divmod(cell, 15))
+
+    def run():
+        for _ in range(10):
+            ThreatSearch(LineIndex(game.shape, game.masks)).find_win(game.turn)
+    # Seconds per forced win found, from building the index to the first move
+    return 10, run
+
+
+@benchmark('ai.annotate.3x3_game', repeat=3)
+def annotate_games():
+    import random
+    from game.annotate import Solver, annotate_game
+    from game.game_logic import GameLogic, board_shape
+    rng = random.Random(0)
+    games = []
+    for _ in range(2000):
+        game = GameLogic()
+        while not game.is_over():
+            game.make_move(*rng.choice(game.legal_moves()))
+        games.append(list(game.history))
+
+    def run():
+        # A fresh solver each time, so solving the positions is included
+        solver = Solver(board_shape(3, 3, 3))
+        for cells in games:
+            annotate_game(solver, cells)
+    return len(games), run
+
+
+_application = []
+
+
+def qt_application():
+    """The QApplication, kept alive for the whole run"""
+    from PyQt6.QtWidgets import QApplication
+    from gui.theme import apply_stylesheet
+    if not _application:
+        _application.append(QApplication.instance() or QApplication([]))
+        apply_stylesheet(_application[0])
+    return _application[0]
+
+
+@benchmark('gui.player_dialog.construct')
+def dialog_construct():
+    qt_application()
+    from gui.player_dialog import PlayerNameDialog
+
+    def run():
+        for _ in range(10):
+            PlayerNameDialog().deleteLater()
+    return 10, run
+
+
+def quiet_window():
+    from gui.player_dialog import PlayerNameDialog
+    from gui.main_window import TicTacToeWindow
+    # Skip the modal name dialog; the window falls back to default names
+    PlayerNameDialog.exec = lambda self: False
+    return TicTacToeWindow
+
+
+@benchmark('gui.main_window.construct')
+def window_construct():
+    import shutil
+    from game.journal import DEFAULT_DIR
+    app = qt_application()
+    window_class = quiet_window()
+
+    def run():
+        for _ in range(5):
+            # Start each window fresh rather than resuming the last one's session
+            shutil.rmtree(DEFAULT_DIR, ignore_errors=True)
+            window = window_class()
+            window.close()
+            window.deleteLater()
+        app.processEvents()
+    return 5, run
+
+
+@benchmark('gui.main_window.play_again')
+def window_play_again():
+    app = qt_application()
+    window = quiet_window()()
+    window.show()
+
+    def run():
+        for _ in range(50):
+            for row, col in scripted_moves(3, 3, 3):
+                window.make_move(row, col)
+            window.play_again()
+        app.processEvents()
+    return 50, run
+
+
+@benchmark('gui.game_board.repaint')
+def board_repaint():
+    qt_application()
+    from game.game_logic import GameLogic
+    from gui.game_board import GameBoard
+    game = GameLogic(100, 100, 5)
+    for row, col in scripted_moves(100, 100, 5):
+        game.make_move(row, col)
+    board = GameBoard(game)
+    board.resize(490, 490)
+    board.show()
+
+    def run():
+        # One full repaint, then the single-cell repaints that follow moves
+        board.repaint()
+        for cell in range(100):
+            board.repaint(board.cell_rect(*divmod(cell * 97 % 10000, 100)))
+    return 101, run
+
+
+def load_baseline():
+    if not os.path.exists(BASELINE_PATH):
+        return {}
+    with open(BASELINE_PATH) as handle:
+        return json.load(handle)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the benchmark suite")
+    parser.add_argument('-k', dest='pattern', default='', help="only run benchmarks containing this")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="allowed slowdown against the baseline (0.25 = 25%%)")
+    parser.add_argument('--update-baseline', action='store_true')
+    args = parser.parse_args(argv)
+
+    baseline = load_baseline()
+    results = {}
+    regressions = []
+    for name, repeat, function in BENCHMARKS:
+        if args.pattern not in name:
+            continue
+        try:
+            operations, run = function()
+        except ImportError as error:
+            print(f"{name:36s} skipped ({error})")
+            continue
+        seconds = measure(run, operations, repeat)
+        results[name] = seconds
+        line = f"{name:36s} {seconds * 1e6:12.3f} us/op"
+        if name in baseline:
+            change = seconds / baseline[name] - 1
+            line += f"  {change:+7.1%}"
+            threshold = args.threshold
+            if baseline[name] < NOISY_SECONDS:
+                threshold = max(threshold, NOISY_THRESHOLD)
+            if change > threshold:
+                line += "  REGRESSION"
+                regressions.append(name)
+        print(line)
+
+    if args.update_baseline:
+        baseline.update(results)
+        with open(BASELINE_PATH, 'w') as handle:
+            json.dump(baseline, handle, indent=2, sort_keys=True)
+            handle.write('\n')
+        print(f"Baseline written to {BASELINE_PATH}")
+        return 0
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
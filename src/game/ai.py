@@ -0,0 +1,415 @@
+"""Computer opponent: negamax with alpha-beta pruning and a transposition table.
+
+Positions are searched from the side to move's point of view as the pair
+(own marks, opponent marks).  Table entries are keyed on the smallest image
+of that pair under the board's symmetries (the 8 rotations and reflections
+of a square, or the 4 flips of a rectangle), so equivalent positions are
+searched once.
+"""
+
+import time
+
+WIN_SCORE = 1000
+INFINITY = 1 << 30
+
+EXACT, LOWER, UPPER = 0, 1, 2
+
+
+class SearchAborted(Exception):
+    """Raised inside the search when its time budget runs out or it is cancelled"""
+
+
+class Symmetries:
+    """Cell permutations of a board's symmetry group, as byte lookup tables"""
+
+    def __init__(self, shape):
+        rows, cols = shape.rows, shape.cols
+        maps = [
+            lambda r, c: (r, c),
+            lambda r, c: (r, cols - 1 - c),
+            lambda r, c: (rows - 1 - r, c),
+            lambda r, c: (rows - 1 - r, cols - 1 - c),
+        ]
+        if rows == cols:
+            maps += [
+                lambda r, c: (c, r),
+                lambda r, c: (c, rows - 1 - r),
+                lambda r, c: (cols - 1 - c, r),
+                lambda r, c: (cols - 1 - c, rows - 1 - r),
+            ]
+        self.cells = shape.cells
+        self.perms = []
+        for transform in maps:
+            perm = []
+            for cell in range(shape.cells):
+                row, col = transform(*divmod(cell, cols))
+                perm.append(row * cols + col)
+            self.perms.append(tuple(perm))
+
+        # tables[t][chunk][byte] is the image of `byte` placed at bits 8*chunk
+        chunks = (shape.cells + 7) // 8
+        self.tables = []
+        for perm in self.perms:
+            chunk_tables = []
+            for chunk in range(chunks):
+                # Each entry is the entry without its lowest bit plus that bit's image
+                table = [0]
+                for byte in range(1, 256):
+                    low = (byte & -byte).bit_length() - 1
+                    cell = chunk * 8 + low
+                    image = 1 << perm[cell] if cell < shape.cells else 0
+                    table.append(table[byte & (byte - 1)] | image)
+                chunk_tables.append(tuple(table))
+            self.tables.append(tuple(chunk_tables))
+
+    def transform(self, mask, index):
+        """Apply symmetry number `index` to a bitmask"""
+        image = 0
+        for table in self.tables[index]:
+            image |= table[mask & 255]
+            mask >>= 8
+        return image
+
+    def canonical(self, me, opp):
+        """Return the smallest key of (me, opp) over all symmetries"""
+        cells = self.cells
+        best = -1
+        for chunk_tables in self.tables:
+            key = 0
+            a, b = me, opp
+            for table in chunk_tables:
+                key |= table[a & 255] << cells | table[b & 255]
+                a >>= 8
+                b >>= 8
+            if best < 0 or key < best:
+                best = key
+        return best
+
+
+class AlphaBetaEngine:
+    """Negamax player; exact on small boards, depth or time limited on larger ones
+
+    With no limits the game is searched to the end.  ``max_depth`` caps the
+    number of plies and ``time_limit`` (seconds) switches to iterative
+    deepening that returns the best move of the last finished iteration.
+    The transposition table is kept between moves and games.
+    """
+
+    name = "Alpha-beta"
+
+    def __init__(self, max_depth=None, time_limit=None):
+        self.max_depth = max_depth
+        self.time_limit = time_limit
+        self.table = {}
+        self.shape = None
+        self.nodes = 0
+        self.cancel = None
+
+    def _prepare(self, shape):
+        if shape is self.shape:
+            return
+        self.shape = shape
+        self.table = {}
+        self.symmetries = Symmetries(shape)
+        # Cells on the most lines first, so the centre is tried before the edges
+        lines_through = [sum(1 for line in shape.line_masks if line >> cell & 1)
+                         for cell in range(shape.cells)]
+        self.order = tuple(sorted(range(shape.cells), key=lambda cell: -lines_through[cell]))
+        # Score for an open line holding n of one side's marks, used when the
+        # search stops before the end of the game
+        self.line_weights = tuple(min(4 ** n, WIN_SCORE // 4) if n else 0 for n in range(shape.k + 1))
+
+    def choose_move(self, game, cancel=None):
+        """Return the (row, col) the engine would play in `game`
+
+        `cancel` is an optional threading.Event; setting it stops the search
+        within a few milliseconds.
+        """
+        self._prepare(game.shape)
+        moves = self.search(game.masks[game.turn], game.masks[game.turn ^ 1], cancel)
+        return divmod(moves[0], game.cols) if moves else None
+
+    def search(self, me, opp, cancel=None):
+        """Return every legal cell ordered best first for the side owning `me`"""
+        self.nodes = 0
+        self.cancel = cancel
+        empties = self.shape.cells - (me | opp).bit_count()
+        depth_limit = min(self.max_depth or empties, empties)
+        self.deadline = None
+        if self.time_limit is not None:
+            self.deadline = time.monotonic() + self.time_limit
+            depths = range(1, depth_limit + 1)
+        else:
+            depths = (depth_limit,)
+
+        # Fall back to the static move order if not even one ply finishes
+        free = ~(me | opp) & self.shape.full_mask
+        ranked = [cell for cell in self.order if free >> cell & 1]
+        self.last_score = 0
+        for depth in depths:
+            try:
+                ranked = self._search_root(me, opp, depth)
+            except SearchAborted:
+                break
+            # A proven result cannot change with more depth
+            if abs(self.last_score) >= WIN_SCORE:
+                break
+        return ranked
+
+    def score_moves(self, me, opp, depth, cancel=None):
+        """Return {cell: score} for every move of the side owning `me`, searched `depth` plies
+
+        Unlike search(), each move gets a full window, so every score is exact
+        for that depth rather than a bound.  The transposition table is
+        shared with search() and kept between calls, so deepening one ply at
+        a time, or moving on to the next position, reuses the earlier work.
+        Raises SearchAborted if `cancel` is set.
+        """
+        self.cancel = cancel
+        self.deadline = None
+        free = ~(me | opp) & self.shape.full_mask
+        empties = free.bit_count()
+        scores = {}
+        for cell in self.order:
+            bit = 1 << cell
+            if not free & bit:
+                continue
+            mine = me | bit
+            if self.shape.find_line(mine, cell):
+                scores[cell] = WIN_SCORE + empties
+            else:
+                scores[cell] = -self._negamax(opp, mine, depth - 1, -INFINITY, INFINITY)
+        return scores
+
+    def _search_root(self, me, opp, depth):
+        free = ~(me | opp) & self.shape.full_mask
+        empties = free.bit_count()
+        alpha, beta = -INFINITY, INFINITY
+        scored = []
+        for cell in self.order:
+            bit = 1 << cell
+            if not free & bit:
+                continue
+            mine = me | bit
+            if self.shape.find_line(mine, cell):
+                value = WIN_SCORE + empties
+            else:
+                value = -self._negamax(opp, mine, depth - 1, -beta, -alpha)
+            scored.append((value, cell))
+            if value > alpha:
+                alpha = value
+        # Moves after the best are only bounded, but they still rank below it
+        scored.sort(key=lambda item: -item[0])
+        self.last_score = scored[0][0] if scored else 0
+        return [cell for _, cell in scored]
+
+    def _negamax(self, me, opp, depth, alpha, beta):
+        self.nodes += 1
+        if not self.nodes & 1023:
+            if self.cancel is not None and self.cancel.is_set():
+                raise SearchAborted()
+            if self.deadline is not None and time.monotonic() > self.deadline:
+                raise SearchAborted()
+
+        shape = self.shape
+        free = ~(me | opp) & shape.full_mask
+        if not free:
+            return 0
+        empties = free.bit_count()
+        depth = min(depth, empties)
+        if depth == 0:
+            return self._evaluate(me, opp)
+
+        key = self.symmetries.canonical(me, opp)
+        entry = self.table.get(key)
+        if entry is not None and entry[0] >= depth:
+            _, value, flag = entry
+            if flag == EXACT:
+                return value
+            if flag == LOWER:
+                alpha = max(alpha, value)
+            else:
+                beta = min(beta, value)
+            if alpha >= beta:
+                return value
+
+        alpha_orig = alpha
+        best = -INFINITY
+        for cell in self.order:
+            bit = 1 << cell
+            if not free & bit:
+                continue
+            mine = me | bit
+            if shape.find_line(mine, cell):
+                value = WIN_SCORE + empties
+            else:
+                value = -self._negamax(opp, mine, depth - 1, -beta, -alpha)
+            if value > best:
+                best = value
+                if value > alpha:
+                    alpha = value
+                    if alpha >= beta:
+                        break
+
+        if best <= alpha_orig:
+            flag = UPPER
+        elif best >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.table[key] = (depth, best, flag)
+        return best
+
+    def _evaluate(self, me, opp):
+        """Score a position the search did not finish by its open lines"""
+        weights = self.line_weights
+        score = 0
+        for line in self.shape.line_masks:
+            if not line & opp:
+                score += weights[(line & me).bit_count()]
+            elif not line & me:
+                score -= weights[(line & opp).bit_count()]
+        return max(-WIN_SCORE + 1, min(WIN_SCORE - 1, score))
+
+
+class RandomEngine:
+    """Plays a uniformly random legal move"""
+
+    name = "Random"
+
+    def __init__(self, seed=None):
+        # Imported here so loading the engines stays cheap for worker processes
+        import random
+        self.random = random.Random(seed)
+
+    def choose_move(self, game, cancel=None):
+        moves = game.legal_moves()
+        return self.random.choice(moves) if moves else None
+
+
+class HeuristicEngine:
+    """One-ply player: wins if it can, blocks if it must, else takes the strongest open cell
+
+    A cell's strength is the sum over the lines through it that the opponent
+    has not entered of 4 ** (own marks on the line).
+    """
+
+    name = "Heuristic"
+
+    def __init__(self):
+        self.shape = None
+
+    def _prepare(self, shape):
+        if shape is self.shape:
+            return
+        self.shape = shape
+        self.lines_by_cell = [[] for _ in range(shape.cells)]
+        for line in shape.line_masks:
+            for cell in range(shape.cells):
+                if line >> cell & 1:
+                    self.lines_by_cell[cell].append(line)
+
+    def choose_move(self, game, cancel=None):
+        shape = game.shape
+        self._prepare(shape)
+        me, opp = game.masks[game.turn], game.masks[game.turn ^ 1]
+        free = ~(me | opp) & shape.full_mask
+        cells = [cell for cell in range(shape.cells) if free >> cell & 1]
+        if not cells:
+            return None
+        for cell in cells:
+            if shape.find_line(me | 1 << cell, cell):
+                return divmod(cell, game.cols)
+        for cell in cells:
+            if shape.find_line(opp | 1 << cell, cell):
+                return divmod(cell, game.cols)
+        best = max(cells, key=lambda cell: sum(4 ** (line & me).bit_count()
+                                               for line in self.lines_by_cell[cell]
+                                               if not line & opp))
+        return divmod(best, game.cols)
+
+
+def make_engine(spec, seed=None):
+    """Build the engine described by a spec such as 'alphabeta:3' or 'mcts:0.5s'
+
+    Specs are random, heuristic, alphabeta (optionally :plies or :seconds s),
+    mcts:playouts or mcts:seconds s, table (the solved 3x3 table), threats
+    (threat-space search, optionally :seconds s) for k in a row on large
+    boards, and ultimate (optionally :plies or :seconds s) for ultimate games.
+    """
+    kind, _, budget = spec.partition(':')
+    limits = {}
+    if budget:
+        try:
+            if budget.endswith('s'):
+                limits['time_limit'] = float(budget[:-1])
+            else:
+                limits['count'] = int(budget)
+        except ValueError:
+            raise ValueError(f"bad budget in engine spec {spec!r}") from None
+    if kind == 'random' and not budget:
+        return RandomEngine(seed)
+    if kind == 'heuristic' and not budget:
+        return HeuristicEngine()
+    if kind == 'alphabeta':
+        return AlphaBetaEngine(max_depth=limits.get('count'), time_limit=limits.get('time_limit'))
+    if kind == 'mcts' and budget:
+        from .mcts import MCTSEngine
+        return MCTSEngine(time_limit=limits.get('time_limit'), playouts=limits.get('count'),
+                          seed=seed)
+    if kind == 'threats' and 'count' not in limits:
+        from .threats import ThreatEngine
+        return ThreatEngine(time_limit=limits.get('time_limit', 1.0))
+    if kind == 'ultimate':
+        from .ultimate import UltimateEngine
+        return UltimateEngine(time_limit=limits.get('time_limit', None if 'count' in limits else 1.0),
+                              max_depth=limits.get('count'))
+    if kind == 'table' and not budget:
+        from .solved_table import TableEngine
+        return TableEngine()
+    raise ValueError(f"unknown engine spec {spec!r}")
+
+
+def solved_engine_for(game):
+    """Return a perfect engine that answers from a precomputed table, or None
+
+    3x3 uses the bundled solved table; other boards of up to 16 cells use a
+    tablebase if one has been generated with ``python -m game.tablebase``.
+    """
+    # Imported here because the table modules build on this one
+    if (game.rows, game.cols, game.k) == (3, 3, 3):
+        from .solved_table import TableEngine, load_table
+        try:
+            return TableEngine(load_table())
+        except (OSError, ValueError):
+            pass
+    from .tablebase import MAX_CELLS, TablebaseEngine, find_tablebase
+    if game.shape.cells <= MAX_CELLS:
+        tablebase = find_tablebase(game.rows, game.cols, game.k)
+        if tablebase is not None:
+            return TablebaseEngine(tablebase)
+    return None
+
+
+def engine_for(game):
+    """Return an engine suited to the game's board: exact where a table exists, time limited beyond
+
+    Alpha-beta is used up to 4x4; larger boards get threat-space search when
+    it takes five or more in a row and a Monte Carlo search otherwise, and
+    ultimate games their own alpha-beta over nested bitboards.
+    """
+    from .ultimate import ULTIMATE_SIZE, UltimateEngine
+    if (game.rows, game.cols, game.k) == ULTIMATE_SIZE:
+        return UltimateEngine()
+    engine = solved_engine_for(game)
+    if engine is not None:
+        return engine
+    if game.shape.cells <= 9:
+        return AlphaBetaEngine()
+    if game.shape.cells <= 16:
+        return AlphaBetaEngine(time_limit=1.0)
+    if game.k >= 5:
+        from .threats import ThreatEngine
+        return ThreatEngine()
+    from .mcts import MCTSEngine
+    return MCTSEngine(time_limit=1.0)
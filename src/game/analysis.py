@@ -0,0 +1,95 @@
+"""Per-cell evaluations of a position, for the analysis heatmap.
+
+Analyzer.analyze yields a series of refinements, each mapping every cell
+it has looked at to a value from -1 (the move loses) through 0 (draw) to 1
+(the move wins) for the side to play:
+
+* boards with a solved table or tablebase are answered exactly at once;
+* boards of up to 16 cells are searched with alpha-beta one ply deeper
+  each time, scoring every move with a full window;
+* larger boards grow a Monte Carlo tree in slices and report each move's
+  win rate.
+
+One Analyzer is meant to follow one game: its transposition table and
+search tree carry over from move to move, so each new position starts
+from the work already done on the last.
+"""
+
+import math
+
+from .ai import WIN_SCORE, AlphaBetaEngine, SearchAborted, solved_engine_for
+from .mcts import MCTSEngine
+from .solved_table import DRAW
+
+# Largest board searched with alpha-beta; larger ones use Monte Carlo
+ALPHABETA_CELLS = 16
+
+# Heuristic score that maps to a value of about 0.76
+EVAL_SCALE = 64
+
+# Seconds of Monte Carlo search between refinements, and when to stop
+MCTS_SLICE = 0.25
+MCTS_PLAYOUTS = 200_000
+
+
+class Analyzer:
+    """Scores every move of a position, yielding better estimates as it goes"""
+
+    def __init__(self, seed=None):
+        self.alphabeta = AlphaBetaEngine()
+        self.mcts = MCTSEngine(time_limit=MCTS_SLICE, seed=seed)
+        self.exact = {}
+
+    def analyze(self, game, cancel=None):
+        """Yield (label, {cell: value}) refinements until exact, out of budget or cancelled"""
+        if game.is_over():
+            return
+        size = (game.rows, game.cols, game.k)
+        if size not in self.exact:
+            self.exact[size] = solved_engine_for(game)
+        exact = self.exact[size]
+        if exact is not None:
+            yield "exact", {cell: outcome - DRAW for cell, outcome in exact.move_values(game).items()}
+        elif game.shape.cells <= ALPHABETA_CELLS:
+            yield from self._deepen(game, cancel)
+        else:
+            yield from self._ponder(game, cancel)
+
+    def _deepen(self, game, cancel):
+        engine = self.alphabeta
+        engine._prepare(game.shape)
+        me, opp = game.masks[game.turn], game.masks[game.turn ^ 1]
+        empties = game.shape.cells - game.move_count
+        for depth in range(1, empties + 1):
+            try:
+                scores = engine.score_moves(me, opp, depth, cancel)
+            except SearchAborted:
+                return
+            proven = all(abs(score) >= WIN_SCORE for score in scores.values())
+            done = depth == empties or proven
+            yield ("exact" if done else f"depth {depth}"), {
+                cell: score_value(score, done) for cell, score in scores.items()}
+            if done:
+                return
+
+    def _ponder(self, game, cancel):
+        engine = self.mcts
+        while cancel is None or not cancel.is_set():
+            stats = engine.ponder(game, cancel)
+            if cancel is not None and cancel.is_set():
+                return
+            playouts = sum(visits for visits, _ in stats.values())
+            # value is the mover's total reward, 1 for a win and 0.5 for a draw
+            yield f"{playouts:,} playouts", {
+                cell: 2 * value / visits - 1 for cell, (visits, value) in stats.items() if visits}
+            if playouts >= MCTS_PLAYOUTS:
+                return
+
+
+def score_value(score, exact=False):
+    """Map an alpha-beta score to -1..1; only proven results reach the ends"""
+    if abs(score) >= WIN_SCORE:
+        return 1.0 if score > 0 else -1.0
+    if exact:
+        return 0.0
+    return max(-0.99, min(0.99, math.tanh(score / EVAL_SCALE)))
@@ -0,0 +1,433 @@
+"""Annotate logs of played games with the mistakes in them.
+
+A log has one game per line: X's name, O's name and the cells played
+(row-major indices, separated by spaces), separated by tabs.  Blank lines
+and lines starting with # are skipped.
+
+    Ann	Bob	4 1 0 8 6 3 2
+
+Every move is compared with the best one by the game-theoretic value
+(LOSS, DRAW or WIN for the side to move) of the position it leads to.  A
+move worth less than the best is a mistake, and a mistake that turns a
+position that was not lost into a lost one is a blunder.  The first
+mistake of a game is where its theoretical result was lost.
+
+Positions are valued by the board's tablebase when one has been generated
+and otherwise by an exact search, memoized in each worker and in a cache
+file that every worker maps: slots of one 64-bit word holding a canonical
+position with its value, so they are read and written without locks (a
+racing write can only lose an entry, which is then solved again).  Kept
+with --cache, the file also saves the next run the work.
+
+The log is split into byte ranges that a process pool annotates in
+parallel.  Results are per-player totals, whose wins, losses and draws
+are those PlayerStats keeps, and optionally a JSON-lines file with the
+mistakes of every game that has any.
+
+    python -m game.annotate games.log --summary players.json --annotations mistakes.jsonl
+"""
+
+import argparse
+import json
+import os
+import struct
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .ai import Symmetries
+from .game_logic import board_shape
+from .solved_table import DRAW, LOSS, WIN
+from .stats import PlayerStats
+
+MAGIC = b'TTTMEMO1'
+HEADER = struct.Struct('<8sBBB5xQ')
+
+# A key is two cells-bit masks above a 2-bit value, all in one 64-bit word
+MAX_CELLS = 31
+
+CACHE_SLOTS = 1 << 22
+# Slots tried after a key's home slot before it is given up on
+PROBES = 8
+HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+
+# Positions a worker remembers itself before it starts over
+MEMO_LIMIT = 1 << 21
+
+# Bytes of log per job
+CHUNK_BYTES = 1 << 20
+
+FIELDS = ('games', 'wins', 'losses', 'draws', 'moves', 'mistakes', 'blunders', 'results_lost')
+
+
+class SharedCache:
+    """Position values shared by every worker through one memory-mapped file"""
+
+    def __init__(self, path, size, slots=CACHE_SLOTS):
+        import numpy as np
+
+        if slots & (slots - 1):
+            raise ValueError("the cache needs a power of two slots")
+        if not os.path.exists(path) or not os.path.getsize(path):
+            with open(path, 'wb') as handle:
+                handle.write(HEADER.pack(MAGIC, *size, slots))
+                handle.truncate(HEADER.size + 8 * slots)
+        with open(path, 'rb') as handle:
+            magic, rows, cols, k, slots = HEADER.unpack(handle.read(HEADER.size))
+        if magic != MAGIC or (rows, cols, k) != tuple(size):
+            raise ValueError(f"{path} is not a position cache for a {size[0]}x{size[1]}k{size[2]} board")
+        self.table = np.memmap(path, dtype='<u8', mode='r+', offset=HEADER.size, shape=(slots,))
+        self.mask = slots - 1
+        self.shift = 64 - (slots.bit_length() - 1)
+
+    def _home(self, key):
+        return ((key * HASH_MULTIPLIER) & 0xFFFFFFFFFFFFFFFF) >> self.shift
+
+    def get(self, key):
+        """The value stored for a canonical key, or 0"""
+        table, slot = self.table, self._home(key)
+        for _ in range(PROBES):
+            entry = int(table[slot])
+            if not entry:
+                return 0
+            if entry >> 2 == key:
+                return entry & 3
+            slot = (slot + 1) & self.mask
+        return 0
+
+    def put(self, key, value):
+        table, home = self.table, self._home(key)
+        slot = home
+        for _ in range(PROBES):
+            entry = int(table[slot])
+            if not entry or entry >> 2 == key:
+                break
+            slot = (slot + 1) & self.mask
+        else:
+            # Every slot is taken; the newest position replaces the oldest
+            slot = home
+        table[slot] = key << 2 | value
+
+
+class Solver:
+    """Exact value of positions on one board for the side to move"""
+
+    def __init__(self, shape, cache=None):
+        if shape.cells > MAX_CELLS:
+            raise ValueError(f"positions can only be solved on boards of up to {MAX_CELLS} cells")
+        from .tablebase import MAX_CELLS as TABLEBASE_CELLS, find_tablebase
+        self.shape = shape
+        self.symmetries = Symmetries(shape)
+        self.cache = cache
+        self.tablebase = None
+        if shape.cells <= TABLEBASE_CELLS:
+            self.tablebase = find_tablebase(shape.rows, shape.cols, shape.k)
+        # The k-cell windows through each cell, so a move's win check only tries those
+        self.lines_at = tuple(tuple(line for line in shape.line_masks if line >> cell & 1)
+                              for cell in range(shape.cells))
+        self.memo = {}
+        self.choices = {}
+        self.searched = 0
+
+    def value(self, me, opp):
+        """LOSS, DRAW or WIN for the side owning `me`, which is to move and has not lost yet"""
+        raw = me << self.shape.cells | opp
+        value = self.memo.get(raw)
+        if value:
+            return value
+        if self.tablebase is not None:
+            # X is to move when both sides have as many marks
+            if bin(me).count('1') == bin(opp).count('1'):
+                value = self.tablebase.value(me, opp)
+            else:
+                value = self.tablebase.value(opp, me)
+        else:
+            key = self.symmetries.canonical(me, opp)
+            value = self.cache.get(key) if self.cache is not None else 0
+            if not value:
+                value = self._search(me, opp)
+                if self.cache is not None:
+                    self.cache.put(key, value)
+        if len(self.memo) >= MEMO_LIMIT:
+            self.memo.clear()
+        self.memo[raw] = value
+        return value
+
+    def _search(self, me, opp):
+        self.searched += 1
+        shape = self.shape
+        free = ~(me | opp) & shape.full_mask
+        if not free:
+            return DRAW
+        cells = []
+        while free:
+            bit = free & -free
+            free ^= bit
+            cell = bit.bit_length() - 1
+            if self._wins(me | bit, cell):
+                return WIN
+            cells.append(bit)
+        best = LOSS
+        for bit in cells:
+            value = 4 - self.value(opp, me | bit)
+            if value > best:
+                best = value
+                if best == WIN:
+                    break
+        return best
+
+    def _wins(self, mask, cell):
+        for line in self.lines_at[cell]:
+            if mask & line == line:
+                return True
+        return False
+
+    def move_values(self, me, opp):
+        """{cell: value of playing it} for the side owning `me`"""
+        return self.choice(me, opp)[0]
+
+    def choice(self, me, opp):
+        """(move values, best value, a best cell, mask of cells that win at once) for `me`
+
+        Kept per position, since logs repeat the same positions over and
+        over; among the best cells one that wins at once is named.
+        """
+        raw = me << self.shape.cells | opp
+        choice = self.choices.get(raw)
+        if choice is not None:
+            return choice
+        shape = self.shape
+        values = {}
+        best, best_cell, wins = 0, None, 0
+        free = ~(me | opp) & shape.full_mask
+        while free:
+            bit = free & -free
+            free ^= bit
+            cell = bit.bit_length() - 1
+            if self._wins(me | bit, cell):
+                value = WIN
+                if not wins:
+                    best, best_cell = WIN, cell
+                wins |= bit
+            else:
+                value = 4 - self.value(opp, me | bit)
+                if value > best:
+                    best, best_cell = value, cell
+            values[cell] = value
+        if len(self.choices) >= MEMO_LIMIT:
+            self.choices.clear()
+        choice = self.choices[raw] = (values, best, best_cell, wins)
+        return choice
+
+
+def annotate_game(solver, cells):
+    """Replay a game; return (winner or None, finished, mistakes), or None if a move is illegal
+
+    Each mistake is (ply, cell played, best cell, value of the best move,
+    value of the move played), values being LOSS, DRAW or WIN for the
+    side that moved.
+    """
+    shape = solver.shape
+    masks = [0, 0]
+    mistakes = []
+    winner = None
+    for ply, cell in enumerate(cells):
+        turn = ply & 1
+        if winner is not None or not 0 <= cell < shape.cells or (masks[0] | masks[1]) >> cell & 1:
+            return None
+        values, best, best_cell, wins = solver.choice(masks[turn], masks[turn ^ 1])
+        if values[cell] < best:
+            mistakes.append((ply, cell, best_cell, best, values[cell]))
+        masks[turn] |= 1 << cell
+        if wins >> cell & 1:
+            winner = 'XO'[turn]
+    finished = winner is not None or masks[0] | masks[1] == shape.full_mask
+    return winner, finished, mistakes
+
+
+def _count(players, name, result, moves, mistakes, blunders, lost):
+    counts = players.get(name)
+    if counts is None:
+        counts = players[name] = [0] * len(FIELDS)
+    counts[0] += 1
+    if result is not None:
+        counts[1 + result] += 1
+    counts[4] += moves
+    counts[5] += mistakes
+    counts[6] += blunders
+    counts[7] += lost
+
+
+def summarize_game(players, x_name, o_name, winner, finished, plies, mistakes):
+    """Add a game, as annotate_game found it, to the per-player counts"""
+    for side, name in enumerate((x_name, o_name)):
+        if not finished:
+            result = None
+        elif winner is None:
+            result = 2
+        else:
+            result = 0 if winner == 'XO'[side] else 1
+        own = [mistake for mistake in mistakes if mistake[0] & 1 == side]
+        blunders = sum(1 for mistake in own if mistake[3] > LOSS and mistake[4] == LOSS)
+        lost = 1 if mistakes and mistakes[0][0] & 1 == side else 0
+        _count(players, name, result, (plies + 1 - side) // 2, len(own), blunders, lost)
+
+
+_solvers = {}
+
+
+def _solver(size, cache_path):
+    """One Solver per board and cache per process"""
+    solver = _solvers.get((size, cache_path))
+    if solver is None:
+        cache = SharedCache(cache_path, size) if cache_path else None
+        solver = _solvers[size, cache_path] = Solver(board_shape(*size), cache)
+    return solver
+
+
+def _annotate_range(job):
+    """Annotate the games whose lines start in [start, end) of the log; runs in a worker"""
+    path, start, end, size, cache_path, keep_annotations = job
+    solver = _solver(size, cache_path)
+    players = {}
+    games = invalid = unfinished = 0
+    annotations = []
+    with open(path, 'rb') as handle:
+        if start:
+            # The line under `start` belongs to the job before
+            handle.seek(start - 1)
+            handle.readline()
+        offset = handle.tell()
+        while offset < end:
+            line = handle.readline()
+            if not line:
+                break
+            line_offset = offset
+            offset += len(line)
+            text = line.decode('utf-8', 'replace').strip('\r\n')
+            if not text.strip() or text.startswith('#'):
+                continue
+            parts = text.split('\t')
+            try:
+                x_name, o_name, moves = parts
+                cells = [int(cell) for cell in moves.split()]
+            except ValueError:
+                invalid += 1
+                continue
+            annotated = annotate_game(solver, cells)
+            if annotated is None:
+                invalid += 1
+                continue
+            winner, finished, mistakes = annotated
+            games += 1
+            unfinished += not finished
+            summarize_game(players, x_name, o_name, winner, finished, len(cells), mistakes)
+            if keep_annotations and mistakes:
+                result = ('draw' if winner is None else winner) if finished else 'unfinished'
+                annotations.append(json.dumps({
+                    'offset': line_offset, 'x': x_name, 'o': o_name, 'result': result,
+                    'lost_at': mistakes[0][0],
+                    'mistakes': [list(mistake) for mistake in mistakes]}) + '\n')
+    return {'start': start, 'games': games, 'invalid': invalid, 'unfinished': unfinished,
+            'players': players, 'annotations': ''.join(annotations)}
+
+
+def analyze_log(path, rows=3, cols=3, k=3, workers=None, cache_path=None, annotations=None,
+                chunk_bytes=CHUNK_BYTES):
+    """Annotate every game in a log; return the summary
+
+    The summary holds the board, the games read, the lines that were not
+    valid games, the games that stopped before a result, the seconds taken
+    and, per player, the counts in FIELDS with mistake and blunder rates
+    per move.  `annotations`, if given, is written one line per game with
+    mistakes.  Without `cache_path` the shared cache lives in a temporary
+    file for the run.
+    """
+    size = (rows, cols, k)
+    Solver(board_shape(*size))
+    started = time.perf_counter()
+    temporary = cache_path is None
+    if temporary:
+        descriptor, cache_path = tempfile.mkstemp(suffix='.memo')
+        os.close(descriptor)
+    try:
+        # Made here, so no two workers race to create it
+        SharedCache(cache_path, size)
+        length = os.path.getsize(path)
+        keep = annotations is not None
+        jobs = [(path, start, min(start + chunk_bytes, length), size, cache_path, keep)
+                for start in range(0, length, chunk_bytes)]
+        workers = workers or os.cpu_count() or 1
+        out = open(annotations, 'w', encoding='utf-8') if keep else None
+        summary = {'board': list(size), 'games': 0, 'invalid': 0, 'unfinished': 0}
+        players = {}
+        try:
+            if workers > 1 and len(jobs) > 1:
+                with ProcessPoolExecutor(min(workers, len(jobs))) as executor:
+                    _merge(executor.map(_annotate_range, jobs), summary, players, out)
+            else:
+                _merge(map(_annotate_range, jobs), summary, players, out)
+        finally:
+            if out is not None:
+                out.close()
+    finally:
+        if temporary:
+            os.remove(cache_path)
+    summary['seconds'] = time.perf_counter() - started
+    summary['players'] = {}
+    for name, counts in sorted(players.items()):
+        entry = dict(zip(FIELDS, counts))
+        moves = max(entry['moves'], 1)
+        entry['mistake_rate'] = entry['mistakes'] / moves
+        entry['blunder_rate'] = entry['blunders'] / moves
+        summary['players'][name] = entry
+    return summary
+
+
+def _merge(done, summary, players, out):
+    """Fold the jobs' results, in log order, into the summary and the annotations file"""
+    for result in done:
+        for field in ('games', 'invalid', 'unfinished'):
+            summary[field] += result[field]
+        for name, counts in result['players'].items():
+            total = players.setdefault(name, [0] * len(FIELDS))
+            for i, count in enumerate(counts):
+                total[i] += count
+        if out is not None:
+            out.write(result['annotations'])
+
+
+def player_stats(summary):
+    """W/L/D of each player in a summary, as the PlayerStats the GUI shows"""
+    return {name: PlayerStats(name, entry['wins'], entry['losses'], entry['draws'])
+            for name, entry in summary['players'].items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find the mistakes in a log of played games")
+    parser.add_argument('log', help="one game per line: X name, O name, cells (tab separated)")
+    parser.add_argument('--board', type=int, nargs=3, default=(3, 3, 3), metavar=('ROWS', 'COLS', 'K'))
+    parser.add_argument('--workers', type=int, help="processes to use (default: all cores)")
+    parser.add_argument('--cache', help="position cache file to keep between runs")
+    parser.add_argument('--summary', help="write the per-player summary here as JSON")
+    parser.add_argument('--annotations', help="write the mistakes of each game here as JSON lines")
+    args = parser.parse_args(argv)
+
+    summary = analyze_log(args.log, *args.board, workers=args.workers, cache_path=args.cache,
+                          annotations=args.annotations)
+    if args.summary:
+        with open(args.summary, 'w', encoding='utf-8') as handle:
+            json.dump(summary, handle, indent=2)
+    games, seconds = summary['games'], summary['seconds']
+    print(f"{games:,d} games in {seconds:.1f}s ({games / max(seconds, 1e-9):,.0f} games/s), "
+          f"{summary['invalid']:,d} invalid lines")
+    print(f"{'player':16s} {'games':>7s} {'mistakes/move':>14s} {'blunders/move':>14s}  record")
+    players = summary['players']
+    for name, stats in sorted(player_stats(summary).items(), key=lambda item: -players[item[0]]['games']):
+        entry = players[name]
+        print(f"{name:16s} {entry['games']:7d} {entry['mistake_rate']:14.3f} "
+              f"{entry['blunder_rate']:14.3f}  {stats.get_stats_string()}")
+
+
+if __name__ == "__main__":
+    main()
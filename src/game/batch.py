@@ -0,0 +1,211 @@
+"""Vectorized simulation of many headless games at once with NumPy.
+
+A batch keeps one row per game and plays the same ply in every unfinished
+game in one step.  Boards with up to 16 cells store each side as a packed
+integer bitmask and look wins up in a table built once from the line
+masks; larger boards store each side as a boolean row and find wins with
+one matrix product against the line-mask matrix per ply.
+
+Run ``python -m game.batch --games 1000000`` from src/ for a quick report.
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from .game_logic import board_shape
+
+# Boards up to this many cells use the packed bitmask path
+PACKED_CELLS = 16
+
+RANDOM = 'random'
+PERFECT = 'perfect'
+
+
+class BatchResult:
+    """Aggregate outcome of a batch of games"""
+
+    def __init__(self, cells):
+        self.x_wins = 0
+        self.o_wins = 0
+        self.draws = 0
+        # lengths[n] is the number of games that ended after n moves
+        self.lengths = np.zeros(cells + 1, dtype=np.int64)
+        self.seconds = 0.0
+
+    @property
+    def games(self):
+        return self.x_wins + self.o_wins + self.draws
+
+    def merge(self, other):
+        self.x_wins += other.x_wins
+        self.o_wins += other.o_wins
+        self.draws += other.draws
+        self.lengths += other.lengths
+        self.seconds += other.seconds
+
+    def mean_length(self):
+        if not self.games:
+            return 0.0
+        return float((self.lengths * np.arange(len(self.lengths))).sum() / self.games)
+
+    def __repr__(self):
+        return (f"BatchResult(games={self.games}, x_wins={self.x_wins}, "
+                f"o_wins={self.o_wins}, draws={self.draws})")
+
+
+class BatchSimulator:
+    """Plays batches of games between two policies: 'random' or 'perfect' (3x3 only)"""
+
+    def __init__(self, rows=3, cols=3, k=3, seed=None):
+        self.shape = board_shape(rows, cols, k)
+        self.rng = np.random.default_rng(seed)
+        cells = self.shape.cells
+        self.packed = cells <= PACKED_CELLS
+        # One column per k-cell window
+        self.line_matrix = np.zeros((cells, len(self.shape.line_masks)), dtype=np.float32)
+        for column, line in enumerate(self.shape.line_masks):
+            for cell in range(cells):
+                if line >> cell & 1:
+                    self.line_matrix[cell, column] = 1
+        if self.packed:
+            self._build_packed_tables()
+        self._perfect_moves = None
+
+    def _build_packed_tables(self):
+        cells = self.shape.cells
+        masks = np.arange(1 << cells, dtype=np.uint32)
+        bits = (masks[:, None] >> np.arange(cells, dtype=np.uint32)) & 1
+        # Every possible mask against every line in one matrix product
+        self.win_table = (bits.astype(np.float32) @ self.line_matrix == self.shape.k).any(axis=1)
+        # free_cells[occupied, j] is the j-th empty cell of an occupancy mask
+        free = bits == 0
+        self.free_count = free.sum(axis=1).astype(np.int64)
+        order = np.argsort(~free, axis=1, kind='stable')
+        self.free_cells = order.astype(np.int8)
+        self.cell_bits = (np.uint32(1) << np.arange(cells, dtype=np.uint32)).astype(np.uint32)
+
+    def _perfect_table(self):
+        """Best move for every 3x3 position, indexed by [x mask, o mask]"""
+        if self._perfect_moves is None:
+            if (self.shape.rows, self.shape.cols, self.shape.k) != (3, 3, 3):
+                raise ValueError("perfect play is only available on 3x3")
+            from .solved_table import NO_MOVE, load_table
+            table = load_table()
+            moves = np.full((512, 512), -1, dtype=np.int8)
+            for x in range(512):
+                for o in range(512):
+                    if x & o or not 0 <= x.bit_count() - o.bit_count() <= 1:
+                        continue
+                    x_to_move = x.bit_count() == o.bit_count()
+                    entry = table.lookup(x, o) if x_to_move else table.lookup(o, x)
+                    if entry is not None and entry[2] != NO_MOVE:
+                        moves[x, o] = entry[2]
+            self._perfect_moves = moves
+        return self._perfect_moves
+
+    def play(self, games, x_policy=RANDOM, o_policy=RANDOM, chunk_size=1 << 18):
+        """Play `games` games, `chunk_size` at a time, and return a BatchResult"""
+        for policy in (x_policy, o_policy):
+            if policy not in (RANDOM, PERFECT):
+                raise ValueError(f"unknown policy {policy!r}")
+            if policy == PERFECT:
+                self._perfect_table()
+        total = BatchResult(self.shape.cells)
+        remaining = games
+        while remaining > 0:
+            size = min(chunk_size, remaining)
+            start = time.perf_counter()
+            if self.packed:
+                result = self._play_packed(size, (x_policy, o_policy))
+            else:
+                result = self._play_dense(size)
+            result.seconds = time.perf_counter() - start
+            total.merge(result)
+            remaining -= size
+        return total
+
+    def _play_packed(self, size, policies):
+        result = BatchResult(self.shape.cells)
+        sides = [np.zeros(size, dtype=np.uint32), np.zeros(size, dtype=np.uint32)]
+        for ply in range(self.shape.cells):
+            turn = ply & 1
+            occupied = sides[0] | sides[1]
+            if policies[turn] == PERFECT:
+                cells = self._perfect_table()[sides[0], sides[1]]
+            else:
+                pick = (self.rng.random(len(occupied)) * self.free_count[occupied]).astype(np.int64)
+                cells = self.free_cells[occupied, pick]
+            sides[turn] = sides[turn] | self.cell_bits[cells]
+
+            won = self.win_table[sides[turn]]
+            finished = won.sum()
+            if turn:
+                result.o_wins += int(finished)
+            else:
+                result.x_wins += int(finished)
+            if ply == self.shape.cells - 1:
+                result.draws += int(len(won) - finished)
+                result.lengths[ply + 1] += len(won)
+                break
+            result.lengths[ply + 1] += int(finished)
+            if finished:
+                keep = ~won
+                sides = [sides[0][keep], sides[1][keep]]
+                if not len(sides[0]):
+                    break
+        return result
+
+    def _play_dense(self, size):
+        result = BatchResult(self.shape.cells)
+        cells = self.shape.cells
+        sides = [np.zeros((size, cells), dtype=bool), np.zeros((size, cells), dtype=bool)]
+        for ply in range(cells):
+            turn = ply & 1
+            scores = self.rng.random(sides[0].shape)
+            scores[sides[0] | sides[1]] = -1.0
+            chosen = scores.argmax(axis=1)
+            sides[turn][np.arange(len(chosen)), chosen] = True
+
+            won = (sides[turn].astype(np.float32) @ self.line_matrix == self.shape.k).any(axis=1)
+            finished = int(won.sum())
+            if turn:
+                result.o_wins += finished
+            else:
+                result.x_wins += finished
+            if ply == cells - 1:
+                result.draws += len(won) - finished
+                result.lengths[ply + 1] += len(won)
+                break
+            result.lengths[ply + 1] += finished
+            if finished:
+                keep = ~won
+                sides = [sides[0][keep], sides[1][keep]]
+                if not len(sides[0]):
+                    break
+        return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate many headless games at once")
+    parser.add_argument('--games', type=int, default=1_000_000)
+    parser.add_argument('--board', type=int, nargs=3, default=(3, 3, 3), metavar=('ROWS', 'COLS', 'K'))
+    parser.add_argument('--x', choices=(RANDOM, PERFECT), default=RANDOM)
+    parser.add_argument('--o', choices=(RANDOM, PERFECT), default=RANDOM)
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args(argv)
+
+    simulator = BatchSimulator(*args.board, seed=args.seed)
+    result = simulator.play(args.games, args.x, args.o)
+    games = result.games
+    print(f"{games} games in {result.seconds:.2f}s ({games / max(result.seconds, 1e-9):,.0f} games/s)")
+    print(f"X wins {result.x_wins / games:.2%}  O wins {result.o_wins / games:.2%}  "
+          f"draws {result.draws / games:.2%}  mean length {result.mean_length():.2f}")
+    for length, count in enumerate(result.lengths):
+        if count:
+            print(f"  {length:3d} moves: {count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,386 @@
+"""Training data for move-prediction models, streamed to memory-mapped .npy shards.
+
+Two sources:
+
+    tree        every position of the game tree where the side to move has
+                a choice, with values and best moves from the board's
+                tablebase (boards of up to 16 cells; the tablebase is
+                generated first if it does not exist yet)
+    selfplay    the positions of games between engine specs, as in
+                game.tournament; values come from the tablebase when the
+                board has one and are otherwise the game's final result
+
+Each sample is fixed width:
+
+    boards  uint8 (2, rows, cols)   X's marks, O's marks
+    turn    uint8                   0 when X is to move, 1 for O
+    legal   bool (rows, cols)       the moves allowed
+    value   int8                    1 win, 0 draw, -1 loss for the side to move
+    move    int16                   cell of a best move (tree) or of the move played
+
+A dataset is a directory holding, per shard, one ``shard-NNNNN.<field>.npy``
+file per field, plus ``manifest.json`` with the board, the source and the
+sample count of every shard.  Shards are written in chunks straight into
+memory-mapped files sized for the most samples they can hold, then cut to
+the samples actually written by rewriting the .npy header and truncating
+the file, so neither writing nor reading ever holds a shard in memory.
+Shards are independent jobs on a process pool.  With ``dedup`` only one
+position of every set of symmetric ones is kept: exactly, across the whole
+tree, or within each shard for self-play.
+
+    python -m game.dataset tree --board 4 4 3 --dedup --output data/4x4k3
+    python -m game.dataset selfplay --games 100000 --x mcts:200 --o random --output data/sp
+"""
+
+import argparse
+import json
+import os
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from numpy.lib import format as npy
+
+from .solved_table import DRAW, LOSS, WIN
+
+FIELDS = ('boards', 'turn', 'legal', 'value', 'move')
+
+# Samples converted and written at once, which bounds a worker's memory
+CHUNK = 1 << 16
+
+# Most samples per shard
+SHARD_SIZE = 1 << 20
+
+# From tablebase outcomes to sample values
+VALUES = {LOSS: -1, DRAW: 0, WIN: 1}
+_OUTCOME_VALUES = np.array([0, -1, 0, 1], dtype=np.int8)
+
+
+def field_layout(rows, cols):
+    """{field: (dtype, shape of one sample)}"""
+    return {
+        'boards': (np.dtype(np.uint8), (2, rows, cols)),
+        'turn': (np.dtype(np.uint8), ()),
+        'legal': (np.dtype(np.bool_), (rows, cols)),
+        'value': (np.dtype(np.int8), ()),
+        'move': (np.dtype(np.int16), ()),
+    }
+
+
+def shard_path(directory, number, field):
+    return os.path.join(directory, f'shard-{number:05d}.{field}.npy')
+
+
+def unpack_masks(masks, cells):
+    """(n, cells) uint8 array of the bits of n Python integer masks"""
+    width = (cells + 7) // 8
+    raw = b''.join(mask.to_bytes(width, 'little') for mask in masks)
+    bits = np.unpackbits(np.frombuffer(raw, dtype=np.uint8).reshape(len(masks), width),
+                         axis=1, bitorder='little')
+    return bits[:, :cells]
+
+
+class ShardWriter:
+    """Writes one shard's fields into memory-mapped .npy files, a chunk at a time"""
+
+    def __init__(self, directory, number, rows, cols, capacity):
+        self.directory = directory
+        self.number = number
+        self.count = 0
+        self.arrays = {}
+        for field, (dtype, shape) in field_layout(rows, cols).items():
+            self.arrays[field] = npy.open_memmap(shard_path(directory, number, field) + '.partial',
+                                                 mode='w+', dtype=dtype, shape=(capacity, *shape))
+
+    def write(self, chunk):
+        """Append {field: array} holding the same number of samples in every field"""
+        size = len(chunk['turn'])
+        if self.count + size > len(self.arrays['turn']):
+            raise ValueError("shard is full")
+        for field, array in self.arrays.items():
+            array[self.count:self.count + size] = chunk[field]
+        self.count += size
+
+    def close(self):
+        """Cut every file to the samples written and move it into place; return the count"""
+        arrays, self.arrays = self.arrays, {}
+        for field in list(arrays):
+            array = arrays.pop(field)
+            array.flush()
+            header_size, dtype, shape = array.offset, array.dtype, array.shape[1:]
+            # Unmap the file before it is cut
+            del array
+            partial = shard_path(self.directory, self.number, field) + '.partial'
+            with open(partial, 'r+b') as handle:
+                handle.write(_header(dtype, (self.count, *shape), header_size))
+                handle.truncate(header_size + self.count * dtype.itemsize * int(np.prod(shape)))
+            os.replace(partial, shard_path(self.directory, self.number, field))
+        return self.count
+
+
+def _header(dtype, shape, size):
+    """A version 1.0 .npy header padded to exactly `size` bytes, so the data does not move"""
+    text = repr({'descr': npy.dtype_to_descr(dtype), 'fortran_order': False, 'shape': shape})
+    body = text.ljust(size - len(npy.MAGIC_PREFIX) - 4 - 1) + '\n'
+    return npy.MAGIC_PREFIX + bytes((1, 0)) + struct.pack('<H', len(body)) + body.encode('latin1')
+
+
+# Walking the tree
+
+def _tree_shard(job):
+    """Write the tree positions with slot indices [start, stop) to one shard; runs in a worker"""
+    from .tablebase import HEADER, Tablebase
+
+    directory, number, path, start, stop, dedup = job
+    tablebase = Tablebase(path)
+    indexer = tablebase.indexer
+    shape = indexer.shape
+    data = np.frombuffer(tablebase.data, dtype=np.uint8, offset=HEADER.size)
+    writer = ShardWriter(directory, number, shape.rows, shape.cols, stop - start)
+    try:
+        # A full board has no moves left, so the last level is never exported
+        for level in range(shape.cells):
+            first = max(start, indexer.offset[level]) - indexer.offset[level]
+            last = min(stop - indexer.offset[level], indexer.level_size[level])
+            for chunk_start in range(first, last, CHUNK):
+                ranks = np.arange(chunk_start, min(chunk_start + CHUNK, last), dtype=np.int64)
+                chunk = _tree_chunk(indexer, data, level, ranks, dedup)
+                if chunk is not None:
+                    writer.write(chunk)
+    finally:
+        count = writer.close()
+        del data
+        tablebase.close()
+    return number, count
+
+
+def _tree_chunk(indexer, data, level, ranks, dedup):
+    """Samples for the open positions among some ranks of one level, or None if there are none"""
+    from .tablebase import _read
+
+    shape = indexer.shape
+    x, o = indexer.unhash(level, ranks)
+    # With no line for either side a position is reachable and still open
+    keep = ~indexer.has_line(x) & ~indexer.has_line(o)
+    x, o, ranks = x[keep], o[keep], ranks[keep]
+    canonical = indexer.canonical_hash(level, x, o)
+    if dedup:
+        keep = canonical == indexer.offset[level] + ranks
+        x, o, canonical = x[keep], o[keep], canonical[keep]
+    if not len(x):
+        return None
+
+    turn = level % 2
+    me, opp = (x, o) if turn == 0 else (o, x)
+    occupied = x | o
+    # Best move: an immediate win, else the child that is worst for the opponent
+    best_value = np.full(len(x), -2, dtype=np.int8)
+    best_move = np.full(len(x), -1, dtype=np.int16)
+    for cell in range(shape.cells):
+        bit = 1 << cell
+        free = np.flatnonzero((occupied & bit) == 0)
+        if not len(free):
+            continue
+        mine = me[free] | bit
+        child_x, child_o = (mine, opp[free]) if turn == 0 else (opp[free], mine)
+        reply = _read(data, indexer.canonical_hash(level + 1, child_x, child_o))
+        value = np.where(indexer.has_line(mine), 2, -_OUTCOME_VALUES[reply])
+        better = value > best_value[free]
+        best_value[free[better]] = value[better]
+        best_move[free[better]] = cell
+
+    cells = shape.cells
+    boards = np.stack([(x[:, None] >> np.arange(cells)) & 1,
+                       (o[:, None] >> np.arange(cells)) & 1], axis=1).astype(np.uint8)
+    return {
+        'boards': boards.reshape(len(x), 2, shape.rows, shape.cols),
+        'turn': np.full(len(x), turn, dtype=np.uint8),
+        'legal': (boards[:, 0] | boards[:, 1] == 0).reshape(len(x), shape.rows, shape.cols),
+        'value': _OUTCOME_VALUES[_read(data, canonical)],
+        'move': best_move,
+    }
+
+
+def export_tree(rows, cols, k, directory, dedup=False, workers=None, shard_size=SHARD_SIZE,
+                tablebase_path=None):
+    """Write every open position of a board's game tree; return the manifest"""
+    from .tablebase import _indexer, generate
+    from .tablebase import tablebase_path as default_path
+
+    path = tablebase_path or default_path(rows, cols, k)
+    if not os.path.exists(path):
+        generate(rows, cols, k, path, workers)
+    total = _indexer((rows, cols, k)).total
+    os.makedirs(directory, exist_ok=True)
+    jobs = [(directory, number, path, start, min(start + shard_size, total), dedup)
+            for number, start in enumerate(range(0, total, shard_size))]
+    return _run(jobs, _tree_shard, workers, directory,
+                {'board': [rows, cols, k], 'source': 'tree', 'dedup': dedup, 'solved': True})
+
+
+# Self-play
+
+def _selfplay_shard(job):
+    """Play `games` games and write their positions to one shard; runs in a worker"""
+    import random
+
+    from .ai import Symmetries, make_engine
+    from .tablebase import find_tablebase
+    from .ultimate import create_game
+
+    directory, number, size, specs, games, opening, seed, dedup, tablebase_dir = job
+    rng = random.Random(seed)
+    engines = [make_engine(spec, rng.randrange(1 << 32)) for spec in specs]
+    game = create_game(*size)
+    cells = game.shape.cells
+    tablebase = find_tablebase(*size, tablebase_dir) if cells <= 16 and size[2] else None
+    symmetries = Symmetries(game.shape) if dedup and size[2] else None
+    seen = set()
+    writer = ShardWriter(directory, number, game.rows, game.cols, games * cells)
+    pending = []
+    try:
+        for _ in range(games):
+            game.reset()
+            samples = []
+            while not game.is_over():
+                x, o = game.masks
+                legal = 0
+                for row, col in game.legal_moves():
+                    legal |= 1 << (row * game.cols + col)
+                if game.move_count < opening:
+                    move = rng.choice(game.legal_moves())
+                else:
+                    move = engines[game.turn].choose_move(game)
+                if move is None:
+                    # An engine that cannot move loses, as in the tournament
+                    game.winner = 'O' if game.turn == 0 else 'X'
+                    break
+                key = None
+                if symmetries is not None:
+                    key = symmetries.canonical(game.masks[game.turn], game.masks[game.turn ^ 1])
+                if key is None or key not in seen:
+                    if key is not None:
+                        seen.add(key)
+                    value = VALUES[tablebase.value(x, o)] if tablebase is not None else None
+                    samples.append([x, o, game.turn, legal, value, move[0] * game.cols + move[1]])
+                if not game.make_move(*move):
+                    break
+            for sample in samples:
+                if sample[4] is None:
+                    # Unsolved boards are labelled with the result of the game
+                    sample[4] = 0 if game.winner is None else 1 if 'XO'[sample[2]] == game.winner else -1
+            pending.extend(samples)
+            if len(pending) >= CHUNK:
+                writer.write(_selfplay_chunk(pending, game))
+                pending = []
+        if pending:
+            writer.write(_selfplay_chunk(pending, game))
+    finally:
+        count = writer.close()
+        if tablebase is not None:
+            tablebase.close()
+    return number, count
+
+
+def _selfplay_chunk(samples, game):
+    rows, cols, cells = game.rows, game.cols, game.shape.cells
+    x, o, turn, legal, value, move = zip(*samples)
+    size = len(samples)
+    return {
+        'boards': np.stack([unpack_masks(x, cells), unpack_masks(o, cells)],
+                           axis=1).reshape(size, 2, rows, cols),
+        'turn': np.array(turn, dtype=np.uint8),
+        'legal': unpack_masks(legal, cells).astype(bool).reshape(size, rows, cols),
+        'value': np.array(value, dtype=np.int8),
+        'move': np.array(move, dtype=np.int16),
+    }
+
+
+def export_selfplay(specs, games, directory, rows=3, cols=3, k=3, opening=2, seed=0, dedup=False,
+                    workers=None, games_per_shard=10_000, tablebase_dir=None):
+    """Play `games` games between two engine specs and write their positions; return the manifest"""
+    from .ai import make_engine
+    from .tablebase import DEFAULT_DIR
+    from .ultimate import create_game
+
+    for spec in specs:
+        make_engine(spec)
+    create_game(rows, cols, k)
+    os.makedirs(directory, exist_ok=True)
+    jobs = [(directory, number, (rows, cols, k), tuple(specs), min(games_per_shard, games - start),
+             opening, f"{seed}|{number}", dedup, tablebase_dir or DEFAULT_DIR)
+            for number, start in enumerate(range(0, games, games_per_shard))]
+    return _run(jobs, _selfplay_shard, workers, directory,
+                {'board': [rows, cols, k], 'source': 'selfplay', 'players': list(specs),
+                 'games': games, 'dedup': dedup})
+
+
+def _run(jobs, worker, workers, directory, manifest):
+    """Write the shards on a process pool, then the manifest; return the manifest"""
+    workers = workers or os.cpu_count() or 1
+    started = time.perf_counter()
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(min(workers, len(jobs))) as executor:
+            done = list(executor.map(worker, jobs))
+    else:
+        done = list(map(worker, jobs))
+    manifest['fields'] = list(FIELDS)
+    manifest['shards'] = [count for _, count in sorted(done)]
+    manifest['samples'] = sum(manifest['shards'])
+    manifest['seconds'] = time.perf_counter() - started
+    partial = os.path.join(directory, 'manifest.json.partial')
+    with open(partial, 'w', encoding='utf-8') as handle:
+        json.dump(manifest, handle, indent=2)
+    os.replace(partial, os.path.join(directory, 'manifest.json'))
+    return manifest
+
+
+class Dataset:
+    """Read-only view of an exported dataset; every field is memory-mapped"""
+
+    def __init__(self, directory):
+        with open(os.path.join(directory, 'manifest.json'), encoding='utf-8') as handle:
+            self.manifest = json.load(handle)
+        self.directory = directory
+
+    def __len__(self):
+        return self.manifest['samples']
+
+    def shard(self, number):
+        """{field: read-only memmap} for one shard"""
+        return {field: np.load(shard_path(self.directory, number, field), mmap_mode='r')
+                for field in self.manifest['fields']}
+
+    def shards(self):
+        for number in range(len(self.manifest['shards'])):
+            yield self.shard(number)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export positions as training data")
+    parser.add_argument('source', choices=('tree', 'selfplay'))
+    parser.add_argument('--output', required=True, help="dataset directory")
+    parser.add_argument('--board', type=int, nargs=3, default=(3, 3, 3), metavar=('ROWS', 'COLS', 'K'))
+    parser.add_argument('--dedup', action='store_true', help="keep one of each set of symmetric positions")
+    parser.add_argument('--workers', type=int, help="processes to use (default: all cores)")
+    parser.add_argument('--games', type=int, default=10_000, help="self-play games")
+    parser.add_argument('--x', default='random', help="self-play engine spec for X")
+    parser.add_argument('--o', default='random', help="self-play engine spec for O")
+    parser.add_argument('--opening', type=int, default=2, help="random plies at the start of each game")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.source == 'tree':
+        manifest = export_tree(*args.board, args.output, args.dedup, args.workers)
+    else:
+        manifest = export_selfplay((args.x, args.o), args.games, args.output, *args.board,
+                                   opening=args.opening, seed=args.seed, dedup=args.dedup,
+                                   workers=args.workers)
+    samples, seconds = manifest['samples'], manifest['seconds']
+    print(f"{samples:,d} samples in {len(manifest['shards'])} shards, {seconds:.1f}s "
+          f"({samples / max(seconds, 1e-9):,.0f} samples/s) in {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1 +1,285 @@
+"""Tic-tac-toe rules, kept free of any GUI code.
 
+The board is ``rows`` x ``cols`` and a game is won with ``k`` marks in a
+row (classic tic-tac-toe is 3, 3, 3; Gomoku is 15, 15, 5).  Each side's
+marks are stored as an integer bitmask where cell (row, col) is bit
+``row * cols + col``.  After a move only the four directions through the
+played cell are scanned, so a win check costs O(k) whatever the board
+size, and a full board is a single comparison against the full mask.
+
+Moves are kept on a stack, so undo and redo cost O(1), and a Zobrist hash
+of the position is updated with each move and always current.
+
+This module imports nothing outside itself, so the rules load in well
+under a millisecond for short-lived worker processes and headless tools.
+"""
+
+PLAYERS = ('X', 'O')
+
+# Row and column steps for horizontal, vertical and the two diagonals
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+MAX_SIZE = 100
+
+MASK64 = (1 << 64) - 1
+
+
+class _computed_once:
+    """Like functools.cached_property, which would cost importing functools"""
+
+    def __init__(self, method):
+        self.method = method
+        self.__doc__ = method.__doc__
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        value = instance.__dict__[self.method.__name__] = self.method(instance)
+        return value
+
+
+def _splitmix64(seed):
+    """Endless stream of well-mixed 64-bit numbers from a seed"""
+    while True:
+        seed = (seed + 0x9E3779B97F4A7C15) & MASK64
+        z = seed
+        z = (z ^ (z >> 30)) * 0xBF58476D1CE4E5B9 & MASK64
+        z = (z ^ (z >> 27)) * 0x94D049BB133111EB & MASK64
+        yield z ^ (z >> 31)
+
+
+class BoardShape:
+    """Geometry shared by every game played on the same m,n,k board"""
+
+    def __init__(self, rows, cols, k):
+        if not (1 <= rows <= MAX_SIZE and 1 <= cols <= MAX_SIZE):
+            raise ValueError(f"board must be between 1x1 and {MAX_SIZE}x{MAX_SIZE}")
+        if not 1 <= k <= max(rows, cols):
+            raise ValueError(f"k={k} does not fit on a {rows}x{cols} board")
+        self.rows = rows
+        self.cols = cols
+        self.k = k
+        self.cells = rows * cols
+        self.full_mask = (1 << self.cells) - 1
+
+    def in_bounds(self, row, col):
+        return 0 <= row < self.rows and 0 <= col < self.cols
+
+    def find_line(self, mask, cell):
+        """Return the mask of a k-in-a-row through cell, or 0 if there is none"""
+        cols = self.cols
+        k = self.k
+        row, col = divmod(cell, cols)
+        for dr, dc in DIRECTIONS:
+            line = 1 << cell
+            count = 1
+            for sign in (1, -1):
+                r, c = row + sign * dr, col + sign * dc
+                while count < k and 0 <= r < self.rows and 0 <= c < cols:
+                    bit = 1 << (r * cols + c)
+                    if not mask & bit:
+                        break
+                    line |= bit
+                    count += 1
+                    r += sign * dr
+                    c += sign * dc
+            if count >= k:
+                return line
+        return 0
+
+    @_computed_once
+    def line_masks(self):
+        """Every k-cell window on the board, for checking a position without a last move"""
+        masks = []
+        for row in range(self.rows):
+            for col in range(self.cols):
+                for dr, dc in DIRECTIONS:
+                    end_r, end_c = row + dr * (self.k - 1), col + dc * (self.k - 1)
+                    if not self.in_bounds(end_r, end_c):
+                        continue
+                    masks.append(sum(1 << ((row + dr * i) * self.cols + col + dc * i)
+                                     for i in range(self.k)))
+        return tuple(masks)
+
+    @_computed_once
+    def zobrist(self):
+        """Random 64-bit keys for each (player, cell), plus the key for O to move"""
+        # Seeded by the board so a position hashes the same in every process
+        numbers = _splitmix64(self.rows * (MAX_SIZE + 1) + self.cols)
+        keys = tuple(tuple(next(numbers) for _ in range(self.cells)) for _ in PLAYERS)
+        return keys, next(numbers)
+
+    def mask_has_win(self, mask):
+        """Check whether a bitmask of one side's marks contains k in a row"""
+        for line in self.line_masks:
+            if mask & line == line:
+                return True
+        return False
+
+
+_shapes = {}
+
+
+def board_shape(rows=3, cols=3, k=3):
+    """Return the BoardShape shared by every game on this board"""
+    shape = _shapes.get((rows, cols, k))
+    if shape is None:
+        shape = _shapes[rows, cols, k] = BoardShape(rows, cols, k)
+    return shape
+
+
+class GameLogic:
+    """State of a single game: one bitmask per player plus whose turn it is"""
+
+    def __init__(self, rows=3, cols=3, k=3):
+        self.shape = board_shape(rows, cols, k)
+        self.reset()
+
+    @property
+    def rows(self):
+        return self.shape.rows
+
+    @property
+    def cols(self):
+        return self.shape.cols
+
+    @property
+    def k(self):
+        return self.shape.k
+
+    def reset(self):
+        """Clear the board and give the first move to X"""
+        self.masks = [0, 0]
+        self.turn = 0
+        self.move_count = 0
+        self.last_move = None
+        self.history = []
+        # Undone moves, next redo last
+        self.future = []
+        self.hash = 0
+        self.winner = None
+        self.winning_mask = 0
+
+    def copy(self):
+        """Return an independent copy, e.g. for an engine searching on another thread"""
+        other = GameLogic.__new__(GameLogic)
+        other.__dict__.update(self.__dict__)
+        other.masks = list(self.masks)
+        other.history = list(self.history)
+        other.future = list(self.future)
+        return other
+
+    @property
+    def current_player(self):
+        return PLAYERS[self.turn]
+
+    @property
+    def occupied(self):
+        return self.masks[0] | self.masks[1]
+
+    def cell(self, row, col):
+        """Return 'X', 'O' or '' for the given cell"""
+        bit = 1 << (row * self.cols + col)
+        if self.masks[0] & bit:
+            return PLAYERS[0]
+        if self.masks[1] & bit:
+            return PLAYERS[1]
+        return ''
+
+    def is_empty(self, row, col):
+        return not self.occupied >> (row * self.cols + col) & 1
+
+    def is_legal(self, row, col):
+        return (self.shape.in_bounds(row, col) and self.winner is None
+                and not self.occupied >> (row * self.cols + col) & 1)
+
+    def is_over(self):
+        return self.winner is not None or self.is_board_full()
+
+    def legal_moves(self):
+        """List the (row, col) of every empty cell, or nothing once the game is over"""
+        if self.is_over():
+            return []
+        free = ~self.occupied & self.shape.full_mask
+        return [divmod(cell, self.cols) for cell in range(self.shape.cells) if free >> cell & 1]
+
+    def make_move(self, row, col):
+        """Place the current player's mark; return False if the move is not allowed
+
+        A new move discards any undone moves.
+        """
+        if not self.shape.in_bounds(row, col):
+            return False
+        cell = row * self.cols + col
+        if self.winner is not None or self.occupied >> cell & 1:
+            return False
+        if self.future:
+            self.future.clear()
+
+        keys, o_to_move = self.shape.zobrist
+        mask = self.masks[self.turn] | 1 << cell
+        self.masks[self.turn] = mask
+        self.hash ^= keys[self.turn][cell]
+        self.move_count += 1
+        self.last_move = cell
+        self.history.append(cell)
+
+        line = self.shape.find_line(mask, cell)
+        if line:
+            self.winner = PLAYERS[self.turn]
+            self.winning_mask = line
+            return True
+
+        self.turn ^= 1
+        self.hash ^= o_to_move
+        return True
+
+    def undo_move(self):
+        """Take back the last move; return its (row, col), or None at the start"""
+        if not self.history:
+            return None
+        keys, o_to_move = self.shape.zobrist
+        cell = self.history.pop()
+        if self.winner is not None:
+            # The winner's turn never passed on
+            self.winner = None
+            self.winning_mask = 0
+        else:
+            self.turn ^= 1
+            self.hash ^= o_to_move
+        self.masks[self.turn] &= ~(1 << cell)
+        self.hash ^= keys[self.turn][cell]
+        self.move_count -= 1
+        self.last_move = self.history[-1] if self.history else None
+        self.future.append(cell)
+        return divmod(cell, self.cols)
+
+    def redo_move(self):
+        """Play the last undone move again; return its (row, col), or None if there is none"""
+        if not self.future:
+            return None
+        # Set the stack aside so make_move does not discard the other undone moves
+        future = self.future
+        self.future = []
+        row, col = divmod(future.pop(), self.cols)
+        self.make_move(row, col)
+        self.future = future
+        return row, col
+
+    def check_winner(self):
+        """Check if there's a winner"""
+        return self.winner is not None
+
+    def is_board_full(self):
+        """Check if the board is full"""
+        return self.occupied == self.shape.full_mask
+
+    def winning_line_coords(self):
+        """Return the end cells of the winning line, or None if nobody has won"""
+        if not self.winning_mask:
+            return None
+        # Cell indices grow monotonically along every direction, so the
+        # lowest and highest bits are the two ends of the line
+        first = (self.winning_mask & -self.winning_mask).bit_length() - 1
+        last = self.winning_mask.bit_length() - 1
+        return [divmod(first, self.cols), divmod(last, self.cols)]
@@ -0,0 +1,150 @@
+"""Play in a terminal: a text board, engines on either side, moves from stdin.
+
+    python main.py --headless                          # you (X) against the computer
+    python main.py --headless --x alphabeta:2 --o mcts:300 --games 20 --quiet
+    python main.py --headless --ultimate               # nine small boards
+    printf '2 2\\n1 1\\n' | python main.py --headless --o heuristic
+
+A side is 'human' (moves read from stdin), 'auto' (the engine the game
+window would pick for the board) or an engine spec as in game.tournament.
+Humans type "row col", counting from 1, or "undo" to take back their
+last move; anything else on a line is reported and skipped, and the game
+stops at the end of input.  Nothing here imports Qt.
+"""
+
+import argparse
+import sys
+import time
+
+from .ai import engine_for, make_engine
+from .ultimate import ULTIMATE_SIZE, create_game
+
+
+def render(game):
+    """The board as text, with numbered rows and columns"""
+    width = len(str(max(game.rows, game.cols))) + 1
+    lines = [' ' * width + ''.join(f"{col + 1:>{width}}" for col in range(game.cols))]
+    for row in range(game.rows):
+        cells = ''.join(f"{game.cell(row, col) or '.':>{width}}" for col in range(game.cols))
+        lines.append(f"{row + 1:>{width}}{cells}")
+    if hasattr(game, 'active_boards') and game.active is not None and not game.is_over():
+        # Ultimate: say which small board the next move must go in
+        row, col = divmod(game.active, 3)
+        lines.append(f"play in the small board at rows {3 * row + 1}-{3 * row + 3}, "
+                     f"cols {3 * col + 1}-{3 * col + 3}")
+    return '\n'.join(lines)
+
+
+def parse_move(line, game):
+    """Return the (row, col) typed on a line, 'undo', or None if it makes no sense"""
+    text = line.strip().lower()
+    if text in ('u', 'undo'):
+        return 'undo'
+    parts = text.replace(',', ' ').split()
+    if len(parts) != 2 or not all(part.isdigit() for part in parts):
+        return None
+    row, col = int(parts[0]) - 1, int(parts[1]) - 1
+    return (row, col) if game.shape.in_bounds(row, col) else None
+
+
+class Player:
+    """One side of a headless game: a human on stdin or an engine"""
+
+    def __init__(self, spec, game, seed=None):
+        self.spec = spec
+        if spec == 'human':
+            self.engine = None
+        elif spec == 'auto':
+            self.engine = engine_for(game)
+        else:
+            self.engine = make_engine(spec, seed)
+
+    @property
+    def is_human(self):
+        return self.engine is None
+
+
+def read_move(game, lines, out, prompt):
+    """Read lines until one holds a move; return it, 'undo', or None at the end of input"""
+    for line in lines:
+        move = parse_move(line, game)
+        if move == 'undo' or (move is not None and game.is_legal(*move)):
+            return move
+        problem = "not a legal move" if move else "expected 'row col' or 'undo'"
+        print(f"{problem}: {line.strip()!r}", file=sys.stderr)
+        if prompt:
+            print(f"{game.current_player} to move: ", end='', flush=True, file=out)
+    return None
+
+
+def play(game, players, lines, out, quiet=False, prompt=False):
+    """Play one game to the end; return the winner ('X', 'O', None) or False if input ran out"""
+    while not game.is_over():
+        player = players[game.turn]
+        if not quiet:
+            print(render(game), file=out)
+        if player.is_human:
+            if prompt:
+                print(f"{game.current_player} to move: ", end='', flush=True, file=out)
+            move = read_move(game, lines, out, prompt)
+            if move is None:
+                return False
+            if move == 'undo':
+                # Back to this human's previous turn, past any engine reply
+                game.undo_move()
+                while game.history and not players[game.turn].is_human:
+                    game.undo_move()
+                continue
+        else:
+            move = player.engine.choose_move(game)
+            if move is None:
+                return False
+        mover = game.current_player
+        game.make_move(*move)
+        if not quiet:
+            print(f"{mover} plays {move[0] + 1} {move[1] + 1}", file=out)
+    if not quiet:
+        print(render(game), file=out)
+    return game.winner
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="main.py --headless",
+                                     description="Play tic-tac-toe in the terminal")
+    parser.add_argument('--board', type=int, nargs=3, default=(3, 3, 3), metavar=('ROWS', 'COLS', 'K'))
+    parser.add_argument('--ultimate', action='store_true', help="play ultimate tic-tac-toe instead")
+    parser.add_argument('--x', default='human', help="human, auto or an engine spec (default: human)")
+    parser.add_argument('--o', default='auto', help="human, auto or an engine spec (default: auto)")
+    parser.add_argument('--games', type=int, default=1)
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--quiet', action='store_true', help="print only the results")
+    args = parser.parse_args(argv)
+
+    try:
+        game = create_game(*(ULTIMATE_SIZE if args.ultimate else args.board))
+        players = [Player(spec, game, None if args.seed is None else args.seed + side)
+                   for side, spec in enumerate((args.x, args.o))]
+    except ValueError as error:
+        parser.error(str(error))
+    prompt = sys.stdin.isatty() and any(player.is_human for player in players)
+    lines = iter(sys.stdin)
+    tally = {'X': 0, 'O': 0, None: 0}
+    started = time.perf_counter()
+    for number in range(1, args.games + 1):
+        game.reset()
+        winner = play(game, players, lines, sys.stdout, args.quiet, prompt)
+        if winner is False:
+            print("game abandoned: no more moves", file=sys.stderr)
+            return 1
+        tally[winner] += 1
+        result = f"{winner} wins" if winner else "draw"
+        print(f"game {number}: {result} in {game.move_count} moves")
+    if args.games > 1:
+        elapsed = time.perf_counter() - started
+        print(f"X ({args.x}) {tally['X']}, O ({args.o}) {tally['O']}, draws {tally[None]} "
+              f"in {elapsed:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
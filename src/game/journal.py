@@ -0,0 +1,208 @@
+"""Crash-safe journal of the game window's session.
+
+Every change to the local session - a move, an undo or redo, a reset from
+Play Again, new players from New Game, the displayed stats, the clock - is
+appended to ``journal.jsonl`` as one JSON line with a sequence number.
+Lines are handed to a writer thread, which writes whatever has queued up
+within SYNC_INTERVAL and makes it durable with a single fsync, so
+recording an event never waits on the disk.
+
+Every SNAPSHOT_EVERY events the whole session is written to
+``snapshot.json`` (to a temporary file, fsynced, then renamed over the old
+one) and the journal is emptied.  Loading reads the snapshot and replays
+only the events numbered after it, so resuming costs the same however long
+the session ran.  A crash between the rename and emptying the journal
+leaves events the snapshot already holds, and their numbers say so; a line
+cut short by a crash is skipped, like in the tournament checkpoint.
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+
+DEFAULT_DIR = os.path.join(os.path.expanduser('~'), '.tic-tac-toe', 'session')
+
+JOURNAL = 'journal.jsonl'
+SNAPSHOT = 'snapshot.json'
+
+# Events written together with one fsync at most this long after the first of them
+SYNC_INTERVAL = 0.05
+
+SNAPSHOT_EVERY = 256
+
+
+class Session:
+    """The state of the window's local game, rebuilt from events"""
+
+    def __init__(self, x_name, o_name, computer, board, stats, started_at=0.0):
+        self.x_name = x_name
+        self.o_name = o_name
+        self.computer = computer
+        self.board = list(board)
+        # Displayed (wins, losses, draws) of X and of O
+        self.stats = [list(stats[0]), list(stats[1])]
+        self.moves = []
+        # Undone moves, next redo last, as in GameLogic.future
+        self.future = []
+        self.seconds = 0
+        self.pending_result = False
+        self.started_at = started_at
+
+    def apply(self, event):
+        kind = event['e']
+        if kind == 'move':
+            self.moves.append(event['cell'])
+            self.future.clear()
+        elif kind == 'goto':
+            while len(self.moves) > event['to']:
+                self.future.append(self.moves.pop())
+            while len(self.moves) < event['to'] and self.future:
+                self.moves.append(self.future.pop())
+        elif kind == 'tick':
+            self.seconds = event['seconds']
+        elif kind == 'stats':
+            self.stats = [list(event['x']), list(event['o'])]
+            self.pending_result = event['pending']
+        elif kind == 'reset':
+            self.board = list(event['board'])
+            self.moves = []
+            self.future = []
+            self.seconds = 0
+            self.pending_result = False
+            self.started_at = event['started_at']
+
+    def to_dict(self):
+        return dict(self.__dict__)
+
+    @classmethod
+    def from_dict(cls, data):
+        session = cls.__new__(cls)
+        session.__dict__.update(data)
+        return session
+
+    @classmethod
+    def from_event(cls, event):
+        """The session a 'players' event starts"""
+        return cls(event['x'], event['o'], event['computer'], event['board'],
+                   (event['x_stats'], event['o_stats']), event['started_at'])
+
+
+class Journal:
+    """Appends session events from the GUI thread and writes them on a thread of its own
+
+    ``session`` is the state left by the previous run (None if there is
+    none) and is then kept current as events are recorded.
+    """
+
+    def __init__(self, directory=DEFAULT_DIR, snapshot_every=SNAPSHOT_EVERY,
+                 sync_interval=SYNC_INTERVAL):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        self.sync_interval = sync_interval
+        self.journal_path = os.path.join(directory, JOURNAL)
+        self.snapshot_path = os.path.join(directory, SNAPSHOT)
+        self.last_error = None
+        self.replayed = 0
+        self.session, self.number = self._load()
+        self.since_snapshot = self.replayed
+        self.file = open(self.journal_path, 'a', encoding='utf-8')
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._write_loop, name="journal-writer", daemon=True)
+        self.thread.start()
+
+    def _load(self):
+        session, number = None, 0
+        try:
+            with open(self.snapshot_path, encoding='utf-8') as handle:
+                snapshot = json.load(handle)
+            session, number = Session.from_dict(snapshot['session']), snapshot['n']
+        except (OSError, ValueError, KeyError):
+            pass
+        try:
+            with open(self.journal_path, encoding='utf-8') as handle:
+                lines = handle.read().splitlines()
+        except OSError:
+            lines = []
+        for line in lines:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            if event['n'] <= number:
+                continue
+            number = event['n']
+            self.replayed += 1
+            if event['e'] == 'players':
+                session = Session.from_event(event)
+            elif session is not None:
+                session.apply(event)
+        return session, number
+
+    def record(self, kind, **fields):
+        """Apply an event to the session and queue it for the disk"""
+        self.number += 1
+        event = {'n': self.number, 'e': kind, **fields}
+        if kind == 'players':
+            self.session = Session.from_event(event)
+        elif self.session is not None:
+            self.session.apply(event)
+        self.queue.put(json.dumps(event, separators=(',', ':')) + '\n')
+        self.since_snapshot += 1
+        if self.since_snapshot >= self.snapshot_every and self.session is not None:
+            self.since_snapshot = 0
+            # Serialized here, as later events go on changing the session's lists
+            snapshot = {'n': self.number, 'session': self.session.to_dict()}
+            self.queue.put((SNAPSHOT, json.dumps(snapshot, separators=(',', ':'))))
+
+    def flush(self):
+        """Wait until every recorded event is on disk"""
+        self.queue.join()
+
+    def close(self):
+        """Write everything still queued and stop the writer"""
+        self.queue.put(None)
+        self.thread.join()
+        self.file.close()
+
+    def _write_loop(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.sync_interval
+            while batch[-1] is not None:
+                try:
+                    batch.append(self.queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            try:
+                self._write_batch(batch)
+            except OSError as error:
+                # Keep the writer alive; later events may still get through
+                self.last_error = error
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+            if batch[-1] is None:
+                return
+
+    def _write_batch(self, batch):
+        for item in batch:
+            if isinstance(item, str):
+                self.file.write(item)
+            elif item is not None:
+                self._snapshot(item)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def _snapshot(self, item):
+        """Replace the snapshot, then empty the journal it now covers"""
+        self.file.flush()
+        partial = self.snapshot_path + '.partial'
+        with open(partial, 'w', encoding='utf-8') as handle:
+            handle.write(item[1])
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(partial, self.snapshot_path)
+        self.file.truncate(0)
@@ -0,0 +1,155 @@
+"""Opt-in latency recording for the rules, the engines and the GUI.
+
+Nothing here runs until ``LatencyRecorder.instrument`` wraps a method, and
+``uninstrument`` puts the original methods back, so a disabled recorder
+costs nothing at all on the hot paths.  While enabled, each call adds its
+start time and duration (``time.perf_counter`` seconds) to a fixed-size
+ring buffer per subsystem, from which percentiles are computed on demand.
+"""
+
+import functools
+import json
+import threading
+import time
+from array import array
+
+# Samples kept per subsystem; older ones are overwritten
+CAPACITY = 4096
+
+PERCENTILES = (50, 95, 99)
+
+
+class Series:
+    """Ring buffer of (start, duration) samples for one subsystem"""
+
+    __slots__ = ('name', 'blocking', 'starts', 'durations', 'count')
+
+    def __init__(self, name, blocking=True, capacity=CAPACITY):
+        self.name = name
+        # False for work done off the GUI thread, which cannot stall it
+        self.blocking = blocking
+        self.starts = array('d', bytes(8 * capacity))
+        self.durations = array('d', bytes(8 * capacity))
+        self.count = 0
+
+    def add(self, start, duration):
+        slot = self.count % len(self.durations)
+        self.starts[slot] = start
+        self.durations[slot] = duration
+        self.count += 1
+
+    def samples(self):
+        """(start, duration) pairs still in the buffer, oldest first"""
+        size = len(self.durations)
+        if self.count <= size:
+            order = range(self.count)
+        else:
+            first = self.count % size
+            order = list(range(first, size)) + list(range(first))
+        return [(self.starts[i], self.durations[i]) for i in order]
+
+    def summary(self):
+        """Sample count and p50/p95/p99/max latency in milliseconds"""
+        kept = sorted(self.durations[:min(self.count, len(self.durations))])
+        result = {'count': self.count}
+        if not kept:
+            return result
+        for percentile in PERCENTILES:
+            index = min(len(kept) - 1, len(kept) * percentile // 100)
+            result[f'p{percentile}_ms'] = kept[index] * 1000
+        result['max_ms'] = kept[-1] * 1000
+        return result
+
+
+class LatencyRecorder:
+    """Collects timings from wrapped methods into per-subsystem ring buffers"""
+
+    def __init__(self, capacity=CAPACITY):
+        self.capacity = capacity
+        self.series = {}
+        self.patched = []
+        self.lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return bool(self.patched)
+
+    def get_series(self, name, blocking=True):
+        series = self.series.get(name)
+        if series is None:
+            series = self.series[name] = Series(name, blocking, self.capacity)
+        return series
+
+    def record(self, name, start, duration, blocking=True):
+        with self.lock:
+            self.get_series(name, blocking).add(start, duration)
+
+    def instrument(self, owner, attribute, name, blocking=True):
+        """Time every call of owner.attribute (a class or an instance) as `name`"""
+        original = getattr(owner, attribute)
+        record = self.record
+
+        @functools.wraps(original)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                record(name, start, time.perf_counter() - start, blocking)
+
+        # Remember whether the attribute was the owner's own, so removing the
+        # wrapper restores inheritance instead of pinning a copy
+        own = attribute in vars(owner)
+        self.patched.append((owner, attribute, vars(owner).get(attribute) if own else None, own))
+        setattr(owner, attribute, timed)
+
+    def uninstrument(self):
+        """Put every wrapped method back, newest first"""
+        while self.patched:
+            owner, attribute, original, own = self.patched.pop()
+            if own:
+                setattr(owner, attribute, original)
+            else:
+                delattr(owner, attribute)
+
+    def clear(self):
+        with self.lock:
+            self.series = {}
+
+    def summary(self):
+        """Percentiles for every subsystem, keyed by name"""
+        with self.lock:
+            return {name: series.summary() for name, series in sorted(self.series.items())}
+
+    def culprit(self, start, end):
+        """The blocking subsystem that ran longest between start and end, or None"""
+        best, best_overlap = None, 0.0
+        with self.lock:
+            for series in self.series.values():
+                if not series.blocking:
+                    continue
+                overlap = 0.0
+                # Samples are added as calls finish, so walk back until they
+                # finished before the window opened
+                for sample_start, duration in reversed(series.samples()):
+                    if sample_start + duration < start:
+                        break
+                    overlap += max(0.0, min(end, sample_start + duration) - max(start, sample_start))
+                if overlap > best_overlap:
+                    best, best_overlap = series.name, overlap
+        return best
+
+    def export(self, path, samples=True):
+        """Write the summary (and raw samples) as JSON"""
+        with self.lock:
+            data = {
+                'clock': 'perf_counter seconds',
+                'exported_at': time.perf_counter(),
+                'subsystems': {
+                    name: dict(series.summary(), blocking=series.blocking,
+                               **({'samples': series.samples()} if samples else {}))
+                    for name, series in sorted(self.series.items())
+                },
+            }
+        with open(path, 'w', encoding='utf-8') as handle:
+            json.dump(data, handle, indent=2)
@@ -0,0 +1,276 @@
+"""Monte Carlo Tree Search (UCT) player for boards too large to search exhaustively.
+
+The search runs until a wall-clock budget (``time_limit`` seconds) or a
+playout budget (``playouts``) is used up and plays the most visited move.
+The tree is kept between moves: the next search starts from the node for
+the position actually reached, so the playouts spent on the line the game
+followed are not thrown away.  With ``workers`` > 1 each move is also
+searched in that many processes from the same position and their root
+statistics are summed before choosing.
+"""
+
+import math
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .game_logic import board_shape
+
+EXPLORATION = 1.4
+
+# Boards larger than this only expand cells next to existing marks
+NEIGHBOURHOOD_CELLS = 25
+
+
+class Node:
+    __slots__ = ('masks', 'turn', 'move', 'parent', 'children', 'untried',
+                 'visits', 'value', 'terminal')
+
+    def __init__(self, masks, turn, move=None, parent=None, terminal=None):
+        self.masks = masks
+        self.turn = turn
+        self.move = move
+        self.parent = parent
+        self.children = {}
+        self.untried = None
+        self.visits = 0
+        # Total reward for the player who made `move`
+        self.value = 0.0
+        # None while the game goes on, else the reward for the player who made `move`
+        self.terminal = terminal
+
+
+class MCTSEngine:
+    """UCT player limited by time or playouts, optionally spread over processes"""
+
+    name = "MCTS"
+
+    def __init__(self, time_limit=0.2, playouts=None, workers=1, seed=None):
+        if time_limit is None and playouts is None:
+            raise ValueError("MCTS needs a time or playout budget")
+        self.time_limit = time_limit
+        self.playouts = playouts
+        self.workers = workers
+        self.random = random.Random(seed)
+        self.root = None
+        self.shape = None
+        self.executor = None
+        self.cancel = None
+        self.last_playouts = 0
+
+    def _prepare(self, shape):
+        if shape is self.shape:
+            return
+        self.shape = shape
+        self.root = None
+        self.neighbours = None
+        if shape.cells > NEIGHBOURHOOD_CELLS:
+            self.neighbours = []
+            for cell in range(shape.cells):
+                row, col = divmod(cell, shape.cols)
+                mask = 0
+                for r in range(max(0, row - 1), min(shape.rows, row + 2)):
+                    for c in range(max(0, col - 1), min(shape.cols, col + 2)):
+                        mask |= 1 << (r * shape.cols + c)
+                self.neighbours.append(mask)
+
+    def close(self):
+        """Shut down the worker processes, if any were started"""
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+
+    def choose_move(self, game, cancel=None):
+        """Return the (row, col) of the most visited move after searching `game`
+
+        `cancel` is an optional threading.Event; setting it ends the search
+        early, and no move is returned.
+        """
+        self._prepare(game.shape)
+        self.cancel = cancel
+        root = self._reuse_root(tuple(game.masks), game.turn)
+        if self.workers > 1:
+            stats = self._parallel_stats(root)
+        else:
+            self._run(root)
+            stats = self.root_stats(root)
+        if not stats or self._cancelled():
+            return None
+        cell = max(stats, key=lambda move: stats[move][0])
+        # Keep the subtree below the chosen move for the next search
+        child = root.children.get(cell)
+        self.root = child
+        if child is not None:
+            child.parent = None
+        return divmod(cell, game.cols)
+
+    def ponder(self, game, cancel=None):
+        """Spend one budget growing the tree for `game`; return its root statistics
+
+        The root stays at `game`, so calling again keeps refining the same
+        tree, and a later choose_move starts from everything found here.
+        """
+        self._prepare(game.shape)
+        self.cancel = cancel
+        root = self.root = self._reuse_root(tuple(game.masks), game.turn)
+        self._run(root)
+        return self.root_stats(root)
+
+    def _cancelled(self):
+        return self.cancel is not None and self.cancel.is_set()
+
+    def root_stats(self, root):
+        """Return {cell: (visits, value)} for the children of `root`"""
+        return {cell: (child.visits, child.value) for cell, child in root.children.items()}
+
+    def _reuse_root(self, masks, turn):
+        """Find the node for `masks` below the previous root, or start a new tree"""
+        node = self.root
+        if node is not None:
+            # The position can be at most a couple of plies below the old root
+            frontier = [node]
+            for _ in range(3):
+                match = next((n for n in frontier if n.masks == masks), None)
+                if match is not None:
+                    match.parent = None
+                    return match
+                frontier = [child for n in frontier for child in n.children.values()
+                            if child.masks[0] & masks[0] == child.masks[0]
+                            and child.masks[1] & masks[1] == child.masks[1]]
+        self.root = Node(masks, turn)
+        return self.root
+
+    def _parallel_stats(self, root):
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(self.workers)
+        shape = self.shape
+        futures = [
+            self.executor.submit(_worker_search, shape.rows, shape.cols, shape.k,
+                                 root.masks, root.turn, self.time_limit,
+                                 None if self.playouts is None else self.playouts // self.workers,
+                                 self.random.getrandbits(32))
+            for _ in range(self.workers - 1)
+        ]
+        # This process searches too, and keeps its own tree for reuse
+        if self.playouts is not None:
+            self._run(root, self.playouts // self.workers)
+        else:
+            self._run(root)
+        stats = self.root_stats(root)
+        if self._cancelled():
+            for future in futures:
+                future.cancel()
+            return {}
+        total_playouts = self.last_playouts
+        for future in futures:
+            worker_stats, playouts = future.result()
+            total_playouts += playouts
+            for cell, (visits, value) in worker_stats.items():
+                old_visits, old_value = stats.get(cell, (0, 0.0))
+                stats[cell] = (old_visits + visits, old_value + value)
+        self.last_playouts = total_playouts
+        return stats
+
+    def _run(self, root, playouts=None):
+        """Grow the tree from `root` until the budget is spent"""
+        playouts = self.playouts if playouts is None else playouts
+        deadline = None if self.time_limit is None else time.monotonic() + self.time_limit
+        done = 0
+        while True:
+            if playouts is not None and done >= playouts:
+                break
+            if not done & 15:
+                if self._cancelled():
+                    break
+                if deadline is not None and time.monotonic() >= deadline:
+                    break
+            self._iterate(root)
+            done += 1
+        self.last_playouts = done
+
+    def _iterate(self, root):
+        node = root
+        # Selection
+        while node.terminal is None and not node.untried and node.children:
+            node = self._select(node)
+        # Expansion
+        if node.terminal is None:
+            if node.untried is None:
+                node.untried = self._candidates(node.masks)
+            if node.untried:
+                cell = node.untried.pop(self.random.randrange(len(node.untried)))
+                node = self._expand(node, cell)
+        # Simulation
+        reward = node.terminal if node.terminal is not None else self._playout(node)
+        # Backpropagation: reward is for the player who made node.move
+        while node is not None:
+            node.visits += 1
+            node.value += reward
+            reward = 1.0 - reward
+            node = node.parent
+
+    def _select(self, node):
+        log_visits = math.log(node.visits)
+        best = None
+        best_score = -1.0
+        for child in node.children.values():
+            score = child.value / child.visits + EXPLORATION * math.sqrt(log_visits / child.visits)
+            if score > best_score:
+                best_score = score
+                best = child
+        return best
+
+    def _candidates(self, masks):
+        occupied = masks[0] | masks[1]
+        free = ~occupied & self.shape.full_mask
+        if self.neighbours is not None:
+            if not occupied:
+                centre = (self.shape.rows // 2) * self.shape.cols + self.shape.cols // 2
+                return [centre]
+            near = 0
+            rest = occupied
+            while rest:
+                low = rest & -rest
+                near |= self.neighbours[low.bit_length() - 1]
+                rest ^= low
+            free &= near
+        return [cell for cell in range(self.shape.cells) if free >> cell & 1]
+
+    def _expand(self, node, cell):
+        masks = list(node.masks)
+        mask = masks[node.turn] | 1 << cell
+        masks[node.turn] = mask
+        masks = tuple(masks)
+        terminal = None
+        if self.shape.find_line(mask, cell):
+            terminal = 1.0
+        elif masks[0] | masks[1] == self.shape.full_mask:
+            terminal = 0.5
+        child = Node(masks, node.turn ^ 1, cell, node, terminal)
+        node.children[cell] = child
+        return child
+
+    def _playout(self, node):
+        """Play random moves to the end; return the reward for the player who made node.move"""
+        shape = self.shape
+        masks = list(node.masks)
+        turn = node.turn
+        free = ~(masks[0] | masks[1]) & shape.full_mask
+        cells = [cell for cell in range(shape.cells) if free >> cell & 1]
+        self.random.shuffle(cells)
+        for cell in cells:
+            mask = masks[turn] | 1 << cell
+            masks[turn] = mask
+            if shape.find_line(mask, cell):
+                return 0.0 if turn == node.turn else 1.0
+            turn ^= 1
+        return 0.5
+
+
+def _worker_search(rows, cols, k, masks, turn, time_limit, playouts, seed):
+    """Run one independent search in a worker process and return its root statistics"""
+    engine = MCTSEngine(time_limit=time_limit, playouts=playouts, seed=seed)
+    engine._prepare(board_shape(rows, cols, k))
+    root = Node(tuple(masks), turn)
+    engine._run(root)
+    return engine.root_stats(root), engine.last_playouts
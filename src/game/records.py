@@ -0,0 +1,275 @@
+"""Compact append-only file of finished games.
+
+A record file starts with MAGIC and then holds one record per game:
+
+    RECORD_HEADER  rows, cols, k, result, move count, name lengths,
+                   start time (unix seconds) and duration (seconds)
+    X name, O name (UTF-8)
+    moves          one byte per move (the cell index), or two bytes
+                   little-endian on boards with more than 256 cells
+
+An ultimate game is stored as a 9x9 board with k = 0.
+
+Next to ``games.rec`` the writer keeps ``games.rec.idx``, an array of
+little-endian uint64 record offsets, so game N can be read without
+scanning the file.  Both files are read through mmap, so iterating over
+millions of records never loads the file into memory.
+"""
+
+import mmap
+import os
+import struct
+
+from .game_logic import PLAYERS
+
+MAGIC = b'TTTREC1\n'
+
+RECORD_HEADER = struct.Struct('<BBBBHBBdf')
+OFFSET = struct.Struct('<Q')
+
+DRAW, X_WINS, O_WINS, UNFINISHED = 0, 1, 2, 3
+RESULTS = {None: DRAW, 'X': X_WINS, 'O': O_WINS}
+
+DEFAULT_PATH = os.path.join(os.path.expanduser('~'), '.tic-tac-toe', 'games.rec')
+
+
+def index_path(path):
+    return path + '.idx'
+
+
+class GameRecord:
+    __slots__ = ('x_name', 'o_name', 'rows', 'cols', 'k', 'result', 'moves',
+                 'started_at', 'duration')
+
+    def __init__(self, x_name, o_name, moves, result, rows=3, cols=3, k=3,
+                 started_at=0.0, duration=0.0):
+        self.x_name = x_name
+        self.o_name = o_name
+        self.moves = list(moves)
+        self.result = result
+        self.rows = rows
+        self.cols = cols
+        self.k = k
+        self.started_at = started_at
+        self.duration = duration
+
+    @classmethod
+    def from_game(cls, game, x_name, o_name, started_at=0.0, duration=0.0):
+        """Build a record from a GameLogic that has been played"""
+        if game.winner is not None:
+            result = RESULTS[game.winner]
+        elif game.is_board_full():
+            result = DRAW
+        else:
+            result = UNFINISHED
+        return cls(x_name, o_name, game.history, result, game.rows, game.cols, game.k,
+                   started_at, duration)
+
+    @property
+    def winner(self):
+        """'X', 'O', or None for a draw or unfinished game"""
+        if self.result in (X_WINS, O_WINS):
+            return PLAYERS[self.result - 1]
+        return None
+
+    def to_game(self, moves=None):
+        """Return the game after the first `moves` moves (all of them by default)"""
+        from .ultimate import create_game
+        game = create_game(self.rows, self.cols, self.k)
+        for cell in self.moves[:moves]:
+            game.make_move(*divmod(cell, self.cols))
+        return game
+
+    def pack(self):
+        x_name = self.x_name.encode('utf-8')[:255]
+        o_name = self.o_name.encode('utf-8')[:255]
+        if self.rows * self.cols > 256:
+            moves = b''.join(cell.to_bytes(2, 'little') for cell in self.moves)
+        else:
+            moves = bytes(self.moves)
+        return (RECORD_HEADER.pack(self.rows, self.cols, self.k, self.result, len(self.moves),
+                                   len(x_name), len(o_name), self.started_at, self.duration)
+                + x_name + o_name + moves)
+
+    @classmethod
+    def unpack_from(cls, buffer, offset):
+        """Decode the record at `offset`; return it with the offset of the next one
+
+        Raises ValueError for a record cut short, as a crash mid-append leaves one.
+        """
+        if offset + RECORD_HEADER.size > len(buffer):
+            raise ValueError(f"record at {offset} is cut short")
+        (rows, cols, k, result, count, x_len, o_len,
+         started_at, duration) = RECORD_HEADER.unpack_from(buffer, offset)
+        offset += RECORD_HEADER.size
+        if offset + x_len + o_len + count * (2 if rows * cols > 256 else 1) > len(buffer):
+            raise ValueError(f"record at {offset - RECORD_HEADER.size} is cut short")
+        x_name = bytes(buffer[offset:offset + x_len]).decode('utf-8', 'replace')
+        offset += x_len
+        o_name = bytes(buffer[offset:offset + o_len]).decode('utf-8', 'replace')
+        offset += o_len
+        if rows * cols > 256:
+            end = offset + 2 * count
+            raw = buffer[offset:end]
+            moves = [int.from_bytes(raw[i:i + 2], 'little') for i in range(0, len(raw), 2)]
+        else:
+            end = offset + count
+            moves = list(buffer[offset:end])
+        return cls(x_name, o_name, moves, result, rows, cols, k, started_at, duration), end
+
+    def __repr__(self):
+        return (f"GameRecord({self.x_name!r}, {self.o_name!r}, moves={self.moves}, "
+                f"result={self.result}, board={self.rows}x{self.cols}/{self.k})")
+
+
+class RecordWriter:
+    """Appends records to a game file and its offset index"""
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            with open(path, 'wb') as handle:
+                handle.write(MAGIC)
+            open(index_path(path), 'wb').close()
+        elif not index_is_current(path):
+            end = rebuild_index(path)
+            if end < os.path.getsize(path):
+                # Drop a record torn by a crash, so new ones follow the last whole one
+                with open(path, 'r+b') as handle:
+                    handle.truncate(end)
+        self.file = open(path, 'ab')
+        self.index = open(index_path(path), 'ab')
+
+    def append(self, record):
+        """Write one record and return its number"""
+        offset = self.file.tell()
+        self.file.write(record.pack())
+        self.file.flush()
+        number = self.index.tell() // OFFSET.size
+        self.index.write(OFFSET.pack(offset))
+        self.index.flush()
+        return number
+
+    def close(self):
+        self.file.close()
+        self.index.close()
+
+
+def _map(path):
+    """Map a file read-only, or return b'' for an empty one (mmap rejects those)"""
+    with open(path, 'rb') as handle:
+        if os.fstat(handle.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def iter_records(path=DEFAULT_PATH):
+    """Yield every record in the file in order, without loading it all"""
+    data = _map(path)
+    try:
+        if data[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a game record file")
+        offset = len(MAGIC)
+        end = len(data)
+        while offset < end:
+            try:
+                record, offset = GameRecord.unpack_from(data, offset)
+            except ValueError:
+                # A record torn by a crash ends the file
+                break
+            yield record
+    finally:
+        if isinstance(data, mmap.mmap):
+            data.close()
+
+
+def rebuild_index(path):
+    """Recreate the offset index by scanning the record file; return where its last whole record ends
+
+    A record torn by a crash is left out of the index.
+    """
+    data = _map(path)
+    try:
+        offset = len(MAGIC)
+        with open(index_path(path), 'wb') as index:
+            while offset < len(data):
+                try:
+                    _, end = GameRecord.unpack_from(data, offset)
+                except ValueError:
+                    break
+                index.write(OFFSET.pack(offset))
+                offset = end
+        return min(offset, len(data))
+    finally:
+        if isinstance(data, mmap.mmap):
+            data.close()
+
+
+def index_is_current(path):
+    """Whether the index exists and its last offset is that of the file's last record
+
+    A crash between appending a record and appending its offset leaves an
+    index one entry short, which would hide that game.
+    """
+    index = index_path(path)
+    if not os.path.exists(index):
+        return False
+    size = os.path.getsize(index)
+    if size % OFFSET.size:
+        return False
+    data = _map(path)
+    try:
+        if not size:
+            return len(data) <= len(MAGIC)
+        with open(index, 'rb') as handle:
+            handle.seek(size - OFFSET.size)
+            last, = OFFSET.unpack(handle.read(OFFSET.size))
+        try:
+            _, end = GameRecord.unpack_from(data, last)
+        except ValueError:
+            return False
+        return end == len(data)
+    finally:
+        if isinstance(data, mmap.mmap):
+            data.close()
+
+
+class RecordReader:
+    """Random access to the records of a file through its offset index"""
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        if not index_is_current(path):
+            rebuild_index(path)
+        self.data = _map(path)
+        self.index = _map(index_path(path))
+        if self.data[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a game record file")
+
+    def __len__(self):
+        return len(self.index) // OFFSET.size
+
+    def __getitem__(self, number):
+        if number < 0:
+            number += len(self)
+        if not 0 <= number < len(self):
+            raise IndexError(f"no game {number} in {self.path}")
+        offset, = OFFSET.unpack_from(self.index, number * OFFSET.size)
+        return GameRecord.unpack_from(self.data, offset)[0]
+
+    def __iter__(self):
+        return iter_records(self.path)
+
+    def close(self):
+        for data in (self.data, self.index):
+            if isinstance(data, mmap.mmap):
+                data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
@@ -0,0 +1,199 @@
+"""Precomputed solution of 3x3 tic-tac-toe, stored as a memory-mapped asset.
+
+Every reachable position is solved once by ``python -m game.solved_table``
+(run from src/), which writes assets/solved_3x3.bin.  Positions are folded
+onto their canonical image under the 8 board symmetries and addressed by
+the base-3 number of that image (0 empty, 1 side to move, 2 opponent), so
+a lookup is a few table reads with no search and no warm-up.
+
+File layout: the 8-byte header MAGIC, then 3**9 entries of two bytes each.
+The first byte is 0 for a slot that is not a canonical reachable position,
+otherwise ``outcome | plies << 2`` where outcome is LOSS, DRAW or WIN for
+the side to move and plies is the number of moves left with best play.
+The second byte is the best move in canonical coordinates, or NO_MOVE.
+"""
+
+import mmap
+import os
+
+from .ai import Symmetries
+from .game_logic import board_shape
+
+MAGIC = b'TTTSOLV1'
+HEADER_SIZE = len(MAGIC)
+ENTRY_SIZE = 2
+ENTRIES = 3 ** 9
+
+LOSS, DRAW, WIN = 1, 2, 3
+NO_MOVE = 0xFF
+
+ASSET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          os.pardir, os.pardir, 'assets', 'solved_3x3.bin')
+
+SHAPE = board_shape(3, 3, 3)
+
+# BASE3[mask] is the base-3 number with a 1 in every digit set in mask
+BASE3 = tuple(sum(3 ** cell for cell in range(9) if mask >> cell & 1) for mask in range(512))
+
+
+class _Canonicalizer:
+    def __init__(self):
+        self.symmetries = Symmetries(SHAPE)
+        self.inverse = []
+        for perm in self.symmetries.perms:
+            inverse = [0] * 9
+            for cell, image in enumerate(perm):
+                inverse[image] = cell
+            self.inverse.append(tuple(inverse))
+
+    def canonical(self, me, opp):
+        """Return (index, symmetry) of the smallest base-3 image of the position"""
+        transform = self.symmetries.transform
+        best = None
+        for number in range(len(self.symmetries.perms)):
+            index = BASE3[transform(me, number)] + 2 * BASE3[transform(opp, number)]
+            if best is None or index < best[0]:
+                best = (index, number)
+        return best
+
+
+_canonicalizer = None
+
+
+def _get_canonicalizer():
+    global _canonicalizer
+    if _canonicalizer is None:
+        _canonicalizer = _Canonicalizer()
+    return _canonicalizer
+
+
+class SolvedTable:
+    """Read-only view of the solved table; entries are read straight from the mmap"""
+
+    def __init__(self, path=ASSET_PATH):
+        with open(path, 'rb') as handle:
+            self.data = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.data[:HEADER_SIZE] != MAGIC or len(self.data) != HEADER_SIZE + ENTRIES * ENTRY_SIZE:
+            self.data.close()
+            raise ValueError(f"{path} is not a solved 3x3 table")
+        self.canonicalizer = _get_canonicalizer()
+
+    def close(self):
+        self.data.close()
+
+    def lookup(self, me, opp):
+        """Return (outcome, plies, best cell) for the side owning `me`, or None if unknown"""
+        index, number = self.canonicalizer.canonical(me, opp)
+        offset = HEADER_SIZE + index * ENTRY_SIZE
+        value = self.data[offset]
+        if not value:
+            return None
+        move = self.data[offset + 1]
+        if move != NO_MOVE:
+            move = self.canonicalizer.inverse[number][move]
+        return value & 3, value >> 2, move
+
+
+class TableEngine:
+    """Perfect 3x3 player that answers every move with one table lookup"""
+
+    name = "Solved table"
+
+    def __init__(self, table=None):
+        self.table = table or load_table()
+
+    def choose_move(self, game, cancel=None):
+        """Return the (row, col) of the best move in `game`; a lookup needs no cancelling"""
+        entry = self.table.lookup(game.masks[game.turn], game.masks[game.turn ^ 1])
+        if entry is None or entry[2] == NO_MOVE:
+            return None
+        return divmod(entry[2], 3)
+
+    def move_values(self, game):
+        """Return {cell: LOSS, DRAW or WIN} for every move of the side to play"""
+        values = {}
+        if game.is_over():
+            return values
+        me, opp = game.masks[game.turn], game.masks[game.turn ^ 1]
+        free = ~(me | opp) & SHAPE.full_mask
+        for cell in range(SHAPE.cells):
+            if not free >> cell & 1:
+                continue
+            mine = me | 1 << cell
+            if SHAPE.find_line(mine, cell):
+                values[cell] = WIN
+            elif mine | opp == SHAPE.full_mask:
+                values[cell] = DRAW
+            else:
+                # The reply's outcome is the opponent's, so a loss for them is a win here
+                values[cell] = 4 - self.table.lookup(opp, mine)[0]
+        return values
+
+
+_table = None
+
+
+def load_table():
+    """Return the shared table, mapping the asset on first use"""
+    global _table
+    if _table is None:
+        _table = SolvedTable()
+    return _table
+
+
+def solve_all():
+    """Solve every reachable position; return {canonical index: (value byte, move)}"""
+    canonicalizer = _get_canonicalizer()
+    find_line = SHAPE.find_line
+    full = SHAPE.full_mask
+    solved = {}
+
+    def solve(me, opp):
+        index, number = canonicalizer.canonical(me, opp)
+        if index in solved:
+            return solved[index][0]
+        free = ~(me | opp) & full
+        if not free:
+            solved[index] = (DRAW, NO_MOVE)
+            return DRAW
+        best = None
+        best_cell = None
+        for cell in range(9):
+            if not free >> cell & 1:
+                continue
+            mine = me | 1 << cell
+            if find_line(mine, cell):
+                outcome, plies = WIN, 1
+            else:
+                reply = solve(opp, mine)
+                outcome, plies = 4 - (reply & 3), (reply >> 2) + 1
+            # Prefer the better outcome, then the quickest win or the longest loss
+            rank = (outcome, -plies if outcome == WIN else plies)
+            if best is None or rank > best:
+                best = rank
+                best_cell = cell
+        value = best[0] | abs(best[1]) << 2
+        solved[index] = (value, canonicalizer.symmetries.perms[number][best_cell])
+        return value
+
+    solve(0, 0)
+    return solved
+
+
+def build(path=ASSET_PATH):
+    """Solve the game and write the packed table to `path`"""
+    solved = solve_all()
+    entries = bytearray(ENTRIES * ENTRY_SIZE)
+    for index, (value, move) in solved.items():
+        entries[index * ENTRY_SIZE] = value
+        entries[index * ENTRY_SIZE + 1] = move
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as handle:
+        handle.write(MAGIC)
+        handle.write(entries)
+    return len(solved)
+
+
+if __name__ == "__main__":
+    count = build()
+    print(f"Wrote {count} canonical positions to {os.path.normpath(ASSET_PATH)}")
@@ -0,0 +1,239 @@
+"""Player statistics, kept in memory for display and persisted in SQLite.
+
+StatsStore records every finished game.  Writes are queued and applied by
+a background thread in batched transactions on a WAL-mode database, so
+recording a result never waits on the disk.  Running totals per player and
+per pairing are maintained as games arrive, and indexes keep leaderboard
+and history queries fast however many games have been stored.
+"""
+
+import contextlib
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+DEFAULT_PATH = os.path.join(os.path.expanduser('~'), '.tic-tac-toe', 'stats.db')
+
+# Most results written in a single transaction
+BATCH_SIZE = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS players (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    x_player INTEGER NOT NULL REFERENCES players(id),
+    o_player INTEGER NOT NULL REFERENCES players(id),
+    winner TEXT,
+    moves INTEGER NOT NULL,
+    duration REAL NOT NULL,
+    played_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS games_by_x ON games (x_player, played_at);
+CREATE INDEX IF NOT EXISTS games_by_o ON games (o_player, played_at);
+CREATE TABLE IF NOT EXISTS totals (
+    player_id INTEGER PRIMARY KEY REFERENCES players(id),
+    wins INTEGER NOT NULL DEFAULT 0,
+    losses INTEGER NOT NULL DEFAULT 0,
+    draws INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS totals_by_wins ON totals (wins DESC, draws DESC);
+CREATE TABLE IF NOT EXISTS head_to_head (
+    player_id INTEGER NOT NULL REFERENCES players(id),
+    opponent_id INTEGER NOT NULL REFERENCES players(id),
+    wins INTEGER NOT NULL DEFAULT 0,
+    losses INTEGER NOT NULL DEFAULT 0,
+    draws INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (player_id, opponent_id)
+) WITHOUT ROWID;
+"""
+
+ADD_TOTALS = """
+INSERT INTO totals (player_id, wins, losses, draws) VALUES (?, ?, ?, ?)
+ON CONFLICT (player_id) DO UPDATE SET
+    wins = wins + excluded.wins,
+    losses = losses + excluded.losses,
+    draws = draws + excluded.draws
+"""
+
+ADD_HEAD_TO_HEAD = """
+INSERT INTO head_to_head (player_id, opponent_id, wins, losses, draws) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (player_id, opponent_id) DO UPDATE SET
+    wins = wins + excluded.wins,
+    losses = losses + excluded.losses,
+    draws = draws + excluded.draws
+"""
+
+
+class PlayerStats:
+    def __init__(self, name, wins=0, losses=0, draws=0):
+        self.name = name
+        self.wins = wins
+        self.losses = losses
+        self.draws = draws
+
+    def add_win(self):
+        self.wins += 1
+
+    def add_loss(self):
+        self.losses += 1
+
+    def add_draw(self):
+        self.draws += 1
+
+    def get_stats_string(self):
+        return f"W: {self.wins} | L: {self.losses} | D: {self.draws}"
+
+    def __repr__(self):
+        return f"PlayerStats({self.name!r}, wins={self.wins}, losses={self.losses}, draws={self.draws})"
+
+
+def _connect(path):
+    connection = sqlite3.connect(path, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+
+class StatsStore:
+    """SQLite-backed record of finished games with per-player and head-to-head totals"""
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        writer = _connect(path)
+        writer.executescript(SCHEMA)
+        writer.commit()
+        # An in-memory database is private to its connection, so share it
+        self.reader = writer if path == ':memory:' else _connect(path)
+        self.read_lock = threading.Lock()
+        self.last_error = None
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._write_loop, args=(writer,),
+                                       name="stats-writer", daemon=True)
+        self.thread.start()
+
+    def record_game(self, x_name, o_name, winner, moves, duration, played_at=None):
+        """Queue a finished game; winner is 'X', 'O' or None for a draw"""
+        if winner not in ('X', 'O', None):
+            raise ValueError(f"winner must be 'X', 'O' or None, not {winner!r}")
+        self.queue.put((x_name, o_name, winner, moves, duration,
+                        time.time() if played_at is None else played_at))
+
+    def flush(self):
+        """Wait until every queued result has been written"""
+        self.queue.join()
+
+    def close(self):
+        """Write anything still queued and close the database"""
+        self.queue.put(None)
+        self.thread.join()
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
+
+    def _write_loop(self, connection):
+        player_ids = {}
+
+        def player_id(name):
+            if name not in player_ids:
+                connection.execute("INSERT OR IGNORE INTO players (name) VALUES (?)", (name,))
+                player_ids[name] = connection.execute(
+                    "SELECT id FROM players WHERE name = ?", (name,)).fetchone()[0]
+            return player_ids[name]
+
+        # Readers only have to wait when they share this connection
+        lock = self.read_lock if connection is self.reader else contextlib.nullcontext()
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in batch
+            games = [game for game in batch if game is not None]
+            try:
+                if games:
+                    with lock, connection:
+                        self._write_batch(connection, player_id, games)
+            except sqlite3.Error as error:
+                # The batch was rolled back; keep the writer alive for later results
+                self.last_error = error
+                player_ids.clear()
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+            if stop:
+                if connection is not self.reader:
+                    connection.close()
+                return
+
+    def _write_batch(self, connection, player_id, games):
+        """Insert a batch of games and fold their results into the running totals"""
+        rows = []
+        totals = {}
+        pairs = {}
+        for x_name, o_name, winner, moves, duration, played_at in games:
+            x_id, o_id = player_id(x_name), player_id(o_name)
+            rows.append((x_id, o_id, winner, moves, duration, played_at))
+            # Result columns are (wins, losses, draws) from each player's side
+            column = 2 if winner is None else 0
+            for me, opponent, mine in ((x_id, o_id, 'X'), (o_id, x_id, 'O')):
+                if winner is not None:
+                    column = 0 if winner == mine else 1
+                totals.setdefault(me, [0, 0, 0])[column] += 1
+                pairs.setdefault((me, opponent), [0, 0, 0])[column] += 1
+        connection.executemany(
+            "INSERT INTO games (x_player, o_player, winner, moves, duration, played_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)", rows)
+        connection.executemany(ADD_TOTALS, [(player, *counts) for player, counts in totals.items()])
+        connection.executemany(ADD_HEAD_TO_HEAD,
+                               [(*pair, *counts) for pair, counts in pairs.items()])
+
+    def _query(self, sql, params=()):
+        with self.read_lock:
+            return self.reader.execute(sql, params).fetchall()
+
+    def player_stats(self, name):
+        """Return the lifetime PlayerStats for `name` (all zero if never recorded)"""
+        rows = self._query(
+            "SELECT wins, losses, draws FROM totals JOIN players ON players.id = totals.player_id "
+            "WHERE players.name = ?", (name,))
+        return PlayerStats(name, *rows[0]) if rows else PlayerStats(name)
+
+    def head_to_head(self, name, opponent):
+        """Return `name`'s record against `opponent` as PlayerStats"""
+        rows = self._query(
+            "SELECT h.wins, h.losses, h.draws FROM head_to_head h "
+            "JOIN players p ON p.id = h.player_id JOIN players o ON o.id = h.opponent_id "
+            "WHERE p.name = ? AND o.name = ?", (name, opponent))
+        return PlayerStats(name, *rows[0]) if rows else PlayerStats(name)
+
+    def leaderboard(self, limit=10):
+        """Return the top `limit` players by wins, then draws"""
+        rows = self._query(
+            "SELECT players.name, wins, losses, draws FROM totals "
+            "JOIN players ON players.id = totals.player_id "
+            "ORDER BY wins DESC, draws DESC LIMIT ?", (limit,))
+        return [PlayerStats(*row) for row in rows]
+
+    def history(self, name, limit=20):
+        """Return `name`'s most recent games, newest first
+
+        Each game is (played_at, x name, o name, winner, moves, duration).
+        """
+        return self._query(
+            "SELECT g.played_at, x.name, o.name, g.winner, g.moves, g.duration FROM ("
+            "  SELECT * FROM (SELECT games.* FROM games JOIN players ON players.id = games.x_player"
+            "                 WHERE players.name = ?1 ORDER BY played_at DESC LIMIT ?2)"
+            "  UNION"
+            "  SELECT * FROM (SELECT games.* FROM games JOIN players ON players.id = games.o_player"
+            "                 WHERE players.name = ?1 ORDER BY played_at DESC LIMIT ?2)"
+            ") g JOIN players x ON x.id = g.x_player JOIN players o ON o.id = g.o_player "
+            "ORDER BY g.played_at DESC LIMIT ?2", (name, limit))
@@ -0,0 +1,402 @@
+"""Retrograde tablebases for boards of up to 16 cells (4x4, 3x5, ...).
+
+Moves only ever add a mark, so every position with n marks leads to
+positions with n + 1 marks.  The generator therefore solves the board one
+piece count at a time, starting from the full board and working back to
+the empty one.  Each level is split into chunks that a process pool
+solves in parallel, reading the finished level above from the shared
+table file.
+
+A position is addressed by a perfect hash of its canonical image (the
+image with the smallest hash under the board's symmetries).  The hash
+of a position with n marks is its level's offset, plus the rank of its
+set of occupied cells among all n-cell subsets times C(n, n // 2), plus
+the rank of O's cells among those occupied cells.  Each slot
+holds two bits: 0 for a slot that is not a canonical legal position,
+otherwise LOSS, DRAW or WIN for the side to move, as in solved_table.
+
+File layout: HEADER (magic, rows, cols, k, position count), then the
+2-bit values packed four to a byte, lowest bits first.
+
+    python -m game.tablebase --board 4 4 3
+"""
+
+import argparse
+import mmap
+import os
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
+from math import comb
+
+from .ai import Symmetries
+from .game_logic import board_shape
+from .solved_table import DRAW, LOSS, WIN
+
+MAGIC = b'TTTBASE1'
+HEADER = struct.Struct('<8sBBBxQ')
+
+# 2**16 entries per rank table; bigger boards would also need 3**25-sized files
+MAX_CELLS = 16
+
+# Positions enumerated at once by a worker, which bounds its memory
+CHUNK = 1 << 18
+
+DEFAULT_DIR = os.path.join(os.path.expanduser('~'), '.tic-tac-toe', 'tablebases')
+
+
+def tablebase_path(rows, cols, k, directory=DEFAULT_DIR):
+    return os.path.join(directory, f'{rows}x{cols}k{k}.bin')
+
+
+class Indexer:
+    """Perfect hashing of positions on one board, for single positions or numpy arrays"""
+
+    def __init__(self, shape):
+        import numpy as np
+
+        if shape.cells > MAX_CELLS:
+            raise ValueError(f"tablebases are limited to {MAX_CELLS} cells")
+        self.shape = shape
+        cells = shape.cells
+        masks = np.arange(1 << cells, dtype=np.int64)
+        counts = np.zeros(1 << cells, dtype=np.int64)
+        for cell in range(cells):
+            counts += masks >> cell & 1
+        # rank[mask] is the position of mask among masks with as many bits, in ascending order
+        self.rank = np.zeros(1 << cells, dtype=np.int64)
+        self.masks_by_count = []
+        for count in range(cells + 1):
+            same = masks[counts == count]
+            self.rank[same] = np.arange(len(same))
+            self.masks_by_count.append(same)
+
+        # Level n holds every way to place ceil(n/2) X and floor(n/2) O marks;
+        # offsets are kept multiples of 4 so levels never share a byte
+        self.level_size = [comb(cells, n) * comb(n, n // 2) for n in range(cells + 1)]
+        self.offset = []
+        total = 0
+        for size in self.level_size:
+            self.offset.append(total)
+            total += -(-size // 4) * 4
+        self.total = total
+
+        # pext[occupied byte << 8 | O byte] squeezes O's bits down to the occupied ones
+        occupied, sub = np.arange(1 << 16, dtype=np.int64) >> 8, np.arange(1 << 16, dtype=np.int64) & 255
+        pext = np.zeros(1 << 16, dtype=np.int64)
+        seen = np.zeros(1 << 16, dtype=np.int64)
+        for bit in range(8):
+            here = occupied >> bit & 1
+            pext |= (sub >> bit & here) << seen
+            seen += here
+        self.pext = pext
+        self.popcount8 = np.array([bin(byte).count('1') for byte in range(256)], dtype=np.int64)
+
+        symmetries = Symmetries(shape)
+        self.symmetry_tables = [[np.array(table, dtype=np.int64) for table in chunks]
+                                for chunks in symmetries.tables]
+        self.lines = [int(line) for line in shape.line_masks]
+
+        # Plain-int copies for looking up one position at a time
+        self.rank_list = self.rank.tolist()
+        self.pext_list = pext.tolist()
+        self.symmetries = symmetries
+
+    # Vectorised versions, used by the generator
+
+    def permute(self, mask, number):
+        tables = self.symmetry_tables[number]
+        image = tables[0][mask & 255]
+        if len(tables) > 1:
+            image |= tables[1][mask >> 8 & 255]
+        return image
+
+    def hash(self, level, x, o):
+        occupied = x | o
+        low = occupied & 255
+        pattern = self.pext[low << 8 | (o & 255)] | (
+            self.pext[(occupied >> 8 & 255) << 8 | (o >> 8 & 255)] << self.popcount8[low])
+        return self.offset[level] + self.rank[occupied] * comb(level, level // 2) + self.rank[pattern]
+
+    def canonical_hash(self, level, x, o):
+        import numpy as np
+
+        best = self.hash(level, x, o)
+        for number in range(1, len(self.symmetry_tables)):
+            best = np.minimum(best, self.hash(level, self.permute(x, number), self.permute(o, number)))
+        return best
+
+    def unhash(self, level, ranks):
+        """(x, o) masks of the positions with the given ranks within a level"""
+        import numpy as np
+
+        per_set = comb(level, level // 2)
+        occupied = self.masks_by_count[level][ranks // per_set]
+        pattern = self.masks_by_count[level // 2][ranks % per_set]
+        o = np.zeros_like(occupied)
+        seen = np.zeros_like(occupied)
+        for cell in range(self.shape.cells):
+            here = occupied >> cell & 1
+            o |= (pattern >> seen & 1 & here) << cell
+            seen += here
+        return occupied ^ o, o
+
+    def has_line(self, mask):
+        result = None
+        for line in self.lines:
+            hit = (mask & line) == line
+            result = hit if result is None else result | hit
+        return result
+
+    # Single positions, used by lookups
+
+    def canonical_hash_of(self, x, o):
+        level = (x | o).bit_count()
+        per_set = comb(level, level // 2)
+        transform = self.symmetries.transform
+        rank, pext = self.rank_list, self.pext_list
+        best = None
+        for number in range(len(self.symmetries.perms)):
+            px, po = transform(x, number), transform(o, number)
+            occupied = px | po
+            low = occupied & 255
+            pattern = pext[low << 8 | (po & 255)] | (
+                pext[(occupied >> 8 & 255) << 8 | (po >> 8 & 255)] << low.bit_count())
+            value = self.offset[level] + rank[occupied] * per_set + rank[pattern]
+            if best is None or value < best:
+                best = value
+        return best
+
+
+def _read(data, indices):
+    return data[indices >> 2] >> ((indices & 3) << 1) & 3
+
+
+def _solve_chunk(job):
+    """Solve ranks [start, stop) of one level; runs in a worker process"""
+    import numpy as np
+
+    path, size, level, start, stop = job
+    indexer = _indexer(size)
+    shape = indexer.shape
+    data = np.memmap(path, dtype=np.uint8, mode='r+', offset=HEADER.size,
+                     shape=(-(-indexer.total // 4),))
+    ranks = np.arange(start, stop, dtype=np.int64)
+    x, o = indexer.unhash(level, ranks)
+    indices = indexer.offset[level] + ranks
+    canonical = indexer.canonical_hash(level, x, o) == indices
+    x, o, indices = x[canonical], o[canonical], indices[canonical]
+
+    # X moves on even levels; `me` is the side to move
+    me, opp = (x, o) if level % 2 == 0 else (o, x)
+    values = np.zeros(len(indices), dtype=np.uint8)
+    illegal = indexer.has_line(me)
+    lost = indexer.has_line(opp) & ~illegal
+    values[lost] = LOSS
+    open_ = ~illegal & ~lost
+    if level == shape.cells:
+        values[open_] = DRAW
+    elif open_.any():
+        me, opp, occupied = me[open_], opp[open_], (x | o)[open_]
+        best = np.zeros(len(me), dtype=np.uint8)
+        for cell in range(shape.cells):
+            bit = 1 << cell
+            free = (occupied & bit) == 0
+            if not free.any():
+                continue
+            mine = me[free] | bit
+            child_x, child_o = (mine, opp[free]) if level % 2 == 0 else (opp[free], mine)
+            reply = _read(data, indexer.canonical_hash(level + 1, child_x, child_o))
+            # The reply's value is from the opponent's side: their loss is our win
+            ours = np.where(reply > 0, 4 - reply, 0).astype(np.uint8)
+            best[free] = np.maximum(best[free], ours)
+        values[open_] = best
+
+    packed = np.zeros(-(-(stop - start) // 4), dtype=np.uint8)
+    local = indices - indexer.offset[level] - start
+    np.bitwise_or.at(packed, local >> 2, (values << ((local & 3) << 1)).astype(np.uint8))
+    first = (indexer.offset[level] + start) >> 2
+    data[first:first + len(packed)] = packed
+    data.flush()
+    return stop - start, len(indices)
+
+
+_indexers = {}
+
+
+def _indexer(size):
+    """One Indexer per board per process"""
+    indexer = _indexers.get(size)
+    if indexer is None:
+        indexer = _indexers[size] = Indexer(board_shape(*size))
+    return indexer
+
+
+def peak_memory():
+    """Largest resident set (bytes) of this process and of any finished worker, or None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    scale = 1 if os.uname().sysname == 'Darwin' else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return own * scale, children * scale
+
+
+def generate(rows, cols, k, path=None, workers=None, report=None):
+    """Solve a board and write its tablebase; return the path
+
+    `report` is called with (level, positions, canonical positions, seconds)
+    after each level.
+    """
+    size = (rows, cols, k)
+    indexer = _indexer(size)
+    path = path or tablebase_path(*size)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    partial = path + '.partial'
+    with open(partial, 'wb') as handle:
+        handle.write(HEADER.pack(MAGIC, rows, cols, k, indexer.total))
+        handle.truncate(HEADER.size + -(-indexer.total // 4))
+
+    workers = workers or os.cpu_count() or 1
+    executor = ProcessPoolExecutor(workers) if workers > 1 else None
+    try:
+        for level in range(indexer.shape.cells, -1, -1):
+            started = time.perf_counter()
+            size_of_level = indexer.level_size[level]
+            # Chunks start on multiples of 4 so no two workers write the same byte
+            jobs = [(partial, size, level, start, min(start + CHUNK, size_of_level))
+                    for start in range(0, size_of_level, CHUNK)]
+            if executor is None:
+                done = list(map(_solve_chunk, jobs))
+            else:
+                done = list(executor.map(_solve_chunk, jobs))
+            if report is not None:
+                report(level, sum(d[0] for d in done), sum(d[1] for d in done),
+                       time.perf_counter() - started)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    os.replace(partial, path)
+    return path
+
+
+class Tablebase:
+    """Read-only view of a generated tablebase; values are read from the mmap"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as handle:
+            self.data = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, rows, cols, k, total = HEADER.unpack_from(self.data)
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a tablebase")
+            self.shape = board_shape(rows, cols, k)
+            self.indexer = _indexer((rows, cols, k))
+            if total != self.indexer.total or len(self.data) != HEADER.size + -(-total // 4):
+                raise ValueError(f"{path} is truncated or was built differently")
+        except (ValueError, struct.error):
+            self.data.close()
+            raise
+
+    def close(self):
+        self.data.close()
+
+    def value(self, x, o):
+        """LOSS, DRAW or WIN for the side to move, or 0 for an illegal position"""
+        index = self.indexer.canonical_hash_of(x, o)
+        return self.data[HEADER.size + (index >> 2)] >> ((index & 3) << 1) & 3
+
+    def move_values(self, game):
+        """Return {cell: LOSS, DRAW or WIN} for every move of the side to play"""
+        values = {}
+        if game.is_over():
+            return values
+        shape = game.shape
+        me, opp = game.masks[game.turn], game.masks[game.turn ^ 1]
+        free = ~game.occupied & shape.full_mask
+        for cell in range(shape.cells):
+            if not free >> cell & 1:
+                continue
+            mine = me | 1 << cell
+            if shape.find_line(mine, cell):
+                values[cell] = WIN
+                continue
+            masks = [None, None]
+            masks[game.turn], masks[game.turn ^ 1] = mine, opp
+            values[cell] = 4 - self.value(*masks)
+        return values
+
+    def best_move(self, game):
+        """Return (outcome, cell) of the best move for the side to move, or None"""
+        values = self.move_values(game)
+        if not values:
+            return None
+        best = max(values.values())
+        cells = [cell for cell, value in values.items() if value == best]
+        if best == WIN:
+            # Win at once when possible rather than some moves later
+            me = game.masks[game.turn]
+            cells.sort(key=lambda cell: not game.shape.find_line(me | 1 << cell, cell))
+        return best, cells[0]
+
+
+class TablebaseEngine:
+    """Perfect player for any board with a generated tablebase"""
+
+    name = "Tablebase"
+
+    def __init__(self, tablebase):
+        self.tablebase = tablebase
+
+    def choose_move(self, game, cancel=None):
+        best = self.tablebase.best_move(game)
+        return divmod(best[1], game.cols) if best else None
+
+    def move_values(self, game):
+        return self.tablebase.move_values(game)
+
+
+def find_tablebase(rows, cols, k, directory=DEFAULT_DIR):
+    """Open the tablebase generated for a board, or return None if there is none"""
+    path = tablebase_path(rows, cols, k, directory)
+    if not os.path.exists(path):
+        return None
+    try:
+        return Tablebase(path)
+    except (OSError, ValueError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a retrograde tablebase")
+    parser.add_argument('--board', type=int, nargs=3, default=(4, 4, 3), metavar=('ROWS', 'COLS', 'K'))
+    parser.add_argument('--workers', type=int, help="processes to use (default: all cores)")
+    parser.add_argument('--output', help="table file (default: ~/.tic-tac-toe/tablebases/)")
+    args = parser.parse_args(argv)
+
+    rows, cols, k = args.board
+    started = time.perf_counter()
+    totals = [0, 0]
+
+    def report(level, positions, canonical, seconds):
+        totals[0] += positions
+        totals[1] += canonical
+        rate = positions / max(seconds, 1e-9)
+        print(f"level {level:2d}: {positions:10,d} positions, {canonical:9,d} canonical, "
+              f"{seconds:6.2f}s ({rate:,.0f} positions/s)")
+
+    path = generate(rows, cols, k, args.output, args.workers, report)
+    elapsed = time.perf_counter() - started
+    memory = peak_memory()
+    print(f"{totals[0]:,d} positions ({totals[1]:,d} canonical) in {elapsed:.1f}s, "
+          f"{totals[0] / elapsed:,.0f} positions/s")
+    if memory is not None:
+        own, children = memory
+        print(f"peak memory: {own / 2**20:.0f} MB main process, {children / 2**20:.0f} MB largest worker")
+    print(f"wrote {os.path.getsize(path):,d} bytes to {path}")
+
+
+if __name__ == "__main__":
+    main()
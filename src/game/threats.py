@@ -0,0 +1,354 @@
+"""Threat-space search for k in a row on large boards (Gomoku is 15x15, k = 5).
+
+The rules find a win by scanning the four directions through the last
+move.  LineIndex keeps that view of the whole board up to date: for each
+of the four directions it counts both sides' marks in every window of k
+cells, and files each window holding marks of one side only under the
+number it holds (with k = 5, its open twos, threes and fours).  A move or
+its undo only touches the windows through its cell, at most 4k of them.
+
+With k - 1 marks a window is a four, whose last empty cell must be taken
+at once.  ThreatSearch looks for a win made of forcing moves only: fours,
+and threes that threaten a double four next move.  The defender is given
+every reply that can matter: the empty cells of the attacker's windows
+that are at most two marks short, and any move that makes a four of its
+own.  Any other reply leaves the threat standing and the attacker's next
+move wins, so a sequence found this way is a forced win.
+
+ThreatEngine plays such a win when there is one, meets the opponent's,
+and otherwise takes the cell the index scores best.  Candidates always
+come from the index, never from a scan of every empty cell.
+"""
+
+import time
+
+from .ai import SearchAborted
+from .game_logic import DIRECTIONS
+
+# Attacker moves in a threat sequence
+DEFAULT_DEPTH = 8
+
+# Searches look at the clock and the cancel flag every this many nodes
+CHECK_EVERY = 256
+
+
+class Windows:
+    """Every k-cell window of a board with its direction, and the windows through each cell"""
+
+    def __init__(self, shape):
+        rows, cols, k = shape.rows, shape.cols, shape.k
+        self.cells = []
+        self.direction = []
+        at = [[] for _ in range(shape.cells)]
+        for number, (dr, dc) in enumerate(DIRECTIONS):
+            for row in range(rows):
+                for col in range(cols):
+                    end_r, end_c = row + dr * (k - 1), col + dc * (k - 1)
+                    if not shape.in_bounds(end_r, end_c):
+                        continue
+                    for i in range(k):
+                        at[(row + dr * i) * cols + col + dc * i].append(len(self.cells))
+                    self.cells.append(tuple((row + dr * i) * cols + col + dc * i for i in range(k)))
+                    self.direction.append(number)
+        self.at = tuple(tuple(windows) for windows in at)
+        # What a window with n marks of one side only adds to a cell's score:
+        # building one's own windows is worth a little more than spoiling the opponent's
+        self.attack = tuple(8 ** n for n in range(k + 1))
+        self.defend = tuple(8 ** n // 2 for n in range(k + 1))
+
+
+_windows = {}
+
+
+def windows_for(shape):
+    windows = _windows.get(shape)
+    if windows is None:
+        windows = _windows[shape] = Windows(shape)
+    return windows
+
+
+class LineIndex:
+    """Each side's marks in every window, kept current move by move"""
+
+    def __init__(self, shape, masks=(0, 0)):
+        if shape.k < 2:
+            raise ValueError("threats need k of at least 2")
+        windows = windows_for(shape)
+        self.shape = shape
+        self.k = shape.k
+        self.windows = windows
+        self.counts = ([0] * len(windows.cells), [0] * len(windows.cells))
+        # open[side][n] holds the windows with n of side's marks and none of the other's
+        self.open = tuple([set() for _ in range(shape.k + 1)] for _ in range(2))
+        self.masks = [0, 0]
+        for side in (0, 1):
+            mask = masks[side]
+            while mask:
+                bit = mask & -mask
+                mask ^= bit
+                self.place(bit.bit_length() - 1, side)
+
+    def place(self, cell, side):
+        mine, theirs = self.counts[side], self.counts[side ^ 1]
+        open_mine, open_theirs = self.open[side], self.open[side ^ 1]
+        for window in self.windows.at[cell]:
+            n = mine[window]
+            if not theirs[window]:
+                if n:
+                    open_mine[n].discard(window)
+                open_mine[n + 1].add(window)
+            elif not n:
+                # The opponent's window is spoiled
+                open_theirs[theirs[window]].discard(window)
+            mine[window] = n + 1
+        self.masks[side] |= 1 << cell
+
+    def remove(self, cell, side):
+        mine, theirs = self.counts[side], self.counts[side ^ 1]
+        open_mine, open_theirs = self.open[side], self.open[side ^ 1]
+        for window in self.windows.at[cell]:
+            n = mine[window] - 1
+            mine[window] = n
+            if not theirs[window]:
+                open_mine[n + 1].discard(window)
+                if n:
+                    open_mine[n].add(window)
+            elif not n:
+                open_theirs[theirs[window]].add(window)
+        self.masks[side] &= ~(1 << cell)
+
+    def empty_cells(self, window):
+        occupied = self.masks[0] | self.masks[1]
+        return [cell for cell in self.windows.cells[window] if not occupied >> cell & 1]
+
+    def has_line(self, side):
+        return bool(self.open[side][self.k])
+
+    def completions(self, side):
+        """Cells where side would complete a line: the empty cell of each of its fours"""
+        return {self.empty_cells(window)[0] for window in self.open[side][self.k - 1]}
+
+    def lines(self, side, n):
+        """Windows with n of side's marks and none of the other's, counted per direction"""
+        counts = [0] * len(DIRECTIONS)
+        for window in self.open[side][n]:
+            counts[self.windows.direction[window]] += 1
+        return counts
+
+    def score(self, cell, side):
+        """What a mark on cell is worth to side, building its windows and spoiling the opponent's"""
+        mine, theirs = self.counts[side], self.counts[side ^ 1]
+        attack, defend = self.windows.attack, self.windows.defend
+        score = 0
+        for window in self.windows.at[cell]:
+            if not theirs[window]:
+                score += attack[mine[window]]
+            elif not mine[window]:
+                score += defend[theirs[window]]
+        return score
+
+    def candidates(self, side):
+        """Empty cells of the windows that hold marks, best for side first"""
+        cells = set()
+        for owner in (0, 1):
+            for n in range(1, self.k):
+                for window in self.open[owner][n]:
+                    cells.update(self.empty_cells(window))
+        if not cells and not self.masks[0] | self.masks[1]:
+            shape = self.shape
+            cells.add(shape.rows // 2 * shape.cols + shape.cols // 2)
+        return sorted(cells, key=lambda cell: (-self.score(cell, side), cell))
+
+
+class ThreatSearch:
+    """Looks for a forced win made of fours and threes, over a LineIndex it moves in place"""
+
+    def __init__(self, index, max_depth=DEFAULT_DEPTH, deadline=None, cancel=None):
+        self.index = index
+        self.max_depth = max_depth
+        self.deadline = deadline
+        self.cancel = cancel
+        self.nodes = 0
+        self.aborted = False
+        # Position -> (winning move or None, depth it was searched to)
+        self.proven = {}
+
+    def find_win(self, side):
+        """Return (first move, attacker moves) of a forced win for side to move, or None
+
+        Wins by fours alone are looked for first, as they leave the defender
+        a single reply and are found in a fraction of the time; then wins
+        that also use threes.  Each deepens one attacker move at a time, so
+        the shortest win is found first.  Gives up, setting ``aborted``,
+        when the deadline passes or the search is cancelled.
+        """
+        try:
+            for threes in (False, True):
+                for depth in range(1, self.max_depth + 1):
+                    cell = self._attack(side, depth, threes)
+                    if cell is not None:
+                        return cell, depth
+        except SearchAborted:
+            self.aborted = True
+        return None
+
+    def _tick(self):
+        self.nodes += 1
+        if self.nodes % CHECK_EVERY == 0:
+            if self.cancel is not None and self.cancel.is_set():
+                raise SearchAborted()
+            if self.deadline is not None and time.monotonic() > self.deadline:
+                raise SearchAborted()
+
+    def _attack(self, side, depth, threes):
+        """A move that wins by force within `depth` attacker moves, or None"""
+        self._tick()
+        index = self.index
+        wins = index.completions(side)
+        if wins:
+            return min(wins)
+        forced = index.completions(side ^ 1)
+        if len(forced) > 1 or not depth:
+            return None
+        key = (index.masks[0], index.masks[1], side, threes)
+        known = self.proven.get(key)
+        if known is not None and (known[0] is not None or known[1] >= depth):
+            return known[0]
+        result = None
+        for cell in forced or self._threat_cells(side, threes):
+            index.place(cell, side)
+            replies = self._defences(side, threes)
+            won = replies is not None and all(self._defend(side, reply, depth, threes)
+                                              for reply in replies)
+            index.remove(cell, side)
+            if won:
+                result = cell
+                break
+        self.proven[key] = (result, depth)
+        return result
+
+    def _defend(self, side, reply, depth, threes):
+        index = self.index
+        index.place(reply, side ^ 1)
+        won = self._attack(side, depth - 1, threes) is not None
+        index.remove(reply, side ^ 1)
+        return won
+
+    def _threat_cells(self, side, threes):
+        """Cells that may make a four (or a three), most promising first"""
+        index = self.index
+        cells = set()
+        lowest = max(1, index.k - 3) if threes else index.k - 2
+        for n in range(lowest, index.k - 1):
+            for window in index.open[side][n]:
+                cells.update(index.empty_cells(window))
+        return sorted(cells, key=lambda cell: (-index.score(cell, side), cell))
+
+    def _defences(self, side, threes):
+        """The defender's replies to the move just made, or None if it threatens nothing"""
+        index = self.index
+        k = index.k
+        fours = index.completions(side)
+        if len(fours) > 1:
+            # Two cells to block at once: whatever the defender does loses
+            return []
+        if fours:
+            return list(fours)
+        if not threes or k < 3 or not self._double_four_threat(side):
+            return None
+        replies = set()
+        for n in (k - 2, k - 1):
+            for window in index.open[side][n]:
+                replies.update(index.empty_cells(window))
+        for window in index.open[side ^ 1][k - 2]:
+            replies.update(index.empty_cells(window))
+        return sorted(replies)
+
+    def _double_four_threat(self, side):
+        """Whether side has a move that makes two fours with different empty cells"""
+        index = self.index
+        k = index.k
+        mine, theirs = index.counts[side], index.counts[side ^ 1]
+        cells = index.windows.cells
+        occupied = index.masks[0] | index.masks[1]
+        for window in index.open[side][k - 2]:
+            for cell in index.empty_cells(window):
+                ends = set()
+                for other in index.windows.at[cell]:
+                    if mine[other] == k - 2 and not theirs[other]:
+                        ends.update(c for c in cells[other] if c != cell and not occupied >> c & 1)
+                if len(ends) > 1:
+                    return True
+        return False
+
+
+class ThreatEngine:
+    """Wins by threat-space search when it can, stops the opponent's wins, else plays the index's best cell"""
+
+    name = "Threat search"
+
+    def __init__(self, time_limit=1.0, max_depth=DEFAULT_DEPTH):
+        self.time_limit = time_limit
+        self.max_depth = max_depth
+        # Own moves, the last completing the line, of the forced win the last search found
+        self.last_win = None
+        self.nodes = 0
+
+    def choose_move(self, game, cancel=None):
+        move = self.choose_cell(game.shape, game.masks, game.turn, cancel)
+        return None if move is None else divmod(move, game.cols)
+
+    def choose_cell(self, shape, masks, side, cancel=None):
+        index = LineIndex(shape, masks)
+        self.last_win = None
+        self.nodes = 0
+        other = side ^ 1
+        wins = index.completions(side)
+        if wins:
+            self.last_win = 1
+            return min(wins)
+        forced = index.completions(other)
+        if forced:
+            return max(forced, key=lambda cell: index.score(cell, side))
+        candidates = index.candidates(side)
+        if not candidates:
+            # Every window is dead; any free cell will do until the board fills
+            free = ~(masks[0] | masks[1]) & shape.full_mask
+            return (free & -free).bit_length() - 1 if free else None
+        started = time.monotonic()
+        deadline = None if self.time_limit is None else started + self.time_limit
+        # Half the time to look for our own win, the rest to stop the opponent's
+        attack_deadline = None if deadline is None else started + self.time_limit / 2
+        search = ThreatSearch(index, self.max_depth, attack_deadline, cancel)
+        found = search.find_win(side)
+        self.nodes += search.nodes
+        if found is not None:
+            self.last_win = found[1] + 1
+            return found[0]
+        threat, _ = self._opponent_win(index, other, deadline, cancel)
+        if threat is None:
+            return candidates[0]
+        # The replies that can stop it, as in ThreatSearch, tried until one holds
+        replies = {threat}
+        for n in (index.k - 3, index.k - 2, index.k - 1):
+            if n > 0:
+                for window in index.open[other][n]:
+                    replies.update(index.empty_cells(window))
+        for window in index.open[side][index.k - 2]:
+            replies.update(index.empty_cells(window))
+        for cell in sorted(replies, key=lambda cell: (-index.score(cell, side), cell)):
+            index.place(cell, side)
+            refuted, aborted = self._opponent_win(index, other, deadline, cancel)
+            index.remove(cell, side)
+            if aborted:
+                break
+            if refuted is None:
+                return cell
+        return threat
+
+    def _opponent_win(self, index, other, deadline, cancel):
+        """(first move of the opponent's forced win if it were to move or None, whether time ran out)"""
+        search = ThreatSearch(index, self.max_depth, deadline, cancel)
+        found = search.find_win(other)
+        self.nodes += search.nodes
+        return None if found is None else found[0], search.aborted
@@ -0,0 +1,316 @@
+"""Engine tournaments: round-robin or Swiss, played on a process pool.
+
+Players are engine specs:
+
+    random              uniformly random moves
+    heuristic           win, block, else the strongest open cell
+    alphabeta           exact alpha-beta; alphabeta:3 limits it to 3 plies,
+                        alphabeta:0.5s to half a second per move
+    mcts:200            Monte Carlo with 200 playouts per move (mcts:0.5s: time)
+    table               the solved 3x3 table
+    threats             threat-space search for k in a row, a second per move
+                        (threats:0.5s for half a second)
+
+Every finished game is appended to a JSON-lines checkpoint file, so a run
+that is interrupted continues with the games it had not finished.  Games
+start with a few random plies (``opening``) so that deterministic engines
+do not replay the same game.  Results are added to the StatsStore under
+the spec names, and ratings are fitted on the Elo scale by maximum
+likelihood with 95% confidence intervals.
+
+    python -m game.tournament random heuristic alphabeta:2 mcts:200 --games 20
+    python -m game.tournament random heuristic alphabeta mcts:100 --swiss 4
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .ai import make_engine
+from .game_logic import GameLogic
+from .stats import PlayerStats
+
+# Ratings are centred here and pulled gently towards it, which keeps the
+# rating of an unbeaten player finite
+BASE_RATING = 1500
+PRIOR_SD = 400
+ELO_SCALE = 400 / math.log(10)
+Z_95 = 1.96
+
+
+def play_game(job):
+    """Play one game; runs in a worker process, so it only takes and returns plain data"""
+    game_id, x_spec, o_spec, size, opening, seed = job
+    rng = random.Random(seed)
+    engines = (make_engine(x_spec, rng.randrange(1 << 32)),
+               make_engine(o_spec, rng.randrange(1 << 32)))
+    game = GameLogic(*size)
+    start = time.perf_counter()
+    while not game.is_over():
+        if game.move_count < opening:
+            move = rng.choice(game.legal_moves())
+        else:
+            move = engines[game.turn].choose_move(game)
+        if move is None or not game.make_move(*move):
+            # An engine that cannot move loses
+            game.winner = 'O' if game.turn == 0 else 'X'
+            break
+    return {'id': game_id, 'x': x_spec, 'o': o_spec, 'winner': game.winner,
+            'moves': game.move_count, 'seconds': time.perf_counter() - start}
+
+
+def round_robin_pairings(players, games):
+    """Every pair meets `games` times with colours alternating; (id, x, o) triples"""
+    pairings = []
+    for i, first in enumerate(players):
+        for second in players[i + 1:]:
+            for n in range(games):
+                x, o = (first, second) if n % 2 == 0 else (second, first)
+                pairings.append((f"{first}|{second}|{n}", x, o))
+    return pairings
+
+
+def swiss_pairings(players, scores, met, round_number, games):
+    """Pair players with similar scores who have not met yet; the odd one out sits out
+
+    `scores` maps player to points so far and `met` holds frozensets of
+    pairs that have already played.
+    """
+    ranked = sorted(players, key=lambda player: (-scores.get(player, 0), players.index(player)))
+    pairings = []
+    while len(ranked) > 1:
+        first = ranked.pop(0)
+        # Fall back to a rematch when everyone left has been met already
+        second = next((other for other in ranked if frozenset((first, other)) not in met), ranked[0])
+        ranked.remove(second)
+        for n in range(games):
+            x, o = (first, second) if n % 2 == 0 else (second, first)
+            pairings.append((f"r{round_number}|{first}|{second}|{n}", x, o))
+    return pairings
+
+
+def score_of(result, player):
+    """1, 0.5 or 0 points for `player` in a finished game"""
+    if result['winner'] is None:
+        return 0.5
+    return 1.0 if (result['winner'] == 'X') == (result['x'] == player) else 0.0
+
+
+def elo_ratings(players, results, iterations=50):
+    """Fit Elo ratings to game results; return {player: (rating, half width of 95% interval)}
+
+    Bradley-Terry model with draws as half a win, solved by Newton's method
+    with a normal prior of PRIOR_SD around BASE_RATING.
+    """
+    import numpy as np
+
+    index = {player: i for i, player in enumerate(players)}
+    size = len(players)
+    if not size:
+        return {}
+    firsts = np.array([index[result['x']] for result in results], dtype=np.intp)
+    seconds = np.array([index[result['o']] for result in results], dtype=np.intp)
+    scores = np.array([score_of(result, result['x']) for result in results])
+    ratings = np.zeros(size)
+    precision = (ELO_SCALE / PRIOR_SD) ** 2
+    hessian = np.eye(size) * precision
+    for _ in range(iterations):
+        expected = 1 / (1 + np.exp(ratings[seconds] - ratings[firsts]))
+        gradient = -precision * ratings
+        np.add.at(gradient, firsts, scores - expected)
+        np.add.at(gradient, seconds, expected - scores)
+        weight = expected * (1 - expected)
+        hessian = np.eye(size) * precision
+        np.add.at(hessian, (firsts, firsts), weight)
+        np.add.at(hessian, (seconds, seconds), weight)
+        np.add.at(hessian, (firsts, seconds), -weight)
+        np.add.at(hessian, (seconds, firsts), -weight)
+        step = np.linalg.solve(hessian, gradient)
+        ratings += step
+        if np.abs(step).max() < 1e-9:
+            break
+    errors = np.sqrt(np.diag(np.linalg.inv(hessian)))
+    return {player: (BASE_RATING + ELO_SCALE * ratings[i], Z_95 * ELO_SCALE * errors[i])
+            for player, i in index.items()}
+
+
+class Tournament:
+    """Schedules games between engine specs and keeps their results"""
+
+    def __init__(self, players, rows=3, cols=3, k=3, games=2, swiss_rounds=None, opening=2,
+                 seed=0, checkpoint=None, workers=None, stats_store=None):
+        if len(set(players)) != len(players) or len(players) < 2:
+            raise ValueError("a tournament needs at least two different players")
+        GameLogic(rows, cols, k)
+        for spec in players:
+            make_engine(spec)
+            # Checked here, as a worker would only fail on them mid-run
+            kind = spec.partition(':')[0]
+            if kind == 'table' and (rows, cols, k) != (3, 3, 3):
+                raise ValueError(f"engine spec {spec!r} only plays 3x3 with k = 3")
+            if kind == 'ultimate':
+                raise ValueError(f"engine spec {spec!r} only plays ultimate tic-tac-toe")
+        self.players = list(players)
+        self.size = (rows, cols, k)
+        self.games = games
+        self.swiss_rounds = swiss_rounds
+        self.opening = opening
+        self.seed = seed
+        self.workers = workers or os.cpu_count() or 1
+        self.checkpoint = checkpoint
+        self.stats_store = stats_store
+        self.results = {}
+        self.played = 0
+        if checkpoint and os.path.exists(checkpoint):
+            self._load_checkpoint()
+
+    def config(self):
+        return {'players': self.players, 'size': list(self.size), 'games': self.games,
+                'swiss_rounds': self.swiss_rounds, 'opening': self.opening, 'seed': self.seed}
+
+    def _load_checkpoint(self):
+        with open(self.checkpoint, encoding='utf-8') as handle:
+            lines = handle.read().splitlines()
+        if lines and json.loads(lines[0]).get('config') != self.config():
+            raise ValueError(f"{self.checkpoint} was written for a different tournament")
+        for line in lines[1:]:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                # A line cut short by the interruption; its game is played again
+                continue
+            self.results[result['id']] = result
+
+    def _save(self, handle, result):
+        self.results[result['id']] = result
+        self.played += 1
+        if handle is not None:
+            handle.write(json.dumps(result) + '\n')
+            handle.flush()
+        if self.stats_store is not None:
+            self.stats_store.record_game(result['x'], result['o'], result['winner'],
+                                         result['moves'], result['seconds'])
+
+    def run(self, progress=None):
+        """Play every game not already in the checkpoint; return all results
+
+        `progress` is called with each new result.
+        """
+        handle = None
+        if self.checkpoint:
+            fresh = not os.path.exists(self.checkpoint) or os.path.getsize(self.checkpoint) == 0
+            handle = open(self.checkpoint, 'a', encoding='utf-8')
+            if fresh:
+                handle.write(json.dumps({'config': self.config()}) + '\n')
+                handle.flush()
+        executor = ProcessPoolExecutor(self.workers) if self.workers > 1 else None
+        try:
+            if self.swiss_rounds:
+                # Pair each round on the rounds before it only, so a resumed
+                # run makes the same pairings as the original one
+                met = set()
+                scores = dict.fromkeys(self.players, 0.0)
+                for round_number in range(self.swiss_rounds):
+                    pairings = swiss_pairings(self.players, scores, met, round_number, self.games)
+                    self._play(pairings, executor, handle, progress)
+                    for game_id, x, o in pairings:
+                        met.add(frozenset((x, o)))
+                        for player in (x, o):
+                            scores[player] += score_of(self.results[game_id], player)
+            else:
+                self._play(round_robin_pairings(self.players, self.games), executor, handle,
+                           progress)
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+            if handle is not None:
+                handle.close()
+        return list(self.results.values())
+
+    def _play(self, pairings, executor, handle, progress):
+        jobs = [(game_id, x, o, self.size, self.opening, f"{self.seed}|{game_id}")
+                for game_id, x, o in pairings if game_id not in self.results]
+        if executor is None:
+            finished = map(play_game, jobs)
+        else:
+            finished = (future.result()
+                        for future in as_completed([executor.submit(play_game, job) for job in jobs]))
+        for result in finished:
+            self._save(handle, result)
+            if progress is not None:
+                progress(result)
+
+    def player_stats(self):
+        """W/L/D for each player, as the PlayerStats the GUI shows"""
+        stats = {player: PlayerStats(player) for player in self.players}
+        for result in self.results.values():
+            for player in (result['x'], result['o']):
+                points = score_of(result, player)
+                if points == 1:
+                    stats[player].add_win()
+                elif points == 0:
+                    stats[player].add_loss()
+                else:
+                    stats[player].add_draw()
+        return stats
+
+    def standings(self):
+        """(player, rating, 95% interval, PlayerStats) rows, best first"""
+        ratings = elo_ratings(self.players, list(self.results.values()))
+        stats = self.player_stats()
+        rows = [(player, *ratings[player], stats[player]) for player in self.players]
+        return sorted(rows, key=lambda row: -row[1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play engines against each other and rate them")
+    parser.add_argument('players', nargs='+', help="engine specs, e.g. random alphabeta:3 mcts:200")
+    parser.add_argument('--board', type=int, nargs=3, default=(3, 3, 3), metavar=('ROWS', 'COLS', 'K'))
+    parser.add_argument('--games', type=int, default=2,
+                        help="games per pairing (per round with --swiss), colours alternating")
+    parser.add_argument('--swiss', type=int, metavar='ROUNDS', help="play Swiss rounds instead of round-robin")
+    parser.add_argument('--opening', type=int, default=2, help="random plies at the start of each game")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, help="processes to use (default: all cores)")
+    parser.add_argument('--checkpoint', default='tournament.jsonl',
+                        help="results file used to resume an interrupted run")
+    parser.add_argument('--stats', help="stats database to add results to (default: the game's own)")
+    parser.add_argument('--no-stats', action='store_true', help="do not record results as player stats")
+    args = parser.parse_args(argv)
+
+    store = None
+    if not args.no_stats:
+        from .stats import DEFAULT_PATH, StatsStore
+        store = StatsStore(args.stats or DEFAULT_PATH)
+    tournament = Tournament(args.players, *args.board, games=args.games, swiss_rounds=args.swiss,
+                            opening=args.opening, seed=args.seed, checkpoint=args.checkpoint,
+                            workers=args.workers, stats_store=store)
+    if tournament.results:
+        print(f"Resuming with {len(tournament.results)} games from {args.checkpoint}")
+
+    start = time.perf_counter()
+
+    def progress(result):
+        print(f"\r{tournament.played} new games", end='', flush=True)
+
+    try:
+        tournament.run(progress)
+    except KeyboardInterrupt:
+        print(f"\nInterrupted; run again to resume from {args.checkpoint}")
+        return
+    finally:
+        if store is not None:
+            store.close()
+    elapsed = time.perf_counter() - start
+    print(f"\r{tournament.played} new games in {elapsed:.1f}s, {len(tournament.results)} in total")
+    print(f"{'player':16s} {'Elo':>6s} {'95% CI':>8s}  record")
+    for player, rating, interval, stats in tournament.standings():
+        print(f"{player:16s} {rating:6.0f} {'±' + format(interval, '.0f'):>8s}  {stats.get_stats_string()}")
+
+
+if __name__ == "__main__":
+    main()
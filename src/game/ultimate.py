@@ -0,0 +1,471 @@
+"""Ultimate tic-tac-toe: a 3x3 board of 3x3 boards.
+
+Each cell of the outer board is a small board.  The cell you play inside a
+small board picks the small board your opponent must play in next; if that
+board is already won or full they may play in any open one.  Winning a
+small board claims its cell on the outer board, and three claimed cells in
+a row win the game.  When every small board is decided without that, the
+game is drawn.
+
+Positions are nested bitboards: each side's marks are one 81-bit integer
+made of nine 9-bit small boards (small board ``b`` holds bits 9b to 9b+8),
+and a 9-bit meta mask per side holds the small boards it has won.  Every
+question the rules ask of a small board - is it won, which cells are
+free - is a lookup in a 512-entry table, and the meta board is checked
+with the same table.
+
+An UltimateGame presents the 9x9 board through the GameLogic interface
+(row-major ``masks``, ``make_move(row, col)``, undo and redo, a Zobrist
+``hash``), so the board widget, records and the headless mode work on it
+unchanged.  It reports ``k = 0``, which no m,n,k board can have, so the
+(rows, cols, k) triple that names a board elsewhere names this variant.
+"""
+
+import time
+
+from .game_logic import PLAYERS, _splitmix64
+
+ULTIMATE_SIZE = (9, 9, 0)
+
+ALL_BOARDS = 0b111111111
+
+# The eight lines of a 3x3 board as 9-bit masks
+LINES = (0b000000111, 0b000111000, 0b111000000,
+         0b001001001, 0b010010010, 0b100100100,
+         0b100010001, 0b001010100)
+
+# WINS[mask] is true when a 3x3 mask holds a line
+WINS = tuple(any(mask & line == line for line in LINES) for mask in range(512))
+
+# FREE[occupied] lists the free cells of a 3x3 board, centre and corners first
+_PREFERENCE = (4, 0, 2, 6, 8, 1, 3, 5, 7)
+FREE = tuple(tuple(cell for cell in _PREFERENCE if not occupied >> cell & 1)
+             for occupied in range(512))
+
+# OPEN[closed] lists the small boards still open, in the same order
+OPEN = FREE
+
+# Between row-major cells of the 9x9 board and (small board, cell) pairs
+SPLIT = tuple((row // 3 * 3 + col // 3, row % 3 * 3 + col % 3)
+              for row in range(9) for col in range(9))
+JOIN = tuple((board // 3 * 3 + cell // 3) * 9 + board % 3 * 3 + cell % 3
+             for board in range(9) for cell in range(9))
+
+WIN_SCORE = 100000
+INFINITY = 1 << 30
+
+
+class SearchAborted(Exception):
+    """Raised inside the search when its time budget runs out or it is cancelled"""
+
+
+class UltimateShape:
+    """The few BoardShape attributes other code asks of a board"""
+
+    rows = cols = 9
+    k = 0
+    cells = 81
+    full_mask = (1 << 81) - 1
+
+    def in_bounds(self, row, col):
+        return 0 <= row < 9 and 0 <= col < 9
+
+    @property
+    def zobrist(self):
+        """Keys for each (player, cell), for O to move, and for each active small board"""
+        keys = getattr(UltimateShape, '_keys', None)
+        if keys is None:
+            numbers = _splitmix64(0x0171)
+            cells = tuple(tuple(next(numbers) for _ in range(81)) for _ in PLAYERS)
+            keys = UltimateShape._keys = (cells, next(numbers),
+                                          tuple(next(numbers) for _ in range(9)))
+        return keys
+
+
+SHAPE = UltimateShape()
+
+
+class UltimateGame:
+    """State of an ultimate game, through the same interface as GameLogic
+
+    ``active`` is the small board the side to move must play in, or None
+    when it may choose any open one.
+    """
+
+    shape = SHAPE
+    rows = cols = 9
+    k = 0
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Clear the board and give the first move, anywhere, to X"""
+        self.masks = [0, 0]
+        self.boards = [0, 0]
+        self.meta = [0, 0]
+        self.closed = 0
+        self.active = None
+        self.turn = 0
+        self.move_count = 0
+        self.last_move = None
+        self.history = []
+        self.future = []
+        # The active small board before each move, for undo
+        self.actives = []
+        self.hash = 0
+        self.winner = None
+        self.winning_mask = 0
+
+    def copy(self):
+        """Return an independent copy, e.g. for an engine searching on another thread"""
+        other = UltimateGame.__new__(UltimateGame)
+        other.__dict__.update(self.__dict__)
+        for name in ('masks', 'boards', 'meta', 'history', 'future', 'actives'):
+            setattr(other, name, list(getattr(self, name)))
+        return other
+
+    @property
+    def current_player(self):
+        return PLAYERS[self.turn]
+
+    @property
+    def occupied(self):
+        return self.masks[0] | self.masks[1]
+
+    def cell(self, row, col):
+        """Return 'X', 'O' or '' for the given cell"""
+        bit = 1 << (row * 9 + col)
+        if self.masks[0] & bit:
+            return PLAYERS[0]
+        if self.masks[1] & bit:
+            return PLAYERS[1]
+        return ''
+
+    def is_empty(self, row, col):
+        return not self.occupied >> (row * 9 + col) & 1
+
+    def active_boards(self):
+        """The small boards the side to move may play in, or () once the game is over"""
+        if self.winner is not None:
+            return ()
+        if self.active is not None:
+            return (self.active,)
+        return OPEN[self.closed]
+
+    def is_legal(self, row, col):
+        if not (0 <= row < 9 and 0 <= col < 9):
+            return False
+        board, cell = SPLIT[row * 9 + col]
+        return (board in self.active_boards()
+                and not (self.boards[0] | self.boards[1]) >> (9 * board + cell) & 1)
+
+    def is_over(self):
+        return self.winner is not None or self.closed == ALL_BOARDS
+
+    def legal_moves(self):
+        """List the (row, col) of every move allowed now"""
+        occupied = self.boards[0] | self.boards[1]
+        return [divmod(JOIN[9 * board + cell], 9) for board in self.active_boards()
+                for cell in FREE[occupied >> 9 * board & 511]]
+
+    def make_move(self, row, col):
+        """Place the current player's mark; return False if the move is not allowed"""
+        if not self.is_legal(row, col):
+            return False
+        if self.future:
+            self.future.clear()
+        board, cell = SPLIT[row * 9 + col]
+        keys, o_to_move, active_keys = SHAPE.zobrist
+        turn = self.turn
+        self.masks[turn] |= 1 << (row * 9 + col)
+        mine = self.boards[turn] = self.boards[turn] | 1 << (9 * board + cell)
+        self.hash ^= keys[turn][row * 9 + col]
+        self.move_count += 1
+        self.last_move = row * 9 + col
+        self.history.append(row * 9 + col)
+        self.actives.append(self.active)
+
+        small = mine >> 9 * board & 511
+        if WINS[small]:
+            self.meta[turn] |= 1 << board
+            self.closed |= 1 << board
+            if WINS[self.meta[turn]]:
+                self.winner = PLAYERS[turn]
+                self.winning_mask = self._meta_line(self.meta[turn])
+                self._set_active(None)
+                return True
+        elif small | self.boards[turn ^ 1] >> 9 * board & 511 == 511:
+            self.closed |= 1 << board
+        self._set_active(None if self.closed >> cell & 1 else cell)
+        self.turn ^= 1
+        self.hash ^= o_to_move
+        return True
+
+    def undo_move(self):
+        """Take back the last move; return its (row, col), or None at the start"""
+        if not self.history:
+            return None
+        keys, o_to_move, _ = SHAPE.zobrist
+        index = self.history.pop()
+        if self.winner is not None:
+            self.winner = None
+            self.winning_mask = 0
+        else:
+            self.turn ^= 1
+            self.hash ^= o_to_move
+        board, cell = SPLIT[index]
+        turn = self.turn
+        self.masks[turn] &= ~(1 << index)
+        self.boards[turn] &= ~(1 << (9 * board + cell))
+        self.hash ^= keys[turn][index]
+        # The move that was undone is the one that decided its small board, if any
+        self.meta[turn] &= ~(1 << board)
+        self.closed &= ~(1 << board)
+        self._set_active(self.actives.pop())
+        self.move_count -= 1
+        self.last_move = self.history[-1] if self.history else None
+        self.future.append(index)
+        return divmod(index, 9)
+
+    def redo_move(self):
+        """Play the last undone move again; return its (row, col), or None if there is none"""
+        if not self.future:
+            return None
+        future = self.future
+        self.future = []
+        row, col = divmod(future.pop(), 9)
+        self.make_move(row, col)
+        self.future = future
+        return row, col
+
+    def _set_active(self, active):
+        _, _, active_keys = SHAPE.zobrist
+        if self.active is not None:
+            self.hash ^= active_keys[self.active]
+        if active is not None:
+            self.hash ^= active_keys[active]
+        self.active = active
+
+    @staticmethod
+    def _meta_line(meta):
+        """Row-major mask of the centres of the small boards on the winning line"""
+        line = next(line for line in LINES if meta & line == line)
+        return sum(1 << JOIN[9 * board + 4] for board in range(9) if line >> board & 1)
+
+    def check_winner(self):
+        return self.winner is not None
+
+    def is_board_full(self):
+        """Every small board has been won or filled"""
+        return self.closed == ALL_BOARDS
+
+    def winning_line_coords(self):
+        """Return the centres of the end boards of the winning line, or None"""
+        if not self.winning_mask:
+            return None
+        first = (self.winning_mask & -self.winning_mask).bit_length() - 1
+        last = self.winning_mask.bit_length() - 1
+        return [divmod(first, 9), divmod(last, 9)]
+
+
+def create_game(rows=3, cols=3, k=3):
+    """A GameLogic for an m,n,k board, or an UltimateGame for ULTIMATE_SIZE"""
+    if (rows, cols, k) == ULTIMATE_SIZE:
+        return UltimateGame()
+    from .game_logic import GameLogic
+    return GameLogic(rows, cols, k)
+
+
+# Static evaluation, from the point of view of the side owning `mine`.
+# A small board pattern is indexed by TERNARY[mine] + 2 * TERNARY[theirs].
+TERNARY = tuple(sum(3 ** cell for cell in range(9) if mask >> cell & 1) for mask in range(512))
+TERNARY2 = tuple(2 * value for value in TERNARY)
+
+
+def _pattern_scores(won, line_weights, centre):
+    """Score every (mine, theirs) pattern of a 3x3 board, indexed as above"""
+    scores = [0] * 3 ** 9
+    for mine in range(512):
+        # Every subset of the other cells, largest first
+        free = ~mine & 511
+        theirs = free
+        while True:
+            if WINS[mine]:
+                score = won
+            elif WINS[theirs]:
+                score = -won
+            else:
+                score = 0
+                for line in LINES:
+                    if not line & theirs:
+                        score += line_weights[(line & mine).bit_count()]
+                    elif not line & mine:
+                        score -= line_weights[(line & theirs).bit_count()]
+                score += centre * ((mine >> 4 & 1) - (theirs >> 4 & 1))
+            scores[TERNARY[mine] + TERNARY2[theirs]] = score
+            if not theirs:
+                break
+            theirs = (theirs - 1) & free
+    return tuple(scores)
+
+
+_tables = []
+
+
+def _evaluation_tables():
+    """Pattern scores for small boards and for the meta board, built on first use"""
+    if not _tables:
+        _tables.append(_pattern_scores(60, (0, 1, 4, 0), 2))
+        _tables.append(_pattern_scores(WIN_SCORE // 2, (0, 20, 90, 0), 30))
+    return _tables
+
+
+class UltimateEngine:
+    """Negamax with alpha-beta over nested bitboards, deepened until time runs out
+
+    A position is a handful of integers passed down the recursion - both
+    sides' marks, their meta masks, the decided small boards, the active
+    small board and the running score - so a move is made by building
+    the child's arguments and nothing has to be undone.  The static
+    evaluation is kept incrementally: a move changes one small board, whose
+    pattern score is swapped in from a 3^9 table, and the meta board is
+    scored from the same kind of table at the leaves.
+    """
+
+    name = "Ultimate alpha-beta"
+
+    def __init__(self, time_limit=1.0, max_depth=None):
+        self.time_limit = time_limit
+        self.max_depth = max_depth
+        self.nodes = 0
+        self.last_score = 0
+        self.last_depth = 0
+        self.positions_per_second = 0.0
+        self.cancel = None
+        self.deadline = None
+        self.small_scores, self.meta_scores = _evaluation_tables()
+
+    def choose_move(self, game, cancel=None):
+        """Return the (row, col) the engine would play in `game`"""
+        ranked = self.search(game, cancel)
+        return divmod(JOIN[ranked[0]], 9) if ranked else None
+
+    def search(self, game, cancel=None):
+        """Return the legal moves as board-major cells (9b + c), best first"""
+        turn = game.turn
+        me, opp = game.boards[turn], game.boards[turn ^ 1]
+        my_meta, their_meta = game.meta[turn], game.meta[turn ^ 1]
+        active = -1 if game.active is None else game.active
+        small = self.small_scores
+        score = 0
+        for board in range(9):
+            score += small[TERNARY[me >> 9 * board & 511] + TERNARY2[opp >> 9 * board & 511]]
+
+        self.nodes = 0
+        self.cancel = cancel
+        self.deadline = None
+        started = time.monotonic()
+        if self.time_limit is not None:
+            self.deadline = started + self.time_limit
+        occupied = me | opp
+        ranked = [9 * board + cell for board in game.active_boards()
+                  for cell in FREE[occupied >> 9 * board & 511]]
+        self.last_score = 0
+        self.last_depth = 0
+        depth = 0
+        while ranked and depth < min(self.max_depth or 81, 81 - game.move_count):
+            depth += 1
+            try:
+                scored = self._search_root(ranked, me, opp, my_meta, their_meta, game.closed,
+                                           score, depth)
+            except SearchAborted:
+                break
+            scored.sort(key=lambda item: -item[0])
+            ranked = [move for _, move in scored]
+            self.last_score = scored[0][0]
+            self.last_depth = depth
+            if abs(self.last_score) >= WIN_SCORE:
+                break
+        elapsed = time.monotonic() - started
+        self.positions_per_second = self.nodes / elapsed if elapsed > 0 else 0.0
+        return ranked
+
+    def _search_root(self, moves, me, opp, my_meta, their_meta, closed, score, depth):
+        alpha, beta = -INFINITY, INFINITY
+        scored = []
+        for move in moves:
+            value = self._child(move, me, opp, my_meta, their_meta, closed, score, depth,
+                                alpha, beta)
+            scored.append((value, move))
+            if value > alpha:
+                alpha = value
+        return scored
+
+    def _child(self, move, me, opp, my_meta, their_meta, closed, score, depth, alpha, beta):
+        """Value of one move for the side owning `me`; used at the root only"""
+        board, cell = divmod(move, 9)
+        shift = 9 * board
+        mine = me >> shift & 511
+        theirs = opp >> shift & 511
+        new = mine | 1 << cell
+        small = self.small_scores
+        score += small[TERNARY[new] + TERNARY2[theirs]] - small[TERNARY[mine] + TERNARY2[theirs]]
+        if WINS[new]:
+            my_meta |= 1 << board
+            if WINS[my_meta]:
+                return WIN_SCORE + depth
+            closed |= 1 << board
+        elif new | theirs == 511:
+            closed |= 1 << board
+        active = -1 if closed >> cell & 1 else cell
+        return -self._negamax(opp, me | 1 << move, their_meta, my_meta, closed, active, -score,
+                              depth - 1, -beta, -alpha)
+
+    def _negamax(self, me, opp, my_meta, their_meta, closed, active, score, depth, alpha, beta):
+        self.nodes += 1
+        if not self.nodes & 4095:
+            if self.cancel is not None and self.cancel.is_set():
+                raise SearchAborted()
+            if self.deadline is not None and time.monotonic() > self.deadline:
+                raise SearchAborted()
+        if depth == 0:
+            return score + self.meta_scores[TERNARY[my_meta] + TERNARY2[their_meta]]
+        boards = OPEN[closed] if active < 0 else (active,)
+        if not boards:
+            return 0
+
+        small = self.small_scores
+        negamax = self._negamax
+        best = -INFINITY
+        for board in boards:
+            shift = 9 * board
+            mine = me >> shift & 511
+            theirs = opp >> shift & 511
+            pattern = TERNARY2[theirs]
+            rest = score - small[TERNARY[mine] + pattern]
+            for cell in FREE[mine | theirs]:
+                new = mine | 1 << cell
+                if WINS[new]:
+                    meta = my_meta | 1 << board
+                    if WINS[meta]:
+                        # Nothing can beat winning now
+                        return WIN_SCORE + depth
+                    shut = closed | 1 << board
+                elif new | theirs == 511:
+                    meta = my_meta
+                    shut = closed | 1 << board
+                else:
+                    meta = my_meta
+                    shut = closed
+                value = -negamax(opp, me | 1 << (shift + cell), their_meta, meta, shut,
+                                 -1 if shut >> cell & 1 else cell,
+                                 -(rest + small[TERNARY[new] + pattern]), depth - 1,
+                                 -beta, -alpha)
+                if value > best:
+                    best = value
+                    if value > alpha:
+                        alpha = value
+                        if alpha >= beta:
+                            return best
+        return best
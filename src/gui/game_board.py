@@ -1 +1,393 @@
+from PyQt6.QtWidgets import QWidget
+from PyQt6.QtCore import Qt, QPoint, QRect, QRectF, pyqtSignal
+from PyQt6.QtGui import QColor, QFont, QPainter, QPen, QPixmap
 
+CELL_COLOR = QColor("#2C3E50")
+HOVER_COLOR = QColor("#243442")
+MARK_COLOR = QColor("#ECF0F1")
+LINE_COLOR = QColor("#2ECC71")
+HINT_COLOR = QColor("#F1C40F")
+# Heatmap colours for moves that win, draw and lose for the side to play
+GOOD_COLOR = QColor("#2ECC71")
+EVEN_COLOR = QColor("#95A5A6")
+BAD_COLOR = QColor("#E74C3C")
+# Ultimate: outline of the small boards open to the next move, and the
+# tint over small boards that have been won or filled
+ACTIVE_COLOR = QColor("#3498DB")
+DECIDED_COLOR = QColor(26, 37, 47, 150)
+
+# Largest cell drawn, so a 3x3 board keeps its familiar proportions
+MAX_CELL = 150
+
+
+class GameBoard(QWidget):
+    """Paints a whole board of any size in one widget.
+
+    The widget reads marks straight from the GameLogic it shows, so it
+    keeps no per-cell state.  The empty grid is rendered once into a
+    pixmap per size, each mark is a cached pixmap, and clicks are mapped
+    to cells with integer arithmetic.  After a move only that cell (plus
+    the winning line, once there is one) is repainted.
+
+    An ultimate game is drawn as nine 3x3 blocks with wider gaps between
+    them; the blocks open to the next move are outlined, and decided ones
+    are dimmed under the mark of their winner.
+    """
+
+    cell_clicked = pyqtSignal(int, int)
+
+    def __init__(self, game, parent=None):
+        super().__init__(parent)
+        self.setMouseTracking(True)
+        self.game = game
+        self.hover = None
+        self.hint = None
+        self.heatmap = None
+        self.pressed = None
+        self.background = None
+        self.mark_pixmaps = {}
+        self.layout_cells()
+
+    def set_game(self, game):
+        """Show another game, which may have a different board size"""
+        self.game = game
+        self.hover = None
+        self.hint = None
+        self.heatmap = None
+        self.layout_cells()
+        self.update()
+
+    def refresh(self):
+        """Repaint the whole board after the game was reset or replaced"""
+        self.update()
+
+    def update_cell(self, row, col):
+        """Repaint one cell after a move, and the winning line if it just appeared"""
+        if self.block_gap:
+            # The move also changes which small boards are open
+            self.update()
+            return
+        self.update(self.cell_rect(row, col))
+        if self.game.winning_mask:
+            self.update(self.winning_line_rect())
+
+    def set_hint(self, cell):
+        """Outline a suggested (row, col), or remove the outline with None"""
+        if cell != self.hint:
+            for old in (self.hint, cell):
+                if old is not None:
+                    self.update(self.cell_rect(*old))
+            self.hint = cell
+
+    def set_heatmap(self, values):
+        """Tint empty cells by {cell: value from -1 to 1}, or remove the tint with None"""
+        if values or self.heatmap:
+            self.heatmap = values or None
+            self.update()
+
+    # Geometry
+
+    def layout_cells(self):
+        """Work out cell size and spacing so the board fits the widget"""
+        rows, cols = self.game.rows, self.game.cols
+        longest = max(rows, cols)
+        side = max(1, min(self.width(), self.height()))
+        spacing = 20 if longest <= 3 else max(1, 60 // longest)
+        # Cells come in blocks along each axis with block_gap extra pixels
+        # between blocks; a plain board is a single block
+        nested = hasattr(self.game, 'active_boards')
+        self.block = 3 if nested else longest
+        block_gap = 2 * spacing if nested else 0
+        gaps = block_gap * (longest // self.block - 1)
+        cell = (side - spacing * (longest - 1) - gaps) // longest
+        if cell < 4 * spacing:
+            spacing = 0
+            cell = side // longest
+        self.cell_size = max(1, min(MAX_CELL, cell))
+        self.spacing = spacing
+        self.block_gap = block_gap
+        self.pitch = self.cell_size + spacing
+        self.block_pitch = self.block * self.pitch + block_gap
+        # Gap around each cell's painted square; tiny cells packed with no
+        # spacing keep a one pixel gap on one side so the grid stays visible
+        if self.cell_size >= 60:
+            self.square_margins, self.radius = (8, 8, -8, -8), 7
+        elif self.cell_size >= 8:
+            self.square_margins, self.radius = (1, 1, -1, -1), 2
+        else:
+            self.square_margins, self.radius = (0, 0, -1, -1), 0
+        self.origin = QPoint((self.width() - (cols * self.pitch - spacing + gaps)) // 2,
+                             (self.height() - (rows * self.pitch - spacing + gaps)) // 2)
+        self.background = None
+        self.mark_pixmaps = {}
+
+    def resizeEvent(self, event):
+        self.layout_cells()
+        super().resizeEvent(event)
+
+    def cell_rect(self, row, col):
+        block, gap, pitch = self.block, self.block_gap, self.pitch
+        return QRect(self.origin.x() + col * pitch + col // block * gap,
+                     self.origin.y() + row * pitch + row // block * gap,
+                     self.cell_size, self.cell_size)
+
+    def cell_at(self, point):
+        """Return the (row, col) under a widget position, or None between cells"""
+        row = self.index_at(point.y() - self.origin.y())
+        col = self.index_at(point.x() - self.origin.x())
+        if row is None or col is None or row >= self.game.rows or col >= self.game.cols:
+            return None
+        return row, col
+
+    def index_at(self, offset):
+        """The row or column `offset` pixels from the origin falls in, or None in a gap"""
+        if offset < 0:
+            return None
+        block, rest = divmod(offset, self.block_pitch)
+        index, inner = divmod(rest, self.pitch)
+        if index >= self.block or inner >= self.cell_size:
+            return None
+        return block * self.block + index
+
+    def block_rect(self, board):
+        """The square around small board `board` of an ultimate game, gap included"""
+        row, col = 3 * (board // 3), 3 * (board % 3)
+        margin = self.block_gap // 2
+        return QRect(self.cell_rect(row, col).topLeft(),
+                     self.cell_rect(row + 2, col + 2).bottomRight()).adjusted(
+            -margin, -margin, margin, margin)
+
+    def cell_center(self, row, col):
+        return self.cell_rect(row, col).center()
+
+    def winning_line_rect(self):
+        start, end = self.game.winning_line_coords()
+        pen = self.line_width()
+        return QRect(self.cell_center(*start), self.cell_center(*end)).normalized().adjusted(
+            -pen, -pen, pen, pen)
+
+    def line_width(self):
+        return max(2, min(5, self.cell_size // 8))
+
+    # Cached drawings
+
+    def background_pixmap(self):
+        """The empty board at the current size, drawn once"""
+        if self.background is None:
+            ratio = self.devicePixelRatioF()
+            pixmap = QPixmap(self.size() * ratio)
+            pixmap.setDevicePixelRatio(ratio)
+            pixmap.fill(Qt.GlobalColor.transparent)
+            painter = QPainter(pixmap)
+            painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+            painter.setPen(Qt.PenStyle.NoPen)
+            painter.setBrush(CELL_COLOR)
+            for row in range(self.game.rows):
+                for col in range(self.game.cols):
+                    self.paint_square(painter, row, col)
+            painter.end()
+            self.background = pixmap
+        return self.background
+
+    def mark_pixmap(self, player):
+        """A transparent cell-sized picture of 'X' or 'O'"""
+        pixmap = self.mark_pixmaps.get(player)
+        if pixmap is None:
+            ratio = self.devicePixelRatioF()
+            size = self.cell_size
+            pixmap = QPixmap(round(size * ratio), round(size * ratio))
+            pixmap.setDevicePixelRatio(ratio)
+            pixmap.fill(Qt.GlobalColor.transparent)
+            painter = QPainter(pixmap)
+            painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+            if size >= 16:
+                font = QFont('Arial')
+                font.setPixelSize(min(48, size * 3 // 5))
+                font.setBold(True)
+                painter.setFont(font)
+                painter.setPen(MARK_COLOR)
+                painter.drawText(QRect(0, 0, size, size), Qt.AlignmentFlag.AlignCenter, player)
+            else:
+                # Too small for legible text: draw the shapes instead
+                margin = max(1, size // 5)
+                painter.setPen(QPen(MARK_COLOR, max(1, size // 6)))
+                box = QRect(margin, margin, size - 2 * margin, size - 2 * margin)
+                if player == 'X':
+                    painter.drawLine(box.topLeft(), box.bottomRight())
+                    painter.drawLine(box.topRight(), box.bottomLeft())
+                else:
+                    painter.drawEllipse(box)
+            painter.end()
+            self.mark_pixmaps[player] = pixmap
+        return pixmap
+
+    # Painting
+
+    def paint_square(self, painter, row, col):
+        """Fill a cell's rounded square with the painter's brush"""
+        rect = self.cell_rect(row, col).adjusted(*self.square_margins)
+        if self.radius:
+            painter.drawRoundedRect(rect, self.radius, self.radius)
+        else:
+            painter.drawRect(rect)
+
+    def paintEvent(self, event):
+        dirty = event.rect()
+        painter = QPainter(self)
+        background = self.background_pixmap()
+        ratio = background.devicePixelRatio()
+        painter.drawPixmap(QRectF(dirty), background,
+                           QRectF(dirty.x() * ratio, dirty.y() * ratio,
+                                  dirty.width() * ratio, dirty.height() * ratio))
+
+        if self.block_gap:
+            self.paint_blocks(painter)
+        first_row, last_row, first_col, last_col = self.cells_in(dirty)
+        if first_row <= last_row and first_col <= last_col:
+            if self.hover is not None and self.isEnabled():
+                row, col = self.hover
+                if (first_row <= row <= last_row and first_col <= col <= last_col
+                        and self.game.is_legal(row, col)):
+                    painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+                    painter.setPen(Qt.PenStyle.NoPen)
+                    painter.setBrush(HOVER_COLOR)
+                    self.paint_square(painter, row, col)
+            if self.hint is not None:
+                row, col = self.hint
+                if first_row <= row <= last_row and first_col <= col <= last_col:
+                    painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+                    painter.setPen(QPen(HINT_COLOR, self.line_width()))
+                    painter.setBrush(Qt.BrushStyle.NoBrush)
+                    self.paint_square(painter, row, col)
+            if self.heatmap:
+                self.paint_heatmap(painter, first_row, last_row, first_col, last_col)
+            self.paint_marks(painter, first_row, last_row, first_col, last_col)
+        if self.block_gap:
+            self.paint_decided(painter)
+
+        if self.game.winning_mask:
+            start, end = self.game.winning_line_coords()
+            painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+            painter.setPen(QPen(LINE_COLOR, self.line_width()))
+            painter.drawLine(self.cell_center(*start), self.cell_center(*end))
+        painter.end()
+
+    def cells_in(self, rect):
+        """Rows and columns (inclusive ranges) touched by a rectangle"""
+        first_col, last_col = self.span(rect.left() - self.origin.x(),
+                                        rect.right() - self.origin.x(), self.game.cols)
+        first_row, last_row = self.span(rect.top() - self.origin.y(),
+                                        rect.bottom() - self.origin.y(), self.game.rows)
+        return first_row, last_row, first_col, last_col
+
+    def span(self, low, high, count):
+        """First and last index along one axis touched by pixels low..high from the origin"""
+        block, pitch, block_pitch = self.block, self.pitch, self.block_pitch
+        first = low // block_pitch * block + min(block - 1, low % block_pitch // pitch)
+        last = high // block_pitch * block + min(block - 1, high % block_pitch // pitch)
+        return max(0, first), min(count - 1, last)
+
+    def paint_blocks(self, painter):
+        """Outline the small boards the next move may go in"""
+        if not self.isEnabled():
+            return
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.setPen(QPen(ACTIVE_COLOR, max(2, self.block_gap // 3)))
+        painter.setBrush(Qt.BrushStyle.NoBrush)
+        for board in self.game.active_boards():
+            painter.drawRoundedRect(self.block_rect(board), self.radius, self.radius)
+
+    def paint_decided(self, painter):
+        """Dim each small board that is won or full, under its winner's mark"""
+        game = self.game
+        if not game.closed:
+            return
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        font = QFont('Arial')
+        font.setPixelSize(self.block_pitch * 3 // 4)
+        font.setBold(True)
+        painter.setFont(font)
+        for board in range(9):
+            if not game.closed >> board & 1:
+                continue
+            rect = self.block_rect(board)
+            painter.setPen(Qt.PenStyle.NoPen)
+            painter.setBrush(DECIDED_COLOR)
+            painter.drawRoundedRect(rect, self.radius, self.radius)
+            for player, meta in zip(('X', 'O'), game.meta):
+                if meta >> board & 1:
+                    painter.setPen(MARK_COLOR)
+                    painter.drawText(rect, Qt.AlignmentFlag.AlignCenter, player)
+
+    def paint_heatmap(self, painter, first_row, last_row, first_col, last_col):
+        """Tint each evaluated empty cell, more strongly the more certain its value"""
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        cols = self.game.cols
+        labelled = self.cell_size >= 48
+        if labelled:
+            font = QFont('Arial')
+            font.setPixelSize(max(10, self.cell_size // 6))
+            painter.setFont(font)
+        for cell, value in self.heatmap.items():
+            row, col = divmod(cell, cols)
+            if not (first_row <= row <= last_row and first_col <= col <= last_col):
+                continue
+            color = QColor(GOOD_COLOR if value > 0 else BAD_COLOR if value < 0 else EVEN_COLOR)
+            color.setAlpha(60 + int(150 * abs(value)))
+            painter.setPen(Qt.PenStyle.NoPen)
+            painter.setBrush(color)
+            self.paint_square(painter, row, col)
+            if labelled:
+                painter.setPen(MARK_COLOR)
+                painter.drawText(self.cell_rect(row, col), Qt.AlignmentFlag.AlignCenter, f"{value:+.2f}")
+
+    def paint_marks(self, painter, first_row, last_row, first_col, last_col):
+        """Draw the marks in a block of cells, visiting only occupied ones"""
+        cols = self.game.cols
+        span = last_col - first_col + 1
+        row_mask = (1 << span) - 1
+        for player, mask in zip(('X', 'O'), self.game.masks):
+            if not mask:
+                continue
+            pixmap = self.mark_pixmap(player)
+            for row in range(first_row, last_row + 1):
+                bits = mask >> (row * cols + first_col) & row_mask
+                while bits:
+                    low = bits & -bits
+                    col = first_col + low.bit_length() - 1
+                    painter.drawPixmap(self.cell_rect(row, col).topLeft(), pixmap)
+                    bits ^= low
+
+    # Mouse handling
+
+    def set_hover(self, cell):
+        if cell != self.hover:
+            for old in (self.hover, cell):
+                if old is not None:
+                    self.update(self.cell_rect(*old))
+            self.hover = cell
+
+    def mouseMoveEvent(self, event):
+        self.set_hover(self.cell_at(event.position().toPoint()))
+
+    def leaveEvent(self, event):
+        self.set_hover(None)
+        super().leaveEvent(event)
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.MouseButton.LeftButton:
+            self.pressed = self.cell_at(event.position().toPoint())
+
+    def mouseReleaseEvent(self, event):
+        # Like a button, a click counts only if it is released on the same cell
+        if event.button() != Qt.MouseButton.LeftButton:
+            return
+        cell = self.cell_at(event.position().toPoint())
+        if cell is not None and cell == self.pressed:
+            self.cell_clicked.emit(*cell)
+        self.pressed = None
+
+    def changeEvent(self, event):
+        if event.type() == event.Type.EnabledChange:
+            self.set_hover(None)
+        super().changeEvent(event)
@@ -0,0 +1,131 @@
+import time
+
+from PyQt6.QtWidgets import QFileDialog, QFrame, QHBoxLayout, QLabel, QPushButton, QVBoxLayout
+from PyQt6.QtCore import QEvent, Qt, QTimer
+
+from game.game_logic import GameLogic
+from game.latency import LatencyRecorder
+from game.stats import StatsStore
+from .game_board import GameBoard
+from .search_worker import SearchTask
+
+# How often the event loop is expected to wake up, and how late it may be
+# before a wake-up counts as a stall
+HEARTBEAT_MS = 20
+STALL_MS = 50
+
+
+class LatencyOverlay(QFrame):
+    """Floating table of live latency percentiles, shown over the game window.
+
+    Timings are only recorded while the overlay is active: showing it wraps
+    the hooked methods and hiding it restores the originals.
+    """
+
+    def __init__(self, window):
+        super().__init__(window)
+        self.setObjectName("latencyOverlay")
+        self.window_ = window
+        self.recorder = LatencyRecorder()
+        self.last_beat = None
+        self.last_stall = None
+        self.click_at = None
+
+        layout = QVBoxLayout(self)
+        self.table = QLabel()
+        self.table.setObjectName("latencyTable")
+        self.table.setTextFormat(Qt.TextFormat.PlainText)
+        layout.addWidget(self.table)
+        buttons = QHBoxLayout()
+        export_button = QPushButton("Export JSON")
+        export_button.clicked.connect(self.export)
+        clear_button = QPushButton("Clear")
+        clear_button.clicked.connect(self.clear)
+        buttons.addWidget(export_button)
+        buttons.addWidget(clear_button)
+        layout.addLayout(buttons)
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.heartbeat = QTimer(self)
+        self.heartbeat.setTimerType(Qt.TimerType.PreciseTimer)
+        self.heartbeat.timeout.connect(self.beat)
+        self.hide()
+
+    def hooks(self):
+        """(owner, method, subsystem, blocks the GUI thread) for every timed call"""
+        return (
+            (GameLogic, 'make_move', 'rules.make_move', True),
+            (GameLogic, 'check_winner', 'rules.check_winner', True),
+            (StatsStore, 'record_game', 'stats.record_game', True),
+            (type(self.window_), 'update_stats_display', 'stats.display', True),
+            (SearchTask, 'run', 'ai.search', False),
+            (GameBoard, 'paintEvent', 'gui.paint', True),
+        )
+
+    def set_active(self, active):
+        if active == self.isVisible():
+            return
+        if active:
+            for owner, attribute, name, blocking in self.hooks():
+                self.recorder.instrument(owner, attribute, name, blocking)
+            self.window_.board.installEventFilter(self)
+            self.last_beat = time.perf_counter()
+            self.heartbeat.start(HEARTBEAT_MS)
+            self.refresh_timer.start(500)
+            self.refresh()
+            self.show()
+            self.raise_()
+        else:
+            self.recorder.uninstrument()
+            self.window_.board.removeEventFilter(self)
+            self.heartbeat.stop()
+            self.refresh_timer.stop()
+            self.hide()
+
+    def eventFilter(self, watched, event):
+        # Time from releasing the mouse on the board to the board starting to repaint
+        kind = event.type()
+        if kind == QEvent.Type.MouseButtonRelease:
+            self.click_at = time.perf_counter()
+        elif kind == QEvent.Type.Paint and self.click_at is not None:
+            self.recorder.record('gui.click_to_paint', self.click_at,
+                                 time.perf_counter() - self.click_at, blocking=False)
+            self.click_at = None
+        return False
+
+    def beat(self):
+        """Measure how late the event loop woke us, and blame stalls on a subsystem"""
+        now = time.perf_counter()
+        due = self.last_beat + HEARTBEAT_MS / 1000
+        self.last_beat = now
+        lag = now - due
+        if lag <= 0:
+            return
+        self.recorder.record('gui.event_loop_lag', due, lag, blocking=False)
+        if lag * 1000 >= STALL_MS:
+            self.last_stall = (lag, self.recorder.culprit(due, now))
+
+    def refresh(self):
+        lines = [f"{'subsystem':22s} {'calls':>6s} {'p50':>7s} {'p95':>7s} {'p99':>7s} {'max':>7s}  ms"]
+        for name, summary in self.recorder.summary().items():
+            if 'p50_ms' not in summary:
+                continue
+            lines.append(f"{name:22s} {summary['count']:6d} {summary['p50_ms']:7.2f} "
+                         f"{summary['p95_ms']:7.2f} {summary['p99_ms']:7.2f} {summary['max_ms']:7.2f}")
+        if self.last_stall:
+            lag, culprit = self.last_stall
+            lines.append(f"last stall: {lag * 1000:.0f} ms, {culprit or 'no hooked subsystem'}")
+        self.table.setText('\n'.join(lines))
+        self.adjustSize()
+
+    def clear(self):
+        self.recorder.clear()
+        self.last_stall = None
+        self.refresh()
+
+    def export(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Export latency", "latency.json",
+                                              "JSON (*.json)")
+        if path:
+            self.recorder.export(path)
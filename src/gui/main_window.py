@@ -1,63 +1,73 @@
+import time
 from PyQt6.QtWidgets import (QMainWindow, QGridLayout, QPushButton, 
-                           QWidget, QLabel, QVBoxLayout, QHBoxLayout, QFrame)
-from PyQt6.QtCore import Qt, QTimer, QPoint
-from PyQt6.QtGui import QFont, QPainter, QPen, QColor
+                           QWidget, QLabel, QVBoxLayout, QHBoxLayout, QFrame,
+                           QInputDialog, QSpinBox, QListWidget)
+from PyQt6.QtCore import Qt, QTimer, QThreadPool
+from PyQt6.QtGui import QColor, QKeySequence, QShortcut
+from game.game_logic import GameLogic
+from game.ultimate import ULTIMATE_SIZE, create_game
+from .game_board import GameBoard
 from .player_dialog import PlayerNameDialog
+from .theme import set_flag
 
-class PlayerStats:
-    def __init__(self, name):
-        self.name = name
-        self.wins = 0
-        self.losses = 0
-        self.draws = 0
+# The engines, stores, record files and network client are imported where
+# they are first used, so none of them delays the first frame
 
-    def add_win(self):
-        self.wins += 1
+# Width and height available to the board inside the game container
+BOARD_PIXELS = 490
 
-    def add_loss(self):
-        self.losses += 1
+# Seconds a hint on a board too big for tables may look for a forced win
+HINT_SECONDS = 1.0
 
-    def add_draw(self):
-        self.draws += 1
-
-    def get_stats_string(self):
-        return f"W: {self.wins} | L: {self.losses} | D: {self.draws}"
-
-class WinningLine(QFrame):
-    def __init__(self, start_point, end_point, parent=None):
-        super().__init__(parent)
-        self.start_point = start_point
-        self.end_point = end_point
-        self.setStyleSheet("background: transparent;")
-
-    def paintEvent(self, event):
-        painter = QPainter(self)
-        pen = QPen(QColor("#3498DB"), 5)
-        painter.setPen(pen)
-        painter.drawLine(self.start_point, self.end_point)
+# Width of the move list beside the board, and the colour of undone moves in it
+HISTORY_PIXELS = 130
+UNDONE_COLOR = QColor("#7F8C8D")
 
 class TicTacToeWindow(QMainWindow):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Tic Tac Toe")
-        self.setFixedSize(700, 900)
+        # Wide enough for the board plus the move list beside it
+        self.setFixedSize(710 + HISTORY_PIXELS, 900)
         
         # Initialize game variables
-        self.current_player = 'X'
-        self.board = [['' for _ in range(3)] for _ in range(3)]
-        self.buttons = []
-        self.winning_line = None
+        self.replay = None
+        self.replay_bar = None
+        self.online = None
         
-        # Get player names
-        dialog = PlayerNameDialog()
-        if dialog.exec():
-            self.player1_name, self.player2_name = dialog.get_player_names()
+        # A session the last run left behind comes back as it was;
+        # otherwise get player names and board size
+        from game.journal import Journal
+        self.journal = Journal()
+        session = self.journal.session
+        if session is not None:
+            self.player1_name, self.player2_name = session.x_name, session.o_name
+            self.game = create_game(*session.board)
+            self.computer = self.engine_for(self.game) if session.computer else None
         else:
-            self.player1_name, self.player2_name = "Player 1", "Player 2"
-        
-        # Initialize player stats
-        self.player1_stats = PlayerStats(self.player1_name)
-        self.player2_stats = PlayerStats(self.player2_name)
+            dialog = PlayerNameDialog()
+            if dialog.exec():
+                self.player1_name, self.player2_name = dialog.get_player_names()
+                self.game = create_game(*dialog.get_board_size())
+                self.computer = self.engine_for(self.game) if dialog.is_vs_computer() else None
+            else:
+                self.player1_name, self.player2_name = "Player 1", "Player 2"
+                self.game = GameLogic()
+                self.computer = None
+        self.board_size = (self.game.rows, self.game.cols, self.game.k)
+        self.game_started_at = time.time()
+
+        # Load player stats from the persistent store; a resumed session
+        # keeps the ones it showed, which may include an unsaved result
+        from game.stats import PlayerStats, StatsStore
+        self.stats_store = StatsStore()
+        self.record_writer = None
+        if session is not None:
+            self.player1_stats = PlayerStats(self.player1_name, *session.stats[0])
+            self.player2_stats = PlayerStats(self.player2_name, *session.stats[1])
+        else:
+            self.player1_stats = self.stats_store.player_stats(self.player1_name)
+            self.player2_stats = self.stats_store.player_stats(self.player2_name)
         
         # Create main widget and layout
         main_widget = QWidget()
@@ -66,18 +76,7 @@ class TicTacToeWindow(QMainWindow):
 
         # Player info frame
         self.player_frame = QFrame()
-        self.player_frame.setStyleSheet("""
-            QFrame {
-                background-color: #34495E;
-                border-radius: 10px;
-                padding: 8px;
-            }
-            QLabel {
-                color: #ECF0F1;
-                font-size: 16px;
-                padding: 5px;
-            }
-        """)
+        self.player_frame.setObjectName("playerFrame")
         
         # Create layout for player frame
         player_layout = QGridLayout()
@@ -91,18 +90,7 @@ class TicTacToeWindow(QMainWindow):
         
         # Add timer label
         self.timer_label = QLabel("00:00")
-        self.timer_label.setStyleSheet("""
-            QLabel {
-                color: #3498DB;
-                font-size: 24px;
-                font-weight: bold;
-                padding: 5px;
-                background-color: #2C3E50;
-                border-radius: 8px;
-                min-width: 100px;
-                text-align: center;
-            }
-        """)
+        self.timer_label.setObjectName("timerLabel")
         self.timer_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         
         # Setup timer
@@ -110,6 +98,21 @@ class TicTacToeWindow(QMainWindow):
         self.seconds_elapsed = 0
         self.game_timer.timeout.connect(self.update_timer)
         
+        # Computer searches run on their own thread so the window stays responsive;
+        # the pool and the thinking timer are made by the first search
+        self.search_pool = None
+        self.search_task = None
+        self.search_id = 0
+        self.search_started = 0.0
+        self.search_hash = 0
+        self.thinking_timer = None
+        # The computer's reply to each position it has seen, by Zobrist hash,
+        # so undoing and replaying a line does not search it again
+        self.computer_moves = {}
+        
+        # A finished game is only saved once it is left, so it can still be undone
+        self.pending_result = False
+        
         # Layout arrangement for player frame
         player_layout.addWidget(self.p1_label, 0, 0)
         player_layout.addWidget(self.timer_label, 0, 1)
@@ -122,63 +125,31 @@ class TicTacToeWindow(QMainWindow):
 
         # Game container
         self.game_container = QFrame()
-        self.game_container.setStyleSheet("""
-            QFrame {
-                background-color: #34495E;
-                border-radius: 10px;
-                padding: 30px;
-                margin: 20px 0;
-            }
-        """)
+        self.game_container.setObjectName("gameContainer")
         self.game_layout = QGridLayout(self.game_container)
-        self.game_layout.setSpacing(20)
         self.game_layout.setContentsMargins(20, 20, 20, 20)
         
-        # Create game board buttons
-        button_style = """
-            QPushButton {
-                background-color: #2C3E50;
-                color: #ECF0F1;
-                font-size: 48px;
-                font-weight: bold;
-                border: 3px solid #34495E;
-                border-radius: 10px;
-                margin: 5px;
-            }
-            QPushButton:hover {
-                background-color: #243442;
-            }
-            QPushButton:disabled {
-                color: #ECF0F1;
-                background-color: #2C3E50;
-            }
-        """
+        # One widget paints the whole board
+        self.board = GameBoard(self.game)
+        self.board.setMinimumSize(BOARD_PIXELS, BOARD_PIXELS)
+        self.board.cell_clicked.connect(self.on_cell_clicked)
+        self.game_layout.addWidget(self.board, 0, 0)
         
-        for row in range(3):
-            button_row = []
-            for col in range(3):
-                button = QPushButton()
-                button.setFixedSize(150, 150)
-                button.setFont(QFont('Arial', 60))
-                button.setStyleSheet(button_style)
-                button.clicked.connect(lambda checked, r=row, c=col: self.make_move(r, c))
-                self.game_layout.addWidget(button, row, col)
-                button_row.append(button)
-            self.buttons.append(button_row)
+        # Moves played so far, then undone ones greyed out; click one to go back to it
+        self.history_list = QListWidget()
+        self.history_list.setObjectName("historyList")
+        self.history_list.setFixedWidth(HISTORY_PIXELS)
+        self.history_played = 0
+        self.history_list.itemClicked.connect(
+            lambda item: self.go_to_move(self.history_list.row(item) + 1))
+        self.game_layout.addWidget(self.history_list, 0, 1)
         
         # Add game container to main layout
         self.main_layout.addWidget(self.game_container)
 
         # Status label
         self.status_label = QLabel(f"{self.player1_name}'s turn (X)")
-        self.status_label.setStyleSheet("""
-            QLabel {
-                color: #ECF0F1;
-                font-size: 18px;
-                font-weight: bold;
-                padding: 8px;
-            }
-        """)
+        self.status_label.setObjectName("statusLabel")
         self.status_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         self.main_layout.addWidget(self.status_label)
 
@@ -186,121 +157,459 @@ class TicTacToeWindow(QMainWindow):
         button_layout = QHBoxLayout()
         
         self.play_again_button = QPushButton("Play Again")
-        self.play_again_button.setStyleSheet("""
-            QPushButton {
-                background-color: #2ECC71;
-                color: #ECF0F1;
-                padding: 12px;
-                font-size: 16px;
-                font-weight: bold;
-                border-radius: 10px;
-                min-width: 160px;
-            }
-            QPushButton:hover {
-                background-color: #27AE60;
-            }
-        """)
+        self.play_again_button.setObjectName("playAgainButton")
         self.play_again_button.clicked.connect(self.play_again)
         
         self.new_game_button = QPushButton("New Game")
-        self.new_game_button.setStyleSheet("""
-            QPushButton {
-                background-color: #3498DB;
-                color: #ECF0F1;
-                padding: 12px;
-                font-size: 16px;
-                font-weight: bold;
-                border-radius: 10px;
-                min-width: 160px;
-            }
-            QPushButton:hover {
-                background-color: #2980B9;
-            }
-        """)
+        self.new_game_button.setObjectName("newGameButton")
         self.new_game_button.clicked.connect(self.new_game)
         
+        self.replay_button = QPushButton("Replay")
+        self.replay_button.setObjectName("replayButton")
+        self.replay_button.clicked.connect(self.start_replay)
+        
+        self.online_button = QPushButton("Play Online")
+        self.online_button.setObjectName("onlineButton")
+        self.online_button.clicked.connect(self.start_online)
+        
         button_layout.addWidget(self.play_again_button)
         button_layout.addWidget(self.new_game_button)
+        button_layout.addWidget(self.replay_button)
+        button_layout.addWidget(self.online_button)
         self.main_layout.addLayout(button_layout)
+
+        # Tools for the game in progress
+        tools_layout = QHBoxLayout()
+        self.undo_button = QPushButton("Undo")
+        self.undo_button.setObjectName("undoButton")
+        self.undo_button.clicked.connect(self.undo)
+        self.redo_button = QPushButton("Redo")
+        self.redo_button.setObjectName("redoButton")
+        self.redo_button.clicked.connect(self.redo)
+        tools_layout.addWidget(self.undo_button)
+        tools_layout.addWidget(self.redo_button)
+        self.best_move_button = QPushButton("Show Best Move")
+        self.best_move_button.setObjectName("bestMoveButton")
+        self.best_move_button.clicked.connect(self.show_best_move)
+        tools_layout.addWidget(self.best_move_button)
+        self.heatmap_button = QPushButton("Heatmap")
+        self.heatmap_button.setObjectName("heatmapButton")
+        self.heatmap_button.setCheckable(True)
+        self.heatmap_button.toggled.connect(self.toggle_heatmap)
+        tools_layout.addWidget(self.heatmap_button)
+        self.main_layout.addLayout(tools_layout)
+        self.solved_engine = None
+        # Hints on boards too big for tables search on a thread of their own
+        self.hint_pool = None
+        self.hint_task = None
+        self.hint_engine = None
+        self.hint_id = 0
+        
+        # The heatmap is computed on its own thread, refining while the player thinks;
+        # the analyzer keeps its search tables from one position to the next
+        self.analysis_pool = None
+        self.analysis_task = None
+        self.analysis_id = 0
+        self.analyzer = None
+        
+        self.update_player_labels()
+        self.sync_history()
+        QShortcut(QKeySequence.StandardKey.Undo, self).activated.connect(self.undo)
+        QShortcut(QKeySequence.StandardKey.Redo, self).activated.connect(self.redo)
+        
+        # F3 shows live latency percentiles; nothing is timed while it is hidden
+        self.latency_overlay = None
+        latency_shortcut = QShortcut(QKeySequence("F3"), self)
+        latency_shortcut.activated.connect(self.toggle_latency)
         
         # Start the timer
         self.game_timer.start(1000)
+        if session is not None:
+            self.resume(session)
+        else:
+            self.journal_players()
+
+    @staticmethod
+    def engine_for(game):
+        """Pick the computer opponent for a board"""
+        from game.ai import engine_for
+        return engine_for(game)
 
     def update_timer(self):
         """Update the timer display"""
         self.seconds_elapsed += 1
+        self.show_clock()
+        self.journal_event('tick', seconds=self.seconds_elapsed)
+
+    def show_clock(self):
         minutes = self.seconds_elapsed // 60
         seconds = self.seconds_elapsed % 60
         self.timer_label.setText(f"{minutes:02d}:{seconds:02d}")
 
+    def on_cell_clicked(self, row, col):
+        """Play a clicked cell unless the computer is thinking or a replay is showing"""
+        if self.online is not None:
+            # The server confirms the move before it is shown
+            if self.online.side == self.game.current_player and self.game.is_empty(row, col):
+                self.online.send_move(row * self.game.cols + col)
+        elif self.search_task is None and self.replay is None:
+            self.make_move(row, col)
+
     def make_move(self, row, col):
         """Handle a player's move"""
-        if self.board[row][col] == '' and not self.check_winner():
-            self.board[row][col] = self.current_player
-            self.buttons[row][col].setText(self.current_player)
-            
-            if self.check_winner():
-                winner_name = self.player1_name if self.current_player == 'X' else self.player2_name
-                self.status_label.setText(f"{winner_name} wins!")
-                # Stop timer when game ends
-                self.game_timer.stop()
-                # Update stats
-                if self.current_player == 'X':
-                    self.player1_stats.add_win()
-                    self.player2_stats.add_loss()
-                else:
-                    self.player2_stats.add_win()
-                    self.player1_stats.add_loss()
-                self.update_stats_display()
-                self.draw_winning_line()
-                self.disable_board()
-            elif self.is_board_full():
-                self.status_label.setText("Game Draw!")
-                # Stop timer when game ends
-                self.game_timer.stop()
-                self.player1_stats.add_draw()
-                self.player2_stats.add_draw()
-                self.update_stats_display()
-                self.disable_board()
+        if self.game.make_move(row, col):
+            self.journal_event('move', cell=self.game.last_move)
+            self.cancel_hint()
+            self.board.set_hint(None)
+            self.board.update_cell(row, col)
+            self.sync_history()
+            self.refresh_analysis()
+            if self.game.is_over():
+                self.finish_game()
+            else:
+                self.show_turn()
+                if self.computer and self.game.current_player == 'O':
+                    self.play_computer_move()
+
+    def show_turn(self):
+        """Show whose turn it is"""
+        current = self.game.current_player
+        current_name = self.player2_name if current == 'O' else self.player1_name
+        self.status_label.setText(f"{current_name}'s turn ({current})")
+        self.update_player_labels()
+
+    def finish_game(self):
+        """Show the result, count it in the stats and stop the board"""
+        self.show_result()
+        self.count_result(self.game.winner, 1)
+        self.pending_result = True
+        self.update_stats_display()
+        self.journal_stats()
+        self.disable_board()
+
+    def show_result(self):
+        """Say who won and stop the clock"""
+        winner = self.game.winner
+        if winner:
+            winner_name = self.player1_name if winner == 'X' else self.player2_name
+            self.status_label.setText(f"{winner_name} wins!")
+        else:
+            self.status_label.setText("Game Draw!")
+        # Stop timer when game ends
+        self.game_timer.stop()
+
+    def reopen_game(self):
+        """Take a finished game's result back out of the stats before undoing into it"""
+        self.count_result(self.game.winner, -1)
+        self.pending_result = False
+        self.update_stats_display()
+        self.journal_stats()
+        self.board.setEnabled(True)
+        self.game_timer.start()
+
+    def count_result(self, winner, step):
+        """Add (step 1) or remove (step -1) a result in both players' displayed stats"""
+        for stats, side in ((self.player1_stats, 'X'), (self.player2_stats, 'O')):
+            if winner is None:
+                stats.draws += step
+            elif winner == side:
+                stats.wins += step
+            else:
+                stats.losses += step
+
+    def commit_result(self):
+        """Save the finished game, which can no longer be undone"""
+        if self.pending_result:
+            self.pending_result = False
+            self.record_result(self.game.winner)
+            self.journal_stats()
+
+    def undo(self):
+        """Take back a move; against the computer, take back its reply as well"""
+        target = self.game.move_count - 1
+        if self.computer and target % 2:
+            target -= 1
+        self.go_to_move(max(0, target))
+
+    def redo(self):
+        """Replay an undone move; against the computer, its reply as well"""
+        target = self.game.move_count + 1
+        if self.computer and target % 2 and target < len(self.game.history) + len(self.game.future):
+            target += 1
+        self.go_to_move(target)
+
+    def go_to_move(self, target):
+        """Undo or redo until `target` moves of the current line have been played"""
+        game = self.game
+        if self.online is not None or self.replay is not None:
+            return
+        if game.is_over() and not self.pending_result:
+            # Its result has been saved already
+            return
+        target = min(target, len(game.history) + len(game.future))
+        if target == game.move_count:
+            return
+        self.cancel_search()
+        if game.is_over():
+            self.reopen_game()
+        while game.move_count > target:
+            # Repaint the cell (and any winning line) before they are cleared
+            self.board.update_cell(*divmod(game.last_move, game.cols))
+            game.undo_move()
+        while game.move_count < target:
+            self.board.update_cell(*game.redo_move())
+        self.journal_event('goto', to=target)
+        self.board.set_hint(None)
+        self.sync_history()
+        self.refresh_analysis()
+        if game.is_over():
+            self.finish_game()
+        else:
+            self.show_turn()
+            if self.computer and game.current_player == 'O':
+                self.play_computer_move()
+
+    def sync_history(self):
+        """Bring the move list and the undo and redo buttons up to date"""
+        history, future = self.game.history, self.game.future
+        total = len(history) + len(future)
+        rows = self.history_list
+        while rows.count() > total:
+            rows.takeItem(rows.count() - 1)
+        # Only rows around the last position shown can have changed: a new
+        # move may replace an undone one, and rows between the two positions
+        # switch between played and undone
+        first = max(0, min(self.history_played, len(history)) - 1)
+        last = min(max(self.history_played, len(history)), rows.count())
+        for number in range(first, total):
+            if last <= number < rows.count():
+                continue
+            cell = history[number] if number < len(history) else future[total - 1 - number]
+            row, col = divmod(cell, self.game.cols)
+            text = f"{number + 1}. {'XO'[number % 2]}  {row + 1}, {col + 1}"
+            if number < rows.count():
+                rows.item(number).setText(text)
             else:
-                self.current_player = 'O' if self.current_player == 'X' else 'X'
-                current_name = self.player2_name if self.current_player == 'O' else self.player1_name
-                self.status_label.setText(f"{current_name}'s turn ({self.current_player})")
-                self.update_player_labels()
-
-    def check_winner(self):
-        """Check if there's a winner"""
-        # Check rows
-        for i in range(3):
-            if self.board[i][0] == self.board[i][1] == self.board[i][2] != '':
-                self.winning_line_coords = [(i, 0), (i, 2)]
-                return True
-
-        # Check columns
-        for i in range(3):
-            if self.board[0][i] == self.board[1][i] == self.board[2][i] != '':
-                self.winning_line_coords = [(0, i), (2, i)]
-                return True
-
-        # Check diagonals
-        if self.board[0][0] == self.board[1][1] == self.board[2][2] != '':
-            self.winning_line_coords = [(0, 0), (2, 2)]
-            return True
-        if self.board[0][2] == self.board[1][1] == self.board[2][0] != '':
-            self.winning_line_coords = [(0, 2), (2, 0)]
-            return True
-
-        return False
-
-    def is_board_full(self):
-        """Check if the board is full"""
-        return all(all(cell != '' for cell in row) for row in self.board)
+                rows.addItem(text)
+            rows.item(number).setData(Qt.ItemDataRole.ForegroundRole,
+                                      None if number < len(history) else UNDONE_COLOR)
+        self.history_played = len(history)
+        rows.setCurrentRow(len(history) - 1)
+        if history:
+            rows.scrollToItem(rows.item(len(history) - 1))
+        self.undo_button.setEnabled(bool(history))
+        self.redo_button.setEnabled(bool(future))
+
+    def play_computer_move(self):
+        """Start searching for O's move in the background"""
+        self.cancel_search()
+        move = self.computer_moves.get(self.game.hash)
+        if move is not None:
+            self.make_move(*move)
+            return
+        if self.search_pool is None:
+            self.search_pool = QThreadPool()
+            self.search_pool.setMaxThreadCount(1)
+            self.thinking_timer = QTimer()
+            self.thinking_timer.setInterval(100)
+            self.thinking_timer.timeout.connect(self.update_thinking)
+        from .search_worker import SearchTask
+        self.search_id += 1
+        self.search_task = SearchTask(self.search_id, self.computer, self.game, fallback=True)
+        self.search_hash = self.game.hash
+        self.search_task.signals.finished.connect(self.on_search_finished)
+        self.search_started = time.monotonic()
+        self.update_thinking()
+        self.thinking_timer.start()
+        self.search_pool.start(self.search_task)
+
+    def on_search_finished(self, search_id, move):
+        """Play the computer's move if it belongs to the current search"""
+        if self.search_task is None or search_id != self.search_id:
+            return
+        self.search_task = None
+        self.thinking_timer.stop()
+        if move:
+            self.computer_moves[self.search_hash] = move
+            self.make_move(*move)
+
+    def cancel_search(self):
+        """Stop any computer search in progress and drop its result"""
+        if self.search_task is not None:
+            self.search_task.cancel()
+            self.search_task = None
+        if self.thinking_timer is not None:
+            self.thinking_timer.stop()
+        self.cancel_hint()
+
+    def update_thinking(self):
+        """Show how long the computer has been thinking"""
+        elapsed = time.monotonic() - self.search_started
+        self.status_label.setText(f"{self.player2_name} is thinking... {elapsed:.1f}s")
+
+    def show_best_move(self):
+        """Highlight the perfect move for the side to play, looked up in a solved table
+
+        Boards too big for tables get a threat-space search instead, run in
+        the background.
+        """
+        if (self.game.is_over() or self.replay is not None or self.search_task is not None
+                or self.online is not None):
+            return
+        size = (self.game.rows, self.game.cols, self.game.k)
+        if self.solved_engine is None or self.solved_engine[0] != size:
+            from game.ai import solved_engine_for
+            self.solved_engine = (size, solved_engine_for(self.game))
+        engine = self.solved_engine[1]
+        if engine is None:
+            from game.tablebase import MAX_CELLS
+            if self.game.shape.cells > MAX_CELLS and self.game.k >= 3 and not self.is_ultimate():
+                self.start_hint()
+            elif self.game.shape.cells > MAX_CELLS:
+                self.status_label.setText("This board is too big to solve exactly")
+            else:
+                rows, cols, k = size
+                self.status_label.setText(f"No tablebase for this board; build one with "
+                                          f"python -m game.tablebase --board {rows} {cols} {k}")
+            return
+        move = engine.choose_move(self.game)
+        if move:
+            self.board.set_hint(move)
+
+    def start_hint(self):
+        """Look for a forced win for the side to play in the background, so the window never waits"""
+        self.cancel_hint()
+        if self.hint_pool is None:
+            self.hint_pool = QThreadPool()
+            self.hint_pool.setMaxThreadCount(1)
+        from game.threats import ThreatEngine
+        from .search_worker import SearchTask
+        self.hint_id += 1
+        self.hint_engine = ThreatEngine(time_limit=HINT_SECONDS)
+        self.hint_task = SearchTask(self.hint_id, self.hint_engine, self.game)
+        self.hint_task.signals.finished.connect(self.on_hint_finished)
+        self.status_label.setText("Looking for a forced win...")
+        self.hint_pool.start(self.hint_task)
+
+    def on_hint_finished(self, hint_id, move):
+        """Show the hint if it is for the position still on the board"""
+        if self.hint_task is None or hint_id != self.hint_id:
+            return
+        self.hint_task = None
+        if not move:
+            self.show_turn()
+            return
+        self.board.set_hint(move)
+        plies = self.hint_engine.last_win
+        if plies:
+            self.status_label.setText(f"Forced win in {plies} move{'s' if plies > 1 else ''}")
+        else:
+            self.status_label.setText("No forced win found; this move looks strongest")
+
+    def cancel_hint(self):
+        """Drop a hint search whose position has changed"""
+        if self.hint_task is not None:
+            self.hint_task.cancel()
+            self.hint_task = None
+
+    def toggle_heatmap(self, on):
+        """Show or hide the evaluation of every empty cell"""
+        if not on:
+            self.heatmap_button.setText("Heatmap")
+        self.refresh_analysis()
+
+    def refresh_analysis(self):
+        """Drop the heatmap of the last position and start analysing this one
+
+        Nothing is analysed while the computer is to move, so the two
+        searches never compete for the CPU.
+        """
+        self.cancel_analysis()
+        self.board.set_heatmap(None)
+        if (not self.heatmap_button.isChecked() or self.game.is_over()
+                or self.replay is not None or self.online is not None or self.is_ultimate()
+                or (self.computer and self.game.current_player == 'O')):
+            return
+        if self.analysis_pool is None:
+            from game.analysis import Analyzer
+            self.analysis_pool = QThreadPool()
+            self.analysis_pool.setMaxThreadCount(1)
+            self.analyzer = Analyzer()
+        from .search_worker import AnalysisTask
+        self.analysis_id += 1
+        self.analysis_task = AnalysisTask(self.analysis_id, self.analyzer, self.game)
+        self.analysis_task.signals.progress.connect(self.on_analysis_progress)
+        self.analysis_pool.start(self.analysis_task)
+
+    def is_ultimate(self):
+        """The analysis and the server only know m,n,k boards"""
+        return (self.game.rows, self.game.cols, self.game.k) == ULTIMATE_SIZE
+
+    def on_analysis_progress(self, analysis_id, label, values):
+        """Show a refinement if it belongs to the current position"""
+        if self.analysis_task is None or analysis_id != self.analysis_id:
+            return
+        self.board.set_heatmap(values)
+        self.heatmap_button.setText(f"Heatmap: {label}")
+
+    def cancel_analysis(self):
+        """Stop analysing the current position"""
+        if self.analysis_task is not None:
+            self.analysis_task.cancel()
+            self.analysis_task = None
 
     def disable_board(self):
-        """Disable all board buttons"""
-        for row in self.buttons:
-            for button in row:
-                button.setEnabled(False)
+        """Stop the board from taking clicks"""
+        self.board.setEnabled(False)
+
+    def record_result(self, winner):
+        """Save the finished game to the stats store and the game record file"""
+        from game.records import GameRecord, RecordWriter
+        self.stats_store.record_game(self.player1_name, self.player2_name, winner,
+                                     self.game.move_count, self.seconds_elapsed)
+        if self.record_writer is None:
+            self.record_writer = RecordWriter()
+        self.record_writer.append(GameRecord.from_game(
+            self.game, self.player1_name, self.player2_name,
+            self.game_started_at, self.seconds_elapsed))
+
+    def journal_event(self, kind, **fields):
+        """Log a change to the local game; online games and replays are not resumed"""
+        if self.online is None and self.replay is None:
+            self.journal.record(kind, **fields)
+
+    def journal_stats(self):
+        x, o = self.player1_stats, self.player2_stats
+        self.journal_event('stats', pending=self.pending_result,
+                           x=[x.wins, x.losses, x.draws], o=[o.wins, o.losses, o.draws])
+
+    def journal_players(self):
+        """Start a new session in the journal with the current players and board"""
+        x, o = self.player1_stats, self.player2_stats
+        self.journal_event('players', x=self.player1_name, o=self.player2_name,
+                           computer=self.computer is not None, board=list(self.board_size),
+                           started_at=self.game_started_at,
+                           x_stats=[x.wins, x.losses, x.draws], o_stats=[o.wins, o.losses, o.draws])
+
+    def resume(self, session):
+        """Put back the moves, clock and unsaved result of the journaled session"""
+        game = self.game
+        for cell in session.moves:
+            game.make_move(*divmod(cell, game.cols))
+        game.future = list(session.future)
+        self.game_started_at = session.started_at
+        self.seconds_elapsed = session.seconds
+        self.pending_result = session.pending_result
+        self.show_clock()
+        self.board.refresh()
+        self.sync_history()
+        if game.is_over():
+            self.show_result()
+            self.disable_board()
+        else:
+            self.show_turn()
+            if self.computer and game.current_player == 'O':
+                self.play_computer_move()
 
     def update_stats_display(self):
         """Update the display of player statistics"""
@@ -309,69 +618,77 @@ class TicTacToeWindow(QMainWindow):
 
     def update_player_labels(self):
         """Update player labels to show current turn"""
-        if self.current_player == 'X':
-            self.p1_label.setStyleSheet("QLabel { color: #3498DB; font-weight: bold; }")
-            self.p2_label.setStyleSheet("QLabel { color: #ECF0F1; }")
-        else:
-            self.p1_label.setStyleSheet("QLabel { color: #ECF0F1; }")
-            self.p2_label.setStyleSheet("QLabel { color: #3498DB; font-weight: bold; }")
-
-    def draw_winning_line(self):
-        """Draw the winning line"""
-        if hasattr(self, 'winning_line_coords'):
-            self.winning_line = WinningLine(
-                self.game_container,
-                self.buttons[self.winning_line_coords[0][0]][self.winning_line_coords[0][1]],
-                self.buttons[self.winning_line_coords[1][0]][self.winning_line_coords[1][1]]
-            )
-            self.winning_line.show()
+        x_to_move = self.game.current_player == 'X'
+        set_flag(self.p1_label, "active", x_to_move)
+        set_flag(self.p2_label, "active", not x_to_move)
+
+    def clear_board(self):
+        """Show the (reset) game on the board and let it take clicks again"""
+        self.board.set_hint(None)
+        self.board.refresh()
+        self.board.setEnabled(True)
+        self.sync_history()
+        self.refresh_analysis()
 
     def play_again(self):
         """Reset the game board but keep the same players and their scores"""
-        if self.winning_line:
-            self.winning_line.deleteLater()
-            self.winning_line = None
+        self.commit_result()
+        self.cancel_search()
+        self.stop_replay()
+        self.leave_online()
         
-        self.current_player = 'X'
-        self.board = [['' for _ in range(3)] for _ in range(3)]
+        # A replay or online game may have left a board of another size
+        if (self.game.rows, self.game.cols, self.game.k) != self.board_size:
+            self.game = create_game(*self.board_size)
+            self.board.set_game(self.game)
+        else:
+            self.game.reset()
+        self.game_started_at = time.time()
+        self.journal_event('reset', board=list(self.board_size), started_at=self.game_started_at)
         
         # Reset timer
         self.seconds_elapsed = 0
         self.timer_label.setText("00:00")
         self.game_timer.start()
         
-        for row in self.buttons:
-            for button in row:
-                button.setText('')
-                button.setEnabled(True)
+        self.clear_board()
         
         self.status_label.setText(f"{self.player1_name}'s turn (X)")
         self.update_player_labels()
 
     def new_game(self):
         """Start a completely new game with new players"""
-        if self.winning_line:
-            self.winning_line.deleteLater()
-            self.winning_line = None
-            
         dialog = PlayerNameDialog()
         if dialog.exec():
+            # The current game carries on if the dialog is cancelled
+            self.commit_result()
+            self.cancel_search()
+            self.stop_replay()
+            self.leave_online()
             self.player1_name, self.player2_name = dialog.get_player_names()
-            self.player1_stats = PlayerStats(self.player1_name)
-            self.player2_stats = PlayerStats(self.player2_name)
+            # Results are written in the background, so let them land first
+            self.stats_store.flush()
+            self.player1_stats = self.stats_store.player_stats(self.player1_name)
+            self.player2_stats = self.stats_store.player_stats(self.player2_name)
             
-            # Reset game state and timer
-            self.current_player = 'X'
-            self.board = [['' for _ in range(3)] for _ in range(3)]
+            # Reset game state and timer, rebuilding the board if its size changed
+            board_size = dialog.get_board_size()
+            if board_size != (self.game.rows, self.game.cols, self.game.k):
+                self.game = create_game(*board_size)
+                self.board.set_game(self.game)
+            else:
+                self.game.reset()
+            self.computer = self.engine_for(self.game) if dialog.is_vs_computer() else None
+            self.computer_moves.clear()
+            self.board_size = board_size
+            self.game_started_at = time.time()
             self.seconds_elapsed = 0
             self.timer_label.setText("00:00")
             self.game_timer.start()
+            self.journal_players()
             
-            # Clear and enable all buttons
-            for row in self.buttons:
-                for button in row:
-                    button.setText('')
-                    button.setEnabled(True)
+            # Clear and enable the board
+            self.clear_board()
             
             # Update labels
             self.p1_label.setText(f"{self.player1_name} (X)")
@@ -380,21 +697,238 @@ class TicTacToeWindow(QMainWindow):
             self.update_stats_display()
             self.update_player_labels()
 
-class WinningLine(QWidget):
-    def __init__(self, parent, start_button, end_button):
-        super().__init__(parent)
-        self.start_button = start_button
-        self.end_button = end_button
-        self.resize(parent.size())
-        self.show()
-
-    def paintEvent(self, event):
-        if self.start_button and self.end_button:
-            painter = QPainter(self)
-            pen = QPen(QColor("#2ECC71"), 5)
-            painter.setPen(pen)
-            
-            start_pos = self.start_button.geometry().center()
-            end_pos = self.end_button.geometry().center()
-            
-            painter.drawLine(start_pos, end_pos)
\ No newline at end of file
+    def build_replay_bar(self):
+        """Create the replay controls the first time a replay starts"""
+        self.replay_bar = QFrame()
+        self.replay_bar.setObjectName("replayBar")
+        layout = QHBoxLayout(self.replay_bar)
+        
+        step_button = QPushButton("Step")
+        step_button.clicked.connect(self.replay_step)
+        self.replay_play_button = QPushButton("Play")
+        self.replay_play_button.clicked.connect(self.toggle_replay)
+        self.replay_speed = QSpinBox()
+        self.replay_speed.setRange(1, 20)
+        self.replay_speed.setValue(2)
+        self.replay_speed.setSuffix(" moves/s")
+        self.replay_speed.valueChanged.connect(
+            lambda value: self.replay_timer.setInterval(1000 // value))
+        exit_button = QPushButton("Exit Replay")
+        exit_button.clicked.connect(self.play_again)
+        
+        self.replay_timer = QTimer()
+        self.replay_timer.timeout.connect(self.replay_step)
+        
+        layout.addWidget(step_button)
+        layout.addWidget(self.replay_play_button)
+        layout.addWidget(self.replay_speed)
+        layout.addWidget(exit_button)
+        self.main_layout.addWidget(self.replay_bar)
+
+    def start_replay(self):
+        """Pick a recorded game and show it move by move"""
+        from game.records import DEFAULT_PATH, RecordReader
+        path = self.record_writer.path if self.record_writer is not None else DEFAULT_PATH
+        try:
+            with RecordReader(path) as reader:
+                count = len(reader)
+        except (OSError, ValueError):
+            count = 0
+        # A game that just finished can be picked too, as the last one
+        if self.pending_result:
+            count += 1
+        if not count:
+            self.status_label.setText("No recorded games yet")
+            return
+        number, ok = QInputDialog.getInt(self, "Replay", f"Game to replay (1-{count}):",
+                                         count, 1, count)
+        if not ok:
+            return
+        # Leaving the finished game for a replay ends it, so it is saved now
+        self.commit_result()
+        try:
+            with RecordReader(path) as reader:
+                record = reader[number - 1]
+        except (OSError, ValueError, IndexError):
+            self.status_label.setText("That game could not be read")
+            return
+        
+        self.cancel_search()
+        self.leave_online()
+        self.game_timer.stop()
+        if (record.rows, record.cols, record.k) != (self.game.rows, self.game.cols, self.game.k):
+            self.game = create_game(record.rows, record.cols, record.k)
+            self.board.set_game(self.game)
+        else:
+            self.game.reset()
+        self.clear_board()
+        self.replay = record
+        self.replay_position = 0
+        self.refresh_analysis()
+        
+        if self.replay_bar is None:
+            self.build_replay_bar()
+        self.replay_bar.show()
+        self.replay_play_button.setText("Play")
+        self.status_label.setText(
+            f"Replay {number}: {record.x_name} (X) vs {record.o_name} (O)")
+
+    def replay_step(self):
+        """Show the next move of the replayed game"""
+        from game.records import DRAW
+        if self.replay is None or self.replay_position >= len(self.replay.moves):
+            self.pause_replay()
+            return
+        row, col = divmod(self.replay.moves[self.replay_position], self.replay.cols)
+        player = self.game.current_player
+        self.game.make_move(row, col)
+        self.board.update_cell(row, col)
+        self.sync_history()
+        self.replay_position += 1
+        
+        if self.game.check_winner():
+            winner_name = self.replay.x_name if player == 'X' else self.replay.o_name
+            self.status_label.setText(f"Replay: {winner_name} wins!")
+        elif self.replay_position == len(self.replay.moves):
+            result = "Game Draw!" if self.replay.result == DRAW else "Game unfinished"
+            self.status_label.setText(f"Replay: {result}")
+        else:
+            self.status_label.setText(
+                f"Replay: move {self.replay_position} of {len(self.replay.moves)}")
+        if self.replay_position == len(self.replay.moves):
+            self.pause_replay()
+
+    def toggle_replay(self):
+        """Play or pause the replay at the chosen speed"""
+        if self.replay_timer.isActive():
+            self.pause_replay()
+        else:
+            self.replay_timer.start(1000 // self.replay_speed.value())
+            self.replay_play_button.setText("Pause")
+
+    def pause_replay(self):
+        if self.replay_bar is not None:
+            self.replay_timer.stop()
+            self.replay_play_button.setText("Play")
+
+    def stop_replay(self):
+        """Leave replay mode without touching the board"""
+        if self.replay_bar is not None:
+            self.pause_replay()
+            self.replay_bar.hide()
+        self.replay = None
+
+    def start_online(self):
+        """Connect to a game server and wait to be matched with an opponent"""
+        if self.board_size == ULTIMATE_SIZE:
+            self.status_label.setText("Online games are played on m,n,k boards only")
+            return
+        from net.protocol import DEFAULT_HOST, DEFAULT_PORT
+        from .online_client import OnlineClient
+        address, ok = QInputDialog.getText(self, "Play Online", "Server (host:port):",
+                                           text=f"{DEFAULT_HOST}:{DEFAULT_PORT}")
+        if not ok or not address.strip():
+            return
+        host, _, port = address.strip().rpartition(':')
+        if not host or not port.isdigit():
+            host, port = address.strip(), str(DEFAULT_PORT)
+        
+        # A finished local game is saved while the journal still follows it
+        self.commit_result()
+        self.cancel_search()
+        self.stop_replay()
+        self.leave_online()
+        self.game_timer.stop()
+        self.offline_players = (self.player1_name, self.player2_name, self.computer)
+        self.online = OnlineClient(host, int(port), self.player1_name, self.board_size, self)
+        self.online.started.connect(self.on_online_started)
+        self.online.moved.connect(self.on_online_moved)
+        self.online.finished.connect(self.on_online_finished)
+        self.online.message.connect(self.status_label.setText)
+        self.status_label.setText(f"Connecting to {host}:{port}...")
+
+    def on_online_started(self, side, rows, cols, k, opponent):
+        """Set up the board for a game the server has just matched"""
+        self.commit_result()
+        me = self.offline_players[0]
+        self.player1_name, self.player2_name = (me, opponent) if side == 'X' else (opponent, me)
+        self.computer = None
+        self.stats_store.flush()
+        self.player1_stats = self.stats_store.player_stats(self.player1_name)
+        self.player2_stats = self.stats_store.player_stats(self.player2_name)
+        
+        if (rows, cols, k) != (self.game.rows, self.game.cols, self.game.k):
+            self.game = GameLogic(rows, cols, k)
+            self.board.set_game(self.game)
+        else:
+            self.game.reset()
+        self.clear_board()
+        self.game_started_at = time.time()
+        self.seconds_elapsed = 0
+        self.timer_label.setText("00:00")
+        self.game_timer.start()
+        
+        self.p1_label.setText(f"{self.player1_name} (X)")
+        self.p2_label.setText(f"{self.player2_name} (O)")
+        self.update_stats_display()
+        self.update_player_labels()
+        self.status_label.setText(f"Online: you play {side}. {self.player1_name}'s turn (X)")
+
+    def on_online_moved(self, side, cell):
+        """Show a move the server has accepted"""
+        if side == self.game.current_player:
+            self.make_move(*divmod(cell, self.game.cols))
+
+    def on_online_finished(self, result, forfeit):
+        """Report a game the opponent left before it was decided"""
+        if forfeit:
+            self.game_timer.stop()
+            self.disable_board()
+            winner_name = self.player1_name if result == 'X' else self.player2_name
+            self.status_label.setText(f"{winner_name} wins by forfeit!")
+
+    def leave_online(self):
+        """Disconnect from the server and bring back the local players"""
+        if self.online is None:
+            return
+        self.online.close()
+        self.online.deleteLater()
+        self.online = None
+        self.player1_name, self.player2_name, self.computer = self.offline_players
+        self.stats_store.flush()
+        self.player1_stats = self.stats_store.player_stats(self.player1_name)
+        self.player2_stats = self.stats_store.player_stats(self.player2_name)
+        self.p1_label.setText(f"{self.player1_name} (X)")
+        self.p2_label.setText(f"{self.player2_name} (O)")
+        self.update_stats_display()
+        # Online results may have changed them, and a resumed session shows the journal's
+        self.journal_stats()
+
+    def toggle_latency(self):
+        """Show or hide the latency overlay, which records timings while it shows"""
+        if self.latency_overlay is None:
+            from .latency_overlay import LatencyOverlay
+            self.latency_overlay = LatencyOverlay(self)
+            self.latency_overlay.move(10, 10)
+        self.latency_overlay.set_active(not self.latency_overlay.isVisible())
+
+    def closeEvent(self, event):
+        """Cancel any running search and write out the journal before the window closes"""
+        if self.latency_overlay is not None:
+            self.latency_overlay.set_active(False)
+        self.commit_result()
+        self.leave_online()
+        self.cancel_search()
+        self.cancel_analysis()
+        if self.search_pool is not None:
+            self.search_pool.waitForDone()
+        if self.analysis_pool is not None:
+            self.analysis_pool.waitForDone()
+        if self.hint_pool is not None:
+            self.hint_pool.waitForDone()
+        self.stats_store.close()
+        self.journal.close()
+        if self.record_writer is not None:
+            self.record_writer.close()
+        super().closeEvent(event)
+
@@ -0,0 +1,64 @@
+from PyQt6.QtCore import QObject, pyqtSignal
+from PyQt6.QtNetwork import QAbstractSocket, QTcpSocket
+
+from net.protocol import FORFEIT, MAX_LINE, clean_name, decode, encode
+
+
+class OnlineClient(QObject):
+    """Talks to net.server over a QTcpSocket and turns its lines into signals"""
+
+    # side, rows, cols, k, opponent name
+    started = pyqtSignal(str, int, int, int, str)
+    # side, cell
+    moved = pyqtSignal(str, int)
+    # 'X', 'O' or 'DRAW', and True if the game ended by forfeit
+    finished = pyqtSignal(str, bool)
+    # Human readable connection news: waiting, errors, disconnects
+    message = pyqtSignal(str)
+
+    def __init__(self, host, port, name, board_size, parent=None):
+        super().__init__(parent)
+        self.name = clean_name(name)
+        self.board_size = board_size
+        self.side = None
+        self.socket = QTcpSocket(self)
+        self.socket.connected.connect(self.on_connected)
+        self.socket.readyRead.connect(self.on_ready_read)
+        self.socket.errorOccurred.connect(self.on_error)
+        self.socket.connectToHost(host, port)
+
+    def send(self, *words):
+        if self.socket.state() == QAbstractSocket.SocketState.ConnectedState:
+            self.socket.write(encode(*words))
+
+    def send_move(self, cell):
+        self.send('MOVE', cell)
+
+    def close(self):
+        """Resign any game in progress and disconnect"""
+        self.send('LEAVE')
+        self.socket.disconnectFromHost()
+
+    def on_connected(self):
+        self.send('HELLO', self.name)
+        self.send('PLAY', *self.board_size)
+
+    def on_ready_read(self):
+        while self.socket.canReadLine():
+            command, args = decode(bytes(self.socket.readLine(MAX_LINE)))
+            if command == 'WAIT':
+                self.message.emit("Waiting for an opponent...")
+            elif command == 'START' and len(args) >= 6:
+                self.side = args[1]
+                rows, cols, k = (int(arg) for arg in args[2:5])
+                self.started.emit(args[1], rows, cols, k, args[5])
+            elif command == 'MOVE' and len(args) == 2:
+                self.moved.emit(args[0], int(args[1]))
+            elif command == 'OVER' and args:
+                self.side = None
+                self.finished.emit(args[0], FORFEIT in args[1:])
+            elif command == 'ERROR':
+                self.message.emit(f"Server: {' '.join(args)}")
+
+    def on_error(self, error):
+        self.message.emit(f"Connection problem: {self.socket.errorString()}")
@@ -1,14 +1,15 @@
 from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, 
-                           QLabel, QLineEdit, QPushButton, QFrame)
+                           QLabel, QLineEdit, QPushButton, QFrame, QSpinBox,
+                           QCheckBox)
 from PyQt6.QtCore import Qt
-from PyQt6.QtGui import QFont
+from game.game_logic import MAX_SIZE
 
 class PlayerNameDialog(QDialog):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Enter Player Names")
         self.setModal(True)
-        self.setFixedSize(600, 600)  # Increased height further
+        self.setFixedSize(600, 760)  # Room for the board size and computer rows
         
         # Main layout with proper spacing
         main_layout = QVBoxLayout()
@@ -17,12 +18,7 @@ class PlayerNameDialog(QDialog):
         
         # Container widget for content
         container = QFrame()
-        container.setStyleSheet("""
-            QFrame {
-                background-color: #2C3E50;
-                border-radius: 15px;
-            }
-        """)
+        container.setObjectName("dialogContainer")
         
         # Content layout
         content_layout = QVBoxLayout(container)
@@ -31,49 +27,13 @@ class PlayerNameDialog(QDialog):
         
         # Title
         title = QLabel("Welcome to Tic Tac Toe!")
-        title.setStyleSheet("""
-            QLabel {
-                color: #3498DB;
-                font-size: 36px;
-                font-weight: bold;
-                padding: 0px;
-                margin: 0px;
-                background: none;
-            }
-        """)
+        title.setObjectName("dialogTitle")
         title.setAlignment(Qt.AlignmentFlag.AlignCenter)
         content_layout.addWidget(title)
         
         # Player 1 section
         p1_container = QFrame()
-        p1_container.setStyleSheet("""
-            QFrame {
-                background: none;
-                border: none;
-                padding: 0px;
-                margin: 0px;
-            }
-            QLabel {
-                color: #ECF0F1;
-                font-size: 20px;
-                font-weight: bold;
-                padding: 0px;
-                margin: 0px 0px 10px 0px;
-                background: none;
-            }
-            QLineEdit {
-                background-color: #34495E;
-                color: #ECF0F1;
-                font-size: 18px;
-                padding: 15px;
-                border: 2px solid #3498DB;
-                border-radius: 10px;
-                margin: 0px;
-            }
-            QLineEdit:focus {
-                border: 2px solid #2ECC71;
-            }
-        """)
+        p1_container.setObjectName("dialogSection")
         p1_layout = QVBoxLayout(p1_container)
         p1_layout.setSpacing(5)
         p1_layout.setContentsMargins(0, 0, 0, 0)
@@ -88,7 +48,7 @@ class PlayerNameDialog(QDialog):
         
         # Player 2 section
         p2_container = QFrame()
-        p2_container.setStyleSheet(p1_container.styleSheet())  # Same style as p1
+        p2_container.setObjectName("dialogSection")
         p2_layout = QVBoxLayout(p2_container)
         p2_layout.setSpacing(5)
         p2_layout.setContentsMargins(0, 0, 0, 0)
@@ -97,36 +57,45 @@ class PlayerNameDialog(QDialog):
         self.p2_input = QLineEdit()
         self.p2_input.setPlaceholderText("Enter name")
         self.p2_input.setMinimumHeight(50)
+        self.computer_checkbox = QCheckBox("Computer plays O")
+        self.computer_checkbox.toggled.connect(self.toggle_computer)
         p2_layout.addWidget(p2_label)
         p2_layout.addWidget(self.p2_input)
+        p2_layout.addWidget(self.computer_checkbox)
         content_layout.addWidget(p2_container)
         
+        # Board size section
+        board_container = QFrame()
+        board_container.setObjectName("dialogSection")
+        board_layout = QHBoxLayout(board_container)
+        board_layout.setSpacing(10)
+        board_layout.setContentsMargins(0, 0, 0, 0)
+        
+        board_label = QLabel("Board (rows x cols, k in a row):")
+        self.rows_input = QSpinBox()
+        self.cols_input = QSpinBox()
+        self.k_input = QSpinBox()
+        for spin_box in (self.rows_input, self.cols_input, self.k_input):
+            spin_box.setRange(3, MAX_SIZE)
+            spin_box.setValue(3)
+        board_layout.addWidget(board_label)
+        board_layout.addWidget(self.rows_input)
+        board_layout.addWidget(self.cols_input)
+        board_layout.addWidget(self.k_input)
+        self.ultimate_checkbox = QCheckBox("Ultimate")
+        self.ultimate_checkbox.setToolTip("Nine 3x3 boards; your move picks where your opponent plays")
+        self.ultimate_checkbox.toggled.connect(self.toggle_ultimate)
+        board_layout.addWidget(self.ultimate_checkbox)
+        content_layout.addWidget(board_container)
+        
         # Start button
         start_button = QPushButton("Start Game")
-        start_button.setStyleSheet("""
-            QPushButton {
-                background-color: #3498DB;
-                color: white;
-                border: none;
-                padding: 15px;
-                font-size: 20px;
-                font-weight: bold;
-                border-radius: 10px;
-                min-width: 250px;
-                margin: 10px 0px;
-            }
-            QPushButton:hover {
-                background-color: #2980B9;
-            }
-            QPushButton:pressed {
-                background-color: #2574A9;
-            }
-        """)
+        start_button.setObjectName("startButton")
         start_button.setCursor(Qt.CursorShape.PointingHandCursor)
         start_button.clicked.connect(self.validate_and_accept)
         
         button_container = QFrame()
-        button_container.setStyleSheet("background: none; border: none;")
+        button_container.setObjectName("dialogInfo")
         button_layout = QHBoxLayout(button_container)
         button_layout.setContentsMargins(0, 0, 0, 0)
         button_layout.addStretch()
@@ -136,18 +105,7 @@ class PlayerNameDialog(QDialog):
         
         # Info section
         info_container = QFrame()
-        info_container.setStyleSheet("""
-            QFrame {
-                background: none;
-                border: none;
-            }
-            QLabel {
-                color: #95A5A6;
-                font-size: 14px;
-                padding: 0px;
-                margin: 0px;
-            }
-        """)
+        info_container.setObjectName("dialogInfo")
         info_layout = QVBoxLayout(info_container)
         info_layout.setSpacing(5)
         info_layout.setContentsMargins(0, 0, 0, 0)
@@ -169,11 +127,28 @@ class PlayerNameDialog(QDialog):
         # Set initial focus
         self.p1_input.setFocus()
 
+    def toggle_computer(self, checked):
+        """Name player 2 after the computer while it is selected"""
+        self.p2_input.setEnabled(not checked)
+        self.p2_input.setText("Computer" if checked else "")
+
+    def toggle_ultimate(self, checked):
+        """The ultimate board has a fixed size"""
+        for spin_box in (self.rows_input, self.cols_input, self.k_input):
+            spin_box.setEnabled(not checked)
+
+    def is_vs_computer(self):
+        return self.computer_checkbox.isChecked()
+
     def validate_and_accept(self):
         if not self.p1_input.text().strip():
             self.p1_input.setText("Player 1")
         if not self.p2_input.text().strip():
             self.p2_input.setText("Player 2")
+        # k cannot be longer than the board's longest side
+        longest = max(self.rows_input.value(), self.cols_input.value())
+        if self.k_input.value() > longest:
+            self.k_input.setValue(longest)
         self.accept()
 
     def get_player_names(self):
@@ -182,6 +157,16 @@ class PlayerNameDialog(QDialog):
             self.p2_input.text().strip() or "Player 2"
         )
 
+    def get_board_size(self):
+        if self.ultimate_checkbox.isChecked():
+            from game.ultimate import ULTIMATE_SIZE
+            return ULTIMATE_SIZE
+        return (
+            self.rows_input.value(),
+            self.cols_input.value(),
+            min(self.k_input.value(), max(self.rows_input.value(), self.cols_input.value()))
+        )
+
     def keyPressEvent(self, event):
         if event.key() == Qt.Key.Key_Return or event.key() == Qt.Key.Key_Enter:
             self.validate_and_accept()
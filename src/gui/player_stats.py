@@ -1,18 +1 @@
-class PlayerStats:
-    def __init__(self, name):
-        self.name = name
-        self.wins = 0
-        self.losses = 0
-        self.draws = 0
-
-    def add_win(self):
-        self.wins += 1
-
-    def add_loss(self):
-        self.losses += 1
-
-    def add_draw(self):
-        self.draws += 1
-
-    def get_stats_string(self):
-        return f"W: {self.wins} L: {self.losses} D: {self.draws}"
+from game.stats import PlayerStats
@@ -0,0 +1,66 @@
+import threading
+import traceback
+
+from PyQt6.QtCore import QObject, QRunnable, pyqtSignal
+
+
+class SearchSignals(QObject):
+    # search id, (row, col) or None
+    finished = pyqtSignal(int, object)
+    # search id, label, {cell: value}
+    progress = pyqtSignal(int, str, object)
+
+
+class SearchTask(QRunnable):
+    """Runs one engine search on a pool thread and reports the move through a signal"""
+
+    def __init__(self, search_id, engine, game, fallback=False):
+        super().__init__()
+        self.search_id = search_id
+        self.engine = engine
+        # Whether to report the first legal move when the engine gives none
+        self.fallback = fallback
+        # The engine works on a copy so the board can change while it thinks
+        self.game = game.copy()
+        self.cancel_event = threading.Event()
+        self.signals = SearchSignals()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def run(self):
+        try:
+            move = self.engine.choose_move(self.game, self.cancel_event)
+        except Exception:
+            traceback.print_exc()
+            move = None
+        if move is None and self.fallback and not self.game.is_over():
+            # The game must go on: take the first legal move rather than none
+            moves = self.game.legal_moves()
+            move = moves[0] if moves else None
+        if not self.cancel_event.is_set():
+            self.signals.finished.emit(self.search_id, move)
+
+
+class AnalysisTask(QRunnable):
+    """Runs an Analyzer on a pool thread, reporting each refinement through a signal"""
+
+    def __init__(self, analysis_id, analyzer, game):
+        super().__init__()
+        self.analysis_id = analysis_id
+        self.analyzer = analyzer
+        self.game = game.copy()
+        self.cancel_event = threading.Event()
+        self.signals = SearchSignals()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def run(self):
+        try:
+            for label, values in self.analyzer.analyze(self.game, self.cancel_event):
+                if self.cancel_event.is_set():
+                    break
+                self.signals.progress.emit(self.analysis_id, label, values)
+        except Exception:
+            traceback.print_exc()
@@ -0,0 +1,27 @@
+import os
+
+STYLE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                          'assets', 'styles', 'style.qss')
+
+
+def apply_stylesheet(app, path=STYLE_PATH):
+    """Give the application its stylesheet, reading the file only once"""
+    if app.property('themePath') == path:
+        return
+    try:
+        with open(path, encoding='utf-8') as handle:
+            app.setStyleSheet(handle.read())
+    except OSError:
+        # Unstyled widgets are still playable
+        return
+    app.setProperty('themePath', path)
+
+
+def set_flag(widget, name, value):
+    """Set a boolean property used by the stylesheet and restyle the widget"""
+    if widget.property(name) == value:
+        return
+    widget.setProperty(name, value)
+    style = widget.style()
+    style.unpolish(widget)
+    style.polish(widget)
@@ -1,12 +1,102 @@
 import sys
-from PyQt6.QtWidgets import QApplication
-from gui.main_window import TicTacToeWindow
+import time
+
+STARTED = time.perf_counter()
+
+
+class StartupProfile:
+    """Times each startup phase and reports when the first frames are painted"""
+
+    def __init__(self):
+        self.last = STARTED
+        self.phases = []
+        self.dialog_closed = None
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    def watch(self, app):
+        """Catch the first paint of the name dialog and of the game window"""
+        from PyQt6.QtCore import QEvent, QObject
+        from PyQt6.QtWidgets import QDialog, QMainWindow
+        profile = self
+
+        class PaintWatcher(QObject):
+            def __init__(self):
+                super().__init__()
+                self.painted = set()
+
+            def eventFilter(self, watched, event):
+                kind = event.type()
+                if kind == QEvent.Type.Paint and watched.isWidgetType():
+                    window = watched.window()
+                    for window_type, name in ((QDialog, 'dialog'), (QMainWindow, 'window')):
+                        if isinstance(window, window_type) and name not in self.painted:
+                            self.painted.add(name)
+                            profile.painted(name)
+                    # The window comes last, whether or not a dialog came first
+                    if 'window' in self.painted:
+                        app.removeEventFilter(self)
+                elif kind == QEvent.Type.Hide and isinstance(watched, QDialog):
+                    profile.dialog_closed = time.perf_counter()
+                return False
+
+        self.watcher = PaintWatcher()
+        app.installEventFilter(self.watcher)
+
+    def painted(self, name):
+        if name == 'dialog':
+            self.mark("construct and lay out name dialog")
+            self.report("First paint (name dialog)", STARTED)
+        elif self.dialog_closed is None:
+            # A resumed session shows no dialog, so the window is the first paint
+            self.mark("construct game window")
+            self.report("First paint (game window)", STARTED)
+        else:
+            # Time spent typing names in the dialog is not startup time
+            start = self.dialog_closed
+            self.last = start
+            self.phases = []
+            self.mark("construct game window")
+            self.report("Game window painted after the dialog closed", start)
+
+    def report(self, title, start):
+        total = time.perf_counter() - start
+        print(f"{title}: {total * 1000:.1f} ms", file=sys.stderr)
+        for phase, seconds in self.phases:
+            print(f"  {phase:36s} {seconds * 1000:8.1f} ms", file=sys.stderr)
+
+
+def main(argv=None):
+    argv = sys.argv if argv is None else argv
+    if '--headless' in argv:
+        # Straight to the terminal game, before anything imports Qt
+        from game.headless import main as headless_main
+        sys.exit(headless_main([arg for arg in argv[1:] if arg != '--headless']))
+    profile = StartupProfile() if '--profile-startup' in argv else None
+    argv = [arg for arg in argv if arg != '--profile-startup']
+
+    from PyQt6.QtWidgets import QApplication
+    if profile:
+        profile.mark("import PyQt6")
+    from gui.main_window import TicTacToeWindow
+    from gui.theme import apply_stylesheet
+    if profile:
+        profile.mark("import game window")
+
+    app = QApplication(argv)
+    if profile:
+        profile.mark("create QApplication")
+        profile.watch(app)
+    apply_stylesheet(app)
+    if profile:
+        profile.mark("load stylesheet")
 
-def main():
-    app = QApplication(sys.argv)
     window = TicTacToeWindow()
     window.show()
     sys.exit(app.exec())
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,137 @@
+"""Scripted load generator for net.server.
+
+Opens ``--idle`` connections that only say hello, plus ``--players``
+connections that queue for games and answer every turn with a random
+legal move until each has finished ``--games`` games.  Prints the move
+rate seen by the clients and the server's own counters.
+
+    python -m net.server &
+    python -m net.loadgen --idle 10000 --players 1000 --games 20
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from game.game_logic import GameLogic
+from .protocol import DEFAULT_HOST, DEFAULT_PORT, decode, encode
+from .server import raise_file_limit
+
+
+class Bot(asyncio.Protocol):
+    """Client that plays random moves as soon as it is its turn"""
+
+    def __init__(self, games, size, done, rng):
+        self.games_left = games
+        self.size = size
+        self.done = done
+        self.rng = rng
+        self.buffer = b''
+        self.transport = None
+        self.game = None
+        self.side = None
+        self.moves = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+        transport.write(encode('HELLO', 'bot'))
+        self.play()
+
+    def connection_lost(self, exc):
+        if not self.done.done():
+            self.done.set_result(self.moves)
+
+    def play(self):
+        if self.games_left:
+            self.transport.write(encode('PLAY', *self.size))
+        else:
+            if not self.done.done():
+                self.done.set_result(self.moves)
+            self.transport.close()
+
+    def data_received(self, data):
+        self.buffer += data
+        *lines, self.buffer = self.buffer.split(b'\n')
+        for line in lines:
+            command, args = decode(line)
+            if command == 'START':
+                self.game = GameLogic(*self.size)
+                self.side = 0 if args[1] == 'X' else 1
+                self.move()
+            elif command == 'MOVE':
+                self.game.make_move(*divmod(int(args[1]), self.game.cols))
+                self.moves += args[0] == ('X', 'O')[self.side]
+                self.move()
+            elif command == 'OVER':
+                self.game = None
+                self.games_left -= 1
+                self.play()
+            elif command == 'ERROR':
+                if not self.done.done():
+                    self.done.set_exception(RuntimeError(' '.join(args)))
+                self.transport.close()
+
+    def move(self):
+        game = self.game
+        if game is None or game.turn != self.side or game.is_over():
+            return
+        row, col = self.rng.choice(game.legal_moves())
+        self.transport.write(encode('MOVE', row * game.cols + col))
+
+
+async def server_stats(host, port):
+    reader, writer = await asyncio.open_connection(host, port)
+    await reader.readline()
+    writer.write(encode('STATS'))
+    await writer.drain()
+    line = await reader.readline()
+    writer.close()
+    return line.decode().strip()
+
+
+async def run(host, port, idle, players, games, size, seed=None):
+    """Run the load; return (moves played, seconds taken, server STATS line)"""
+    loop = asyncio.get_running_loop()
+    rng = random.Random(seed)
+
+    idle_transports = []
+    for _ in range(idle):
+        transport, _ = await loop.create_connection(asyncio.Protocol, host, port)
+        transport.write(encode('HELLO', 'idle'))
+        idle_transports.append(transport)
+
+    start = time.perf_counter()
+    finished = []
+    for _ in range(players):
+        done = loop.create_future()
+        await loop.create_connection(lambda: Bot(games, size, done, rng), host, port)
+        finished.append(done)
+    moves = sum(await asyncio.gather(*finished))
+    elapsed = time.perf_counter() - start
+
+    stats = await server_stats(host, port)
+    for transport in idle_transports:
+        transport.close()
+    return moves, elapsed, stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate load against the game server")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--idle', type=int, default=0, help="connections that stay idle")
+    parser.add_argument('--players', type=int, default=200, help="connections that play")
+    parser.add_argument('--games', type=int, default=10, help="games per playing connection")
+    parser.add_argument('--board', type=int, nargs=3, default=(3, 3, 3), metavar=('ROWS', 'COLS', 'K'))
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args(argv)
+    raise_file_limit()
+    moves, elapsed, stats = asyncio.run(run(args.host, args.port, args.idle, args.players,
+                                            args.games, tuple(args.board), args.seed))
+    print(f"{moves} moves in {elapsed:.2f}s ({moves / elapsed:,.0f} moves/s)")
+    print(f"server: {stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Line protocol spoken between game clients and the server.
+
+Every message is one line of ASCII words ending in a newline.
+
+Client to server:
+    HELLO <name>              set the name shown to opponents
+    PLAY [rows cols k]        join the matchmaking queue (3 3 3 by default)
+    MOVE <cell>               play cell row * cols + col
+    LEAVE                     resign the current game or leave the queue
+    STATS                     ask for server counters
+
+Server to client:
+    WELCOME                   sent on connect
+    WAIT                      queued until an opponent arrives
+    START <id> <side> <rows> <cols> <k> <opponent>
+    MOVE <side> <cell>        a move was played (sent to both players)
+    OVER <X|O|DRAW> [reason]  the game ended; reason is FORFEIT on resign
+    STATS <key=value> ...
+    ERROR <message>
+"""
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 7777
+
+# Longest line either side will buffer before dropping the connection
+MAX_LINE = 1024
+
+DRAW = 'DRAW'
+FORFEIT = 'FORFEIT'
+
+
+def encode(*words):
+    return (' '.join(str(word) for word in words) + '\n').encode('ascii', 'replace')
+
+
+def decode(line):
+    """Split a received line into (command, arguments)"""
+    words = line.decode('ascii', 'replace').split()
+    if not words:
+        return '', []
+    return words[0].upper(), words[1:]
+
+
+def clean_name(name):
+    """Names travel as one word, so spaces become underscores"""
+    return '_'.join(name.split())[:32] or 'anonymous'
@@ -0,0 +1,230 @@
+"""Headless asyncio server hosting many concurrent games.
+
+Each connection is a small asyncio.Protocol with no task or stream
+objects of its own, and each game is a GameLogic (two bitmasks), so idle
+sessions cost a few hundred bytes and moves are handled straight from
+data_received.  Players are paired per board size by a FIFO queue.
+
+Run ``python -m net.server`` from src/ and drive it with net.loadgen.
+"""
+
+import argparse
+import asyncio
+import itertools
+from collections import deque
+
+from game.game_logic import GameLogic
+from .protocol import (DEFAULT_HOST, DEFAULT_PORT, DRAW, FORFEIT, MAX_LINE,
+                       clean_name, decode, encode)
+
+SIDES = ('X', 'O')
+
+
+class Match:
+    __slots__ = ('id', 'game', 'players')
+
+    def __init__(self, match_id, game, players):
+        self.id = match_id
+        self.game = game
+        self.players = players
+
+
+class Connection(asyncio.Protocol):
+    __slots__ = ('server', 'transport', 'buffer', 'name', 'match', 'side', 'queued')
+
+    def __init__(self, server):
+        self.server = server
+        self.transport = None
+        self.buffer = b''
+        self.name = 'anonymous'
+        self.match = None
+        self.side = None
+        self.queued = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.server.connections += 1
+        self.send('WELCOME')
+
+    def connection_lost(self, exc):
+        self.server.connections -= 1
+        self.server.leave(self)
+
+    def data_received(self, data):
+        self.buffer += data
+        while True:
+            end = self.buffer.find(b'\n')
+            if end < 0:
+                break
+            line = self.buffer[:end]
+            self.buffer = self.buffer[end + 1:]
+            self.server.handle(self, line)
+        if len(self.buffer) > MAX_LINE:
+            self.send('ERROR', 'line too long')
+            self.transport.close()
+
+    def send(self, *words):
+        if self.transport is not None and not self.transport.is_closing():
+            self.transport.write(encode(*words))
+
+
+class GameServer:
+    """Matchmaking and game state for every connected client"""
+
+    def __init__(self):
+        self.connections = 0
+        self.matches = {}
+        self.queues = {}
+        self.match_ids = itertools.count(1)
+        self.games_started = 0
+        self.moves = 0
+        self.commands = {
+            'HELLO': self.on_hello,
+            'PLAY': self.on_play,
+            'MOVE': self.on_move,
+            'LEAVE': self.on_leave,
+            'STATS': self.on_stats,
+        }
+
+    def protocol_factory(self):
+        return Connection(self)
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT, **kwargs):
+        """Start listening and return the asyncio server"""
+        loop = asyncio.get_running_loop()
+        return await loop.create_server(self.protocol_factory, host, port, **kwargs)
+
+    def handle(self, connection, line):
+        command, args = decode(line)
+        handler = self.commands.get(command)
+        if handler is None:
+            connection.send('ERROR', f'unknown command {command or "(empty)"}')
+            return
+        handler(connection, args)
+
+    def on_hello(self, connection, args):
+        connection.name = clean_name(' '.join(args))
+
+    def on_play(self, connection, args):
+        if connection.match is not None or connection.queued is not None:
+            connection.send('ERROR', 'already playing')
+            return
+        try:
+            size = tuple(int(arg) for arg in args) if args else (3, 3, 3)
+            if len(size) != 3:
+                raise ValueError
+            GameLogic(*size)
+        except ValueError:
+            connection.send('ERROR', 'bad board size')
+            return
+
+        waiting = self.queues.setdefault(size, deque())
+        while waiting:
+            opponent = waiting.popleft()
+            if opponent.transport is not None and not opponent.transport.is_closing():
+                opponent.queued = None
+                self.start_match(size, opponent, connection)
+                return
+        waiting.append(connection)
+        connection.queued = size
+        connection.send('WAIT')
+
+    def start_match(self, size, first, second):
+        match = Match(next(self.match_ids), GameLogic(*size), (first, second))
+        self.matches[match.id] = match
+        self.games_started += 1
+        for side, (player, opponent) in enumerate(((first, second), (second, first))):
+            player.match = match
+            player.side = side
+            player.send('START', match.id, SIDES[side], *size, opponent.name)
+
+    def on_move(self, connection, args):
+        match = connection.match
+        if match is None:
+            connection.send('ERROR', 'not in a game')
+            return
+        game = match.game
+        if game.turn != connection.side:
+            connection.send('ERROR', 'not your turn')
+            return
+        try:
+            cell = int(args[0])
+        except (IndexError, ValueError):
+            connection.send('ERROR', 'bad move')
+            return
+        if not 0 <= cell < game.shape.cells or not game.make_move(*divmod(cell, game.cols)):
+            connection.send('ERROR', 'illegal move')
+            return
+
+        self.moves += 1
+        message = encode('MOVE', SIDES[connection.side], cell)
+        for player in match.players:
+            if player.transport is not None and not player.transport.is_closing():
+                player.transport.write(message)
+        if game.winner is not None:
+            self.finish(match, game.winner)
+        elif game.is_board_full():
+            self.finish(match, DRAW)
+
+    def finish(self, match, result, reason=None):
+        self.matches.pop(match.id, None)
+        for player in match.players:
+            player.match = None
+            player.side = None
+            if reason:
+                player.send('OVER', result, reason)
+            else:
+                player.send('OVER', result)
+
+    def on_leave(self, connection, args):
+        self.leave(connection)
+
+    def leave(self, connection):
+        """Take a connection out of the queue or forfeit its game"""
+        if connection.queued is not None:
+            waiting = self.queues.get(connection.queued)
+            if waiting is not None and connection in waiting:
+                waiting.remove(connection)
+            connection.queued = None
+        match = connection.match
+        if match is not None:
+            self.finish(match, SIDES[connection.side ^ 1], FORFEIT)
+
+    def on_stats(self, connection, args):
+        connection.send('STATS', f'connections={self.connections}', f'games={len(self.matches)}',
+                        f'started={self.games_started}', f'moves={self.moves}')
+
+
+def raise_file_limit():
+    """Allow as many open sockets as the hard limit permits"""
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+async def serve(host, port):
+    server = GameServer()
+    listener = await server.start(host, port, backlog=4096)
+    print(f"Serving on {host}:{port}")
+    async with listener:
+        await listener.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Host tic-tac-toe games over TCP")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    args = parser.parse_args(argv)
+    raise_file_limit()
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The application is run from src/, so its packages are imported top-level
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
@@ -0,0 +1,58 @@
+import threading
+
+from game.analysis import Analyzer, score_value
+from game.ai import WIN_SCORE
+from game.game_logic import GameLogic
+
+
+def test_solved_board_is_answered_exactly_at_once():
+    game = GameLogic()
+    for move in [(0, 0), (1, 1), (0, 1)]:
+        game.make_move(*move)
+    refinements = list(Analyzer().analyze(game))
+    assert len(refinements) == 1
+    label, values = refinements[0]
+    assert label == "exact" and len(values) == 6
+    # O must block at (0, 2); everything else loses
+    assert values[2] == 0 and all(value == -1 for cell, value in values.items() if cell != 2)
+
+
+def test_deepening_refines_until_exact_and_reuses_the_table(monkeypatch):
+    # Searched even if a tablebase for the board has been generated
+    monkeypatch.setattr('game.analysis.solved_engine_for', lambda game: None)
+    analyzer = Analyzer()
+    game = GameLogic(3, 4, 3)
+    game.make_move(1, 1)
+    refinements = list(analyzer.analyze(game))
+    labels = [label for label, _ in refinements]
+    assert labels[0] == "depth 1" and labels[-1] == "exact"
+    assert all(value == -1 for value in refinements[-1][1].values())
+
+    # The next position costs less with the entries left by the last analysis
+    game.make_move(0, 0)
+    fresh = Analyzer()
+    list(fresh.analyze(game))
+    nodes_before = analyzer.alphabeta.nodes
+    label, values = list(analyzer.analyze(game))[-1]
+    assert label == "exact" and max(values.values()) == 1
+    assert analyzer.alphabeta.nodes - nodes_before < fresh.alphabeta.nodes
+
+
+def test_monte_carlo_refinements_stop_when_cancelled():
+    game = GameLogic(9, 9, 5)
+    for move in [(4, 4), (0, 0), (4, 5), (0, 8), (4, 6), (8, 0), (4, 7), (8, 8)]:
+        game.make_move(*move)
+    cancel = threading.Event()
+    refinements = Analyzer(seed=1).analyze(game, cancel)
+    label, values = next(refinements)
+    assert label.endswith("playouts")
+    # Completing the four wins outright
+    assert max(values, key=values.get) in (4 * 9 + 3, 4 * 9 + 8)
+    cancel.set()
+    assert next(refinements, None) is None
+
+
+def test_score_values():
+    assert score_value(WIN_SCORE + 3) == 1.0 and score_value(-WIN_SCORE) == -1.0
+    assert -0.99 <= score_value(-WIN_SCORE + 1) < 0
+    assert score_value(5, exact=True) == 0.0
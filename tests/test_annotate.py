@@ -0,0 +1,47 @@
+import json
+
+from game.annotate import analyze_log, player_stats
+from game.game_logic import GameLogic
+from game.solved_table import DRAW, LOSS, TableEngine
+
+
+def perfect_game(opening):
+    """The opening, then perfect play from both sides"""
+    game = GameLogic()
+    engine = TableEngine()
+    for cell in opening:
+        game.make_move(*divmod(cell, 3))
+    while not game.is_over():
+        game.make_move(*engine.choose_move(game))
+    return game.history
+
+
+def test_mistakes_blunders_and_player_summaries(tmp_path):
+    # O answering the centre with an edge loses; a corner holds the draw
+    lost = perfect_game([4, 1])
+    drawn = perfect_game([4, 0])
+    log = tmp_path / "games.log"
+    lines = ["# comment", f"Ann\tBob\t{' '.join(map(str, lost))}", "",
+             f"Bob\tAnn\t{' '.join(map(str, drawn))}", "Ann\tBob\t4 4", "not a game"]
+    log.write_text("\n".join(lines * 50) + "\n")
+
+    annotations = tmp_path / "mistakes.jsonl"
+    summary = analyze_log(str(log), workers=1, annotations=str(annotations))
+    assert (summary['games'], summary['invalid'], summary['unfinished']) == (100, 100, 0)
+    ann, bob = summary['players']['Ann'], summary['players']['Bob']
+    assert (ann['wins'], ann['losses'], ann['draws'], ann['mistakes']) == (50, 0, 50, 0)
+    assert (bob['losses'], bob['draws'], bob['results_lost']) == (50, 50, 50)
+    assert bob['mistakes'] == bob['blunders'] == 50
+    assert player_stats(summary)['Bob'].get_stats_string() == "W: 0 | L: 50 | D: 50"
+
+    first = json.loads(annotations.read_text().splitlines()[0])
+    assert (first['x'], first['o'], first['result'], first['lost_at']) == ("Ann", "Bob", 'X', 1)
+    ply, played, best, best_value, played_value = first['mistakes'][0]
+    assert (ply, played, best_value, played_value) == (1, 1, DRAW, LOSS)
+    assert best in (0, 2, 6, 8)
+
+    # Byte ranges split mid-line on a pool give the same totals
+    cache = tmp_path / "positions.memo"
+    pooled = analyze_log(str(log), workers=2, cache_path=str(cache), chunk_bytes=97)
+    assert pooled['players'] == summary['players']
+    assert cache.exists()
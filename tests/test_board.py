@@ -1 +1,49 @@
+import pytest
 
+from game.game_logic import MAX_SIZE, GameLogic, board_shape
+
+
+def test_gomoku_diagonal_win():
+    game = GameLogic(15, 15, 5)
+    for i in range(4):
+        assert game.make_move(5 + i, 9 - i)
+        assert game.make_move(0, i)
+    assert not game.check_winner()
+    assert game.make_move(9, 5)
+    assert game.winner == 'X'
+    assert game.winning_line_coords() == [(5, 9), (9, 5)]
+
+
+def test_win_found_when_last_move_fills_the_middle():
+    game = GameLogic(7, 7, 4)
+    for col in (0, 1, 3):
+        game.make_move(3, col)
+        game.make_move(6, col)
+    game.make_move(3, 2)
+    assert game.winner == 'X'
+    assert game.winning_line_coords() == [(3, 0), (3, 3)]
+
+
+def test_line_does_not_wrap_across_rows():
+    game = GameLogic(4, 4, 3)
+    for row, col in [(0, 2), (2, 0), (0, 3), (2, 1), (1, 0)]:
+        game.make_move(row, col)
+    assert not game.check_winner()
+
+
+def test_rectangular_board_full():
+    game = GameLogic(2, 5, 5)
+    for row, col in [(0, 0), (1, 0), (1, 1), (0, 1), (0, 2),
+                     (1, 2), (1, 3), (0, 3), (0, 4), (1, 4)]:
+        game.make_move(row, col)
+    assert game.is_board_full()
+    assert not game.check_winner()
+
+
+def test_shape_validation_and_line_masks():
+    with pytest.raises(ValueError):
+        GameLogic(3, 3, 4)
+    with pytest.raises(ValueError):
+        GameLogic(MAX_SIZE + 1, MAX_SIZE + 1, 5)
+    assert len(board_shape(3, 3, 3).line_masks) == 8
+    assert len(board_shape(4, 4, 3).line_masks) == 24
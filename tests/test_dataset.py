@@ -0,0 +1,80 @@
+import numpy as np
+
+from game import ai
+from game.dataset import Dataset, export_selfplay, export_tree
+from game.solved_table import load_table
+
+OUTCOMES = {1: -1, 2: 0, 3: 1}
+
+
+def masks_of(boards):
+    weights = 1 << np.arange(boards.shape[-1] * boards.shape[-2], dtype=np.int64)
+    flat = boards.reshape(len(boards), 2, -1).astype(np.int64)
+    return (flat[:, 0] * weights).sum(axis=1), (flat[:, 1] * weights).sum(axis=1)
+
+
+def test_tree_export_matches_the_solved_table(tmp_path):
+    table = load_table()
+    tablebase = str(tmp_path / "3x3k3.bin")
+    full = export_tree(3, 3, 3, str(tmp_path / "full"), workers=1, shard_size=2000,
+                       tablebase_path=tablebase)
+    # Every reachable position that is not over, and those up to symmetry
+    assert full['samples'] == 4520 and len(full['shards']) > 1
+    unique = export_tree(3, 3, 3, str(tmp_path / "unique"), dedup=True, workers=2,
+                         tablebase_path=tablebase)
+    assert unique['samples'] == 627
+
+    dataset = Dataset(str(tmp_path / "full"))
+    assert len(dataset) == 4520
+    for shard in dataset.shards():
+        if not len(shard['turn']):
+            # A range of slots with no open positions, e.g. only full boards
+            continue
+        assert isinstance(shard['boards'], np.memmap) and shard['boards'].shape[1:] == (2, 3, 3)
+        xs, os_ = masks_of(shard['boards'])
+        for x, o, turn, legal, value, move in zip(xs, os_, shard['turn'], shard['legal'],
+                                                   shard['value'], shard['move']):
+            x, o = int(x), int(o)
+            me, opp = (x, o) if turn == 0 else (o, x)
+            assert value == OUTCOMES[table.lookup(me, opp)[0]]
+            assert legal.reshape(9).tolist() == [not (x | o) >> cell & 1 for cell in range(9)]
+            assert legal.reshape(9)[move]
+
+
+def test_selfplay_export_in_parallel_with_dedup(tmp_path):
+    manifest = export_selfplay(('heuristic', 'random'), 60, str(tmp_path / "sp"), workers=2,
+                               games_per_shard=20, tablebase_dir=str(tmp_path), dedup=True)
+    assert len(manifest['shards']) == 3 and manifest['samples'] == sum(manifest['shards'])
+    for shard in Dataset(str(tmp_path / "sp")).shards():
+        xs, os_ = masks_of(shard['boards'])
+        keys = set()
+        for x, o, turn, legal, move in zip(xs, os_, shard['turn'], shard['legal'], shard['move']):
+            assert legal.reshape(9)[move] and not (int(x) | int(o)) >> int(move) & 1
+            assert bin(int(x)).count('1') - bin(int(o)).count('1') == turn
+            keys.add((int(x), int(o)))
+        assert len(keys) == len(xs)
+        # Unsolved here, so values are game results
+        assert set(np.unique(shard['value'])) <= {-1, 0, 1}
+
+    export_selfplay(('random', 'random'), 2, str(tmp_path / "ultimate"), 9, 9, 0, workers=1)
+    shard = Dataset(str(tmp_path / "ultimate")).shard(0)
+    assert shard['boards'].shape[1:] == (2, 9, 9) and shard['legal'].shape[1:] == (9, 9)
+    # After the first move only the small board it sent O to is legal
+    rows, cols = np.nonzero(shard['legal'][1])
+    assert len(rows) and len(set(zip(rows // 3, cols // 3))) == 1
+
+
+def test_selfplay_engine_that_cannot_move_loses(tmp_path, monkeypatch):
+    class Stuck:
+        def choose_move(self, game, cancel=None):
+            return None
+
+    make_engine = ai.make_engine
+    monkeypatch.setattr(ai, 'make_engine',
+                        lambda spec, seed=None: Stuck() if spec == 'stuck' else make_engine(spec, seed))
+    export_selfplay(('random', 'stuck'), 3, str(tmp_path / "sp"), workers=1, tablebase_dir=str(tmp_path))
+    shard = Dataset(str(tmp_path / "sp")).shard(0)
+    # The two opening moves and X's first engine move; O's move is never made
+    assert len(shard['turn']) == 9
+    assert list(shard['value'][shard['turn'] == 0]) == [1] * 6
+    assert list(shard['value'][shard['turn'] == 1]) == [-1] * 3
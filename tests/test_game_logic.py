@@ -1 +1,166 @@
+import pytest
 
+from game.game_logic import GameLogic
+
+
+def play(game, moves):
+    for row, col in moves:
+        assert game.make_move(row, col)
+    return game
+
+
+def test_row_win():
+    game = play(GameLogic(), [(0, 0), (1, 0), (0, 1), (1, 1), (0, 2)])
+    assert game.check_winner()
+    assert game.winner == 'X'
+    assert game.winning_line_coords() == [(0, 0), (0, 2)]
+
+
+def test_anti_diagonal_win():
+    game = play(GameLogic(), [(0, 0), (0, 2), (0, 1), (1, 1), (2, 2), (2, 0)])
+    assert game.winner == 'O'
+    assert game.winning_line_coords() == [(0, 2), (2, 0)]
+
+
+def test_draw():
+    game = play(GameLogic(), [(0, 0), (0, 1), (0, 2), (1, 1), (1, 0),
+                              (1, 2), (2, 1), (2, 0), (2, 2)])
+    assert not game.check_winner()
+    assert game.is_board_full()
+    assert game.legal_moves() == []
+
+
+def test_rejects_occupied_cell_and_moves_after_win():
+    game = GameLogic()
+    assert game.make_move(1, 1)
+    assert not game.make_move(1, 1)
+    assert game.current_player == 'O'
+    play(game, [(0, 0), (0, 1), (2, 2), (2, 1)])
+    assert game.winner == 'X'
+    assert not game.make_move(0, 2)
+
+
+def test_reset():
+    game = play(GameLogic(), [(0, 0), (1, 1)])
+    game.reset()
+    assert game.current_player == 'X'
+    assert game.cell(0, 0) == ''
+    assert len(game.legal_moves()) == 9
+
+
+def test_undo_and_redo_restore_the_position_and_hash():
+    game = GameLogic()
+    hashes = [game.hash]
+    moves = [(0, 0), (1, 0), (0, 1), (1, 1), (0, 2)]
+    for move in moves:
+        game.make_move(*move)
+        hashes.append(game.hash)
+    assert len(set(hashes)) == len(hashes) and game.winner == 'X'
+
+    assert game.undo_move() == (0, 2)
+    assert game.winner is None and game.winning_mask == 0
+    assert game.current_player == 'X' and game.hash == hashes[4]
+    while game.undo_move():
+        pass
+    assert game.masks == [0, 0] and game.hash == 0 and game.last_move is None
+
+    assert game.redo_move() == (0, 0) and game.redo_move() == (1, 0)
+    assert game.hash == hashes[2] and game.current_player == 'X'
+    # A new move discards the rest of the undone line
+    game.make_move(2, 2)
+    assert game.redo_move() is None and game.future == []
+
+
+def test_hash_ignores_move_order():
+    first = play(GameLogic(4, 4, 3), [(0, 0), (1, 1), (2, 2), (3, 3)])
+    second = play(GameLogic(4, 4, 3), [(2, 2), (3, 3), (0, 0), (1, 1)])
+    assert first.hash == second.hash
+
+
+def test_engine_takes_a_win_and_blocks():
+    from game.ai import AlphaBetaEngine
+    engine = AlphaBetaEngine()
+    # X to move with two in the top row
+    game = play(GameLogic(), [(0, 0), (1, 0), (0, 1), (1, 1)])
+    assert engine.choose_move(game) == (0, 2)
+    # O to move must block the top row
+    game = play(GameLogic(), [(0, 0), (1, 1), (0, 1)])
+    assert engine.choose_move(game) == (0, 2)
+
+
+def test_engine_self_play_is_a_draw():
+    from game.ai import AlphaBetaEngine
+    engine = AlphaBetaEngine()
+    game = GameLogic()
+    while not game.is_over():
+        assert game.make_move(*engine.choose_move(game))
+    assert game.winner is None
+
+
+def test_symmetric_positions_share_a_key():
+    from game.ai import Symmetries
+    from game.game_logic import board_shape
+    symmetries = Symmetries(board_shape(3, 3, 3))
+    corners = [1 << 0, 1 << 2, 1 << 6, 1 << 8]
+    keys = {symmetries.canonical(corner, 1 << 4) for corner in corners}
+    assert len(keys) == 1
+    assert symmetries.canonical(1 << 1, 1 << 4) not in keys
+
+
+def test_solved_table_matches_search():
+    from game.ai import AlphaBetaEngine, WIN_SCORE
+    from game.solved_table import DRAW, LOSS, WIN, load_table
+    table = load_table()
+    engine = AlphaBetaEngine()
+    assert table.lookup(0, 0)[0] == DRAW
+    for moves in ([(0, 0)], [(0, 0), (0, 1)], [(1, 1), (0, 1)], [(0, 0), (1, 1), (2, 2)]):
+        game = play(GameLogic(), moves)
+        me, opp = game.masks[game.turn], game.masks[game.turn ^ 1]
+        outcome, _, cell = table.lookup(me, opp)
+        engine.choose_move(game)
+        expected = WIN if engine.last_score >= WIN_SCORE else LOSS if engine.last_score <= -WIN_SCORE else DRAW
+        assert outcome == expected
+        assert game.is_empty(*divmod(cell, 3))
+
+
+def test_batch_outcomes_match_single_game_rules():
+    np = pytest.importorskip('numpy')
+    from game.batch import BatchSimulator
+    result = BatchSimulator(seed=7).play(200_000, chunk_size=50_000)
+    assert result.games == 200_000
+    # Known random-play odds on 3x3: X ~58.5%, O ~28.8%, draw ~12.7%
+    assert abs(result.x_wins / result.games - 0.585) < 0.01
+    assert abs(result.draws / result.games - 0.127) < 0.01
+    assert result.lengths[:5].sum() == 0
+    assert int(np.sum(result.lengths)) == result.games
+
+
+def test_batch_perfect_play_always_draws():
+    pytest.importorskip('numpy')
+    from game.batch import BatchSimulator
+    result = BatchSimulator(seed=1).play(1000, 'perfect', 'perfect')
+    assert result.draws == 1000
+
+
+def test_batch_dense_board():
+    pytest.importorskip('numpy')
+    from game.batch import BatchSimulator
+    result = BatchSimulator(5, 5, 4, seed=3).play(500)
+    assert result.games == 500
+    assert result.lengths[:7].sum() == 0
+
+
+def test_mcts_takes_a_win_and_reuses_its_tree():
+    from game.mcts import MCTSEngine
+    engine = MCTSEngine(time_limit=None, playouts=500, seed=1)
+    game = play(GameLogic(), [(0, 0), (1, 0), (0, 1), (1, 1)])
+    assert engine.choose_move(game) == (0, 2)
+
+    game = GameLogic(5, 5, 4)
+    game.make_move(*engine.choose_move(game))
+    kept = engine.root
+    reply = max(kept.children.values(), key=lambda child: child.visits)
+    game.make_move(*divmod(reply.move, 5))
+    # The next search starts from the node already grown for the reply
+    assert engine._reuse_root(tuple(game.masks), game.turn) is reply
+    assert reply.visits > 0
@@ -0,0 +1,58 @@
+import io
+import subprocess
+import sys
+
+import pytest
+
+from game import headless
+from game.game_logic import GameLogic
+
+
+def run(monkeypatch, capsys, argv, stdin=''):
+    monkeypatch.setattr(sys, 'stdin', io.StringIO(stdin))
+    code = headless.main(argv)
+    return code, capsys.readouterr()
+
+
+def test_piped_moves_against_an_engine(monkeypatch, capsys):
+    code, out = run(monkeypatch, capsys, ['--o', 'heuristic'], "2 2\n1 1\nfoo\n3 3\n1 3\n3 1\n")
+    assert code == 0
+    assert "game 1: X wins in 7 moves" in out.out
+    assert "not a legal move: '1 1'" in out.err and "'foo'" in out.err
+
+    code, out = run(monkeypatch, capsys, ['--o', 'heuristic'], "2 2\n")
+    assert code == 1 and "abandoned" in out.err
+
+    # A board that cannot hold k in a row is a usage error, not a traceback
+    with pytest.raises(SystemExit) as exit:
+        run(monkeypatch, capsys, ['--board', '3', '3', '9'])
+    assert exit.value.code == 2 and "does not fit" in capsys.readouterr().err
+
+
+def test_undo_takes_back_the_engine_reply_too():
+    game = GameLogic()
+    players = [headless.Player('human', game), headless.Player('heuristic', game)]
+    lines = iter(["2 2\n", "undo\n", "1 1\n"])
+    assert headless.play(game, players, lines, io.StringIO(), quiet=True) is False
+    assert game.history[0] == 0 and len(game.history) == 2
+
+
+def test_engine_matches_and_text_board(monkeypatch, capsys):
+    code, out = run(monkeypatch, capsys,
+                    ['--x', 'alphabeta', '--o', 'alphabeta', '--games', '2', '--quiet'])
+    assert code == 0
+    assert out.out.count("draw in 9 moves") == 2 and "draws 2" in out.out
+
+    game = GameLogic(3, 4, 3)
+    game.make_move(0, 3)
+    assert headless.render(game).splitlines()[:2] == ["   1 2 3 4", " 1 . . . X"]
+    assert headless.parse_move(" 3, 4 ", game) == (2, 3)
+    assert headless.parse_move("4 1", game) is None
+
+
+def test_rules_and_engines_import_without_qt():
+    code = ("import sys, game.headless, game.game_logic, game.ai, game.tournament;"
+            "print(sorted(m for m in sys.modules if m.startswith('PyQt')))")
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                            cwd=headless.__file__.rsplit('game', 1)[0], check=True)
+    assert result.stdout.strip() == "[]"
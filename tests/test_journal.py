@@ -0,0 +1,64 @@
+from game.journal import Journal
+
+
+def start(journal):
+    journal.record('players', x="Ann", o="Bob", computer=True, board=[3, 3, 3],
+                   started_at=1.0, x_stats=[2, 0, 1], o_stats=[0, 2, 1])
+
+
+def test_session_survives_a_crash(tmp_path):
+    journal = Journal(str(tmp_path), sync_interval=0)
+    start(journal)
+    for cell in (4, 0, 8):
+        journal.record('move', cell=cell)
+    journal.record('goto', to=1)
+    journal.record('move', cell=2)
+    journal.record('tick', seconds=42)
+    journal.record('stats', x=[3, 0, 1], o=[0, 3, 1], pending=True)
+    journal.flush()
+    # No close: the next run finds what the writer had synced
+    with open(tmp_path / 'journal.jsonl', 'a') as handle:
+        handle.write('{"n": 99, "e": "mo')
+
+    session = Journal(str(tmp_path)).session
+    assert (session.x_name, session.o_name, session.computer) == ("Ann", "Bob", True)
+    assert session.moves == [4, 2]
+    assert session.future == []
+    assert session.seconds == 42
+    assert session.stats == [[3, 0, 1], [0, 3, 1]]
+    assert session.pending_result
+
+
+def test_resume_replays_only_the_tail(tmp_path):
+    journal = Journal(str(tmp_path), snapshot_every=16, sync_interval=0)
+    start(journal)
+    for second in range(1, 1000):
+        journal.record('tick', seconds=second)
+    journal.record('move', cell=4)
+    journal.record('goto', to=0)
+    journal.close()
+
+    resumed = Journal(str(tmp_path), snapshot_every=16)
+    assert resumed.replayed < 16
+    session = resumed.session
+    assert session.seconds == 999
+    assert (session.moves, session.future) == ([], [4])
+
+    # Play Again starts the board over and the numbering carries on
+    resumed.record('reset', board=[4, 4, 3], started_at=2.0)
+    resumed.close()
+    session = Journal(str(tmp_path)).session
+    assert session.board == [4, 4, 3]
+    assert (session.moves, session.seconds, session.x_name) == ([], 0, "Ann")
+
+
+def test_snapshot_holds_only_the_events_before_it(tmp_path):
+    journal = Journal(str(tmp_path), snapshot_every=4, sync_interval=0.3)
+    start(journal)
+    for cell in (0, 1, 2):
+        journal.record('move', cell=cell)
+    # Recorded while the snapshot is still waiting for the writer
+    journal.record('move', cell=3)
+    journal.close()
+
+    assert Journal(str(tmp_path)).session.moves == [0, 1, 2, 3]
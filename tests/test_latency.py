@@ -0,0 +1,57 @@
+import json
+
+from game.game_logic import GameLogic
+from game.latency import LatencyRecorder, Series
+
+
+def test_ring_buffer_keeps_newest_samples_and_percentiles():
+    series = Series('test', capacity=100)
+    for i in range(250):
+        series.add(float(i), i / 1000)
+    samples = series.samples()
+    assert len(samples) == 100
+    assert samples[0][0] == 150.0 and samples[-1][0] == 249.0
+
+    summary = series.summary()
+    assert summary['count'] == 250
+    assert summary['p50_ms'] == 200.0
+    assert summary['p99_ms'] == 249.0 and summary['max_ms'] == 249.0
+
+
+def test_instrument_times_calls_and_restores_methods(tmp_path):
+    original = GameLogic.make_move
+    recorder = LatencyRecorder()
+    recorder.instrument(GameLogic, 'make_move', 'rules.make_move')
+    assert recorder.enabled
+    game = GameLogic()
+    assert game.make_move(1, 1) and not game.make_move(1, 1)
+    recorder.uninstrument()
+    assert GameLogic.make_move is original and not recorder.enabled
+
+    game.make_move(0, 0)
+    assert recorder.summary()['rules.make_move']['count'] == 2
+
+    path = tmp_path / "latency.json"
+    recorder.export(str(path))
+    data = json.loads(path.read_text())
+    assert len(data['subsystems']['rules.make_move']['samples']) == 2
+
+
+def test_inherited_methods_are_unpatched_cleanly():
+    class Subclass(GameLogic):
+        pass
+
+    recorder = LatencyRecorder()
+    recorder.instrument(Subclass, 'check_winner', 'rules.check_winner')
+    assert 'check_winner' in vars(Subclass)
+    recorder.uninstrument()
+    assert 'check_winner' not in vars(Subclass)
+
+
+def test_culprit_blames_the_longest_blocking_overlap():
+    recorder = LatencyRecorder()
+    recorder.record('rules.make_move', 10.0, 0.01)
+    recorder.record('gui.paint', 10.02, 0.08)
+    recorder.record('ai.search', 9.0, 5.0, blocking=False)
+    assert recorder.culprit(10.0, 10.1) == 'gui.paint'
+    assert recorder.culprit(20.0, 20.1) is None
@@ -0,0 +1,89 @@
+from game.game_logic import GameLogic
+from game.records import (DRAW, UNFINISHED, GameRecord, RecordReader,
+                          RecordWriter, iter_records, rebuild_index, index_path)
+
+
+def test_write_stream_and_random_access(tmp_path):
+    path = str(tmp_path / "games.rec")
+    writer = RecordWriter(path)
+    for number in range(100):
+        record = GameRecord(f"X{number}", "Ørjan", [4, 0, 8, number % 9], DRAW,
+                            started_at=number, duration=1.5)
+        assert writer.append(record) == number
+    writer.close()
+
+    records = list(iter_records(path))
+    assert len(records) == 100
+    assert records[7].x_name == "X7" and records[7].o_name == "Ørjan"
+    assert records[7].moves == [4, 0, 8, 7]
+
+    with RecordReader(path) as reader:
+        assert len(reader) == 100
+        assert reader[42].started_at == 42
+        assert reader[-1].x_name == "X99"
+
+    # The index can be recovered from the record file alone
+    (tmp_path / "games.rec.idx").unlink()
+    rebuild_index(path)
+    with open(index_path(path), 'rb') as index:
+        assert len(index.read()) == 100 * 8
+
+    # A crash after a record but before its offset leaves the index short;
+    # it is rebuilt rather than trusted
+    with open(index_path(path), 'r+b') as index:
+        index.truncate(99 * 8)
+    writer = RecordWriter(path)
+    assert writer.append(GameRecord("Ann", "Bob", [4], DRAW)) == 100
+    writer.close()
+    with RecordReader(path) as reader:
+        assert len(reader) == 101
+        assert (reader[99].x_name, reader[100].x_name) == ("X99", "Ann")
+
+
+def test_record_torn_by_a_crash_is_dropped(tmp_path):
+    path = str(tmp_path / "games.rec")
+    writer = RecordWriter(path)
+    for number in range(3):
+        writer.append(GameRecord(f"X{number}", "Bob", [0, 4, 8, 2, 6], DRAW))
+    writer.close()
+    with open(index_path(path), 'rb') as index:
+        last = int.from_bytes(index.read()[-8:], 'little')
+    with open(path, 'rb') as handle:
+        whole = handle.read()
+
+    # Cut inside the last record's header, then inside its moves
+    for cut in (last + 5, len(whole) - 3):
+        with open(path, 'wb') as handle:
+            handle.write(whole[:cut])
+        assert [record.x_name for record in iter_records(path)] == ["X0", "X1"]
+        with RecordReader(path) as reader:
+            assert len(reader) == 2 and reader[-1].moves == [0, 4, 8, 2, 6]
+        writer = RecordWriter(path)
+        assert writer.append(GameRecord("Ann", "Bob", [4], DRAW)) == 2
+        writer.close()
+        with RecordReader(path) as reader:
+            assert [reader[n].x_name for n in range(len(reader))] == ["X0", "X1", "Ann"]
+
+
+def test_record_round_trips_a_game(tmp_path):
+    game = GameLogic()
+    for row, col in [(0, 0), (1, 1), (0, 1), (0, 2), (2, 0), (1, 0), (1, 2), (2, 1)]:
+        game.make_move(row, col)
+    record = GameRecord.from_game(game, "Ann", "Bob")
+    assert record.result == UNFINISHED
+    game.make_move(2, 2)
+    record = GameRecord.from_game(game, "Ann", "Bob")
+    assert record.result == DRAW
+
+    large = GameLogic(19, 19, 5)
+    for cell in (360, 0, 359, 1, 358, 2, 357, 3, 356):
+        large.make_move(*divmod(cell, 19))
+    path = str(tmp_path / "big.rec")
+    writer = RecordWriter(path)
+    writer.append(GameRecord.from_game(large, "Ann", "Bob"))
+    writer.close()
+    loaded = RecordReader(path)[0]
+    assert loaded.moves == large.history
+    assert loaded.winner == 'X'
+    assert loaded.to_game().winner == 'X'
+    assert loaded.to_game(4).move_count == 4
@@ -0,0 +1,78 @@
+import asyncio
+
+from net.loadgen import run
+from net.server import GameServer
+
+
+async def start_server():
+    server = GameServer()
+    listener = await server.start('127.0.0.1', 0)
+    return server, listener, listener.sockets[0].getsockname()[1]
+
+
+async def client(port, *lines):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    assert await reader.readline() == b'WELCOME\n'
+    for line in lines:
+        writer.write(line.encode() + b'\n')
+    await writer.drain()
+    return reader, writer
+
+
+def test_match_moves_and_win():
+    async def scenario():
+        server, listener, port = await start_server()
+        x_reader, x_writer = await client(port, 'HELLO Ann', 'PLAY')
+        assert await x_reader.readline() == b'WAIT\n'
+        o_reader, o_writer = await client(port, 'HELLO Bob', 'PLAY')
+        assert (await x_reader.readline()).split()[2:] == [b'X', b'3', b'3', b'3', b'Bob']
+        assert (await o_reader.readline()).split()[2:] == [b'O', b'3', b'3', b'3', b'Ann']
+
+        o_writer.write(b'MOVE 4\n')
+        assert await o_reader.readline() == b'ERROR not your turn\n'
+        # Every accepted move is echoed to both players
+        for side, writer, cell in (('X', x_writer, 0), ('O', o_writer, 3), ('X', x_writer, 1),
+                                   ('O', o_writer, 4), ('X', x_writer, 2)):
+            writer.write(f'MOVE {cell}\n'.encode())
+            for reader in (x_reader, o_reader):
+                assert await reader.readline() == f'MOVE {side} {cell}\n'.encode()
+        assert await x_reader.readline() == b'OVER X\n'
+        assert await o_reader.readline() == b'OVER X\n'
+        assert server.moves == 5 and not server.matches
+
+        for writer in (x_writer, o_writer):
+            writer.close()
+        listener.close()
+        await listener.wait_closed()
+
+    asyncio.run(scenario())
+
+
+def test_disconnect_forfeits():
+    async def scenario():
+        server, listener, port = await start_server()
+        x_reader, x_writer = await client(port, 'PLAY 4 4 3')
+        o_reader, o_writer = await client(port, 'PLAY 4 4 3')
+        await x_reader.readline()
+        await x_reader.readline()
+        o_writer.close()
+        assert await x_reader.readline() == b'OVER X FORFEIT\n'
+        x_writer.close()
+        listener.close()
+        await listener.wait_closed()
+
+    asyncio.run(scenario())
+
+
+def test_load_generator_against_localhost():
+    async def scenario():
+        server, listener, port = await start_server()
+        moves, elapsed, stats = await run('127.0.0.1', port, idle=50, players=20, games=3,
+                                          size=(3, 3, 3), seed=1)
+        assert server.games_started == 30
+        assert moves == server.moves
+        assert 'connections=51' in stats
+        listener.close()
+        await listener.wait_closed()
+
+    asyncio.run(scenario())
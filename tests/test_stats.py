@@ -0,0 +1,42 @@
+from game.stats import PlayerStats, StatsStore
+
+
+def test_player_stats_string():
+    stats = PlayerStats("Ann")
+    stats.add_win()
+    stats.add_draw()
+    assert stats.get_stats_string() == "W: 1 | L: 0 | D: 1"
+
+
+def test_store_totals_head_to_head_and_leaderboard(tmp_path):
+    store = StatsStore(str(tmp_path / "stats.db"))
+    store.record_game("Ann", "Bob", 'X', 5, 12.0, played_at=1)
+    store.record_game("Bob", "Ann", None, 9, 30.0, played_at=2)
+    store.record_game("Cy", "Ann", 'O', 6, 8.0, played_at=3)
+    store.flush()
+
+    ann = store.player_stats("Ann")
+    assert (ann.wins, ann.losses, ann.draws) == (2, 0, 1)
+    bob = store.head_to_head("Bob", "Ann")
+    assert (bob.wins, bob.losses, bob.draws) == (0, 1, 1)
+    assert store.player_stats("Nobody").get_stats_string() == "W: 0 | L: 0 | D: 0"
+
+    assert [stats.name for stats in store.leaderboard(2)] == ["Ann", "Bob"]
+    history = store.history("Ann", limit=2)
+    assert [game[0] for game in history] == [3, 2]
+    assert history[0][1:4] == ("Cy", "Ann", 'O')
+    store.close()
+
+    # Totals survive reopening the database
+    store = StatsStore(str(tmp_path / "stats.db"))
+    assert store.player_stats("Cy").losses == 1
+    store.close()
+
+
+def test_in_memory_store():
+    store = StatsStore(':memory:')
+    for _ in range(1000):
+        store.record_game("Ann", "Bob", 'O', 7, 1.0)
+    store.flush()
+    assert store.player_stats("Bob").wins == 1000
+    store.close()
@@ -0,0 +1,63 @@
+import random
+
+import pytest
+
+from game.ai import AlphaBetaEngine
+from game.game_logic import GameLogic
+from game.solved_table import DRAW, LOSS, WIN, load_table
+from game.tablebase import HEADER, Tablebase, TablebaseEngine, find_tablebase, generate
+
+
+def random_positions(rows, cols, k, count, seed=0):
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        game = GameLogic(rows, cols, k)
+        for _ in range(rng.randrange(rows * cols)):
+            if game.is_over():
+                break
+            game.make_move(*rng.choice(game.legal_moves()))
+        if not game.is_over():
+            positions.append(game)
+    return positions
+
+
+def test_3x3_tablebase_agrees_with_the_solved_table(tmp_path):
+    tablebase = Tablebase(generate(3, 3, 3, str(tmp_path / "3x3k3.bin"), workers=1))
+    table = load_table()
+    assert tablebase.value(0, 0) == DRAW
+    for game in random_positions(3, 3, 3, 300):
+        me, opp = game.masks[game.turn], game.masks[game.turn ^ 1]
+        outcome = tablebase.value(*game.masks)
+        assert outcome == table.lookup(me, opp)[0]
+        assert tablebase.best_move(game)[0] == outcome
+    # Both marks in a line cannot happen in a real game
+    assert tablebase.value(0b000000111, 0b111000000) == 0
+    tablebase.close()
+
+
+def test_parallel_generation_matches_alpha_beta(tmp_path):
+    path = generate(3, 4, 3, str(tmp_path / "3x4k3.bin"), workers=2)
+    tablebase = Tablebase(path)
+    engine = AlphaBetaEngine()
+    for game in random_positions(3, 4, 3, 40, seed=1):
+        engine._prepare(game.shape)
+        engine.search(game.masks[game.turn], game.masks[game.turn ^ 1])
+        score = engine.last_score
+        expected = WIN if score > 0 else LOSS if score < 0 else DRAW
+        assert tablebase.value(*game.masks) == expected
+
+        move = TablebaseEngine(tablebase).choose_move(game)
+        game.make_move(*move)
+        if not game.check_winner():
+            assert 4 - tablebase.value(*game.masks) == expected
+    tablebase.close()
+
+    found = find_tablebase(3, 4, 3, str(tmp_path))
+    assert found is not None
+    found.close()
+    assert find_tablebase(4, 4, 3, str(tmp_path)) is None
+    with open(path, 'r+b') as handle:
+        handle.truncate(HEADER.size + 10)
+    with pytest.raises(ValueError):
+        Tablebase(path)
@@ -0,0 +1,71 @@
+import random
+
+from game.ai import HeuristicEngine, engine_for, make_engine
+from game.game_logic import GameLogic
+from game.threats import LineIndex, ThreatEngine, ThreatSearch
+
+# A 15x15 position where X, to move, wins with four fours in a row
+VCF = [99, 95, 156, 65, 140, 142, 125, 68, 159, 81, 114, 83, 110, 158, 145, 69, 128, 109, 82, 70]
+
+
+def gomoku(cells):
+    game = GameLogic(15, 15, 5)
+    for cell in cells:
+        game.make_move(*divmod(cell, 15))
+    return game
+
+
+def test_index_follows_moves_and_undos():
+    rng = random.Random(4)
+    game = GameLogic(15, 15, 5)
+    index = LineIndex(game.shape)
+    while game.move_count < 60 and not game.is_over():
+        side = game.turn
+        game.make_move(*rng.choice(game.legal_moves()))
+        index.place(game.last_move, side)
+    for _ in range(20):
+        cell = game.last_move
+        game.undo_move()
+        index.remove(cell, game.turn)
+    rebuilt = LineIndex(game.shape, game.masks)
+    assert index.counts == rebuilt.counts
+    assert index.open == rebuilt.open
+
+    # Three in a row across the middle lie in three windows of five; the
+    # rows, columns and diagonals are counted apart
+    index = LineIndex(game.shape, (sum(1 << cell for cell in (110, 111, 112)), 0))
+    assert index.lines(0, 3) == [3, 0, 0, 0]
+    assert index.lines(0, 1)[1] == 15
+    assert index.candidates(0)[0] in (109, 113)
+
+
+def test_threat_search_finds_a_win_by_fours():
+    game = gomoku(VCF)
+    search = ThreatSearch(LineIndex(game.shape, game.masks))
+    cell, depth = search.find_win(game.turn)
+    assert depth == 4
+
+    # However the defender answers, the engine finishes the job
+    for defender in (HeuristicEngine(), ThreatEngine(time_limit=0.2)):
+        game = gomoku(VCF)
+        attacker = ThreatEngine(time_limit=0.5)
+        while not game.is_over():
+            engine = attacker if game.turn == 0 else defender
+            game.make_move(*engine.choose_move(game))
+        assert game.winner == 'X' and game.move_count <= len(VCF) + 9
+
+
+def test_engine_blocks_and_is_chosen_for_gomoku():
+    # O has four in a row along the top; X must take the fifth cell
+    game = gomoku([112, 0, 113, 1, 140, 2, 170, 3])
+    assert ThreatEngine().choose_move(game) == (0, 4)
+    assert isinstance(engine_for(game), ThreatEngine)
+    assert make_engine('threats:0.5s').time_limit == 0.5
+
+
+def test_engine_plays_on_when_no_line_is_left():
+    game = GameLogic(5, 5, 5)
+    engine = ThreatEngine(time_limit=0.2)
+    while not game.is_over():
+        game.make_move(*engine.choose_move(game))
+    assert game.is_board_full()
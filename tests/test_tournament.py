@@ -0,0 +1,92 @@
+import json
+
+import pytest
+
+from game.ai import HeuristicEngine
+from game.game_logic import GameLogic
+from game.stats import StatsStore
+from game.tournament import (Tournament, elo_ratings, make_engine, round_robin_pairings,
+                             swiss_pairings)
+
+
+def test_engine_specs():
+    assert make_engine('alphabeta:3').max_depth == 3
+    assert make_engine('alphabeta:0.5s').time_limit == 0.5
+    assert make_engine('mcts:50').playouts == 50
+    for spec in ('minimax', 'mcts', 'random:3', 'alphabeta:x'):
+        with pytest.raises(ValueError):
+            make_engine(spec)
+    # Specs the board cannot be played with are turned down before any game
+    for spec, size in (('table', (4, 4, 3)), ('ultimate', (3, 3, 3))):
+        with pytest.raises(ValueError):
+            Tournament(['random', spec], *size)
+
+
+def test_heuristic_engine_wins_then_blocks():
+    game = GameLogic()
+    for move in [(0, 0), (1, 0), (0, 1), (1, 1)]:
+        game.make_move(*move)
+    assert HeuristicEngine().choose_move(game) == (0, 2)
+    game = GameLogic()
+    for move in [(2, 2), (0, 0), (2, 0), (0, 1)]:
+        game.make_move(*move)
+    assert HeuristicEngine().choose_move(game) == (2, 1)
+
+
+def test_pairings():
+    pairings = round_robin_pairings(['a', 'b', 'c'], 2)
+    assert len(pairings) == 6
+    assert ('a|b|0', 'a', 'b') in pairings and ('a|b|1', 'b', 'a') in pairings
+
+    met = {frozenset(('a', 'b'))}
+    pairings = swiss_pairings(['a', 'b', 'c', 'd'], {'a': 2, 'b': 2}, met, 1, 1)
+    assert {frozenset((x, o)) for _, x, o in pairings} == {frozenset('ac'), frozenset('bd')}
+
+
+def test_elo_orders_players_and_reports_intervals():
+    results = ([{'x': 'strong', 'o': 'weak', 'winner': 'X'}] * 8
+               + [{'x': 'weak', 'o': 'strong', 'winner': None}] * 2)
+    ratings = elo_ratings(['strong', 'weak'], results)
+    assert ratings['strong'][0] > 1500 > ratings['weak'][0]
+    assert ratings['strong'][0] + ratings['weak'][0] == pytest.approx(3000)
+    assert 0 < ratings['strong'][1] < 1000
+
+
+def test_round_robin_checkpoint_resume_and_stats(tmp_path):
+    checkpoint = str(tmp_path / "t.jsonl")
+    store = StatsStore(':memory:')
+    players = ['random', 'heuristic', 'alphabeta']
+    tournament = Tournament(players, games=4, checkpoint=checkpoint, workers=1, stats_store=store)
+    results = tournament.run()
+    assert len(results) == 12
+
+    stats = tournament.player_stats()
+    assert sum(s.wins for s in stats.values()) == sum(s.losses for s in stats.values())
+    store.flush()
+    assert store.player_stats('alphabeta').wins == stats['alphabeta'].wins
+    assert store.player_stats('random').losses == stats['random'].losses
+    assert tournament.standings()[-1][0] == 'random'
+
+    # Drop the last two games as if the run had been interrupted
+    with open(checkpoint) as handle:
+        lines = handle.readlines()
+    with open(checkpoint, 'w') as handle:
+        handle.writelines(lines[:-2])
+    resumed = Tournament(players, games=4, checkpoint=checkpoint, workers=1)
+    assert len(resumed.results) == 10
+    resumed.run()
+    assert resumed.played == 2 and len(resumed.results) == 12
+    with open(checkpoint) as handle:
+        assert json.loads(handle.readline())['config']['players'] == players
+
+    with pytest.raises(ValueError):
+        Tournament(['random', 'heuristic'], checkpoint=checkpoint)
+    store.close()
+
+
+def test_swiss_rounds_on_a_process_pool():
+    tournament = Tournament(['random', 'heuristic', 'alphabeta:2', 'mcts:30'], games=2,
+                            swiss_rounds=2, workers=2)
+    results = tournament.run()
+    assert len(results) == 8
+    assert len({frozenset((r['x'], r['o'])) for r in results}) == 4
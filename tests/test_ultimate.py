@@ -0,0 +1,88 @@
+import random
+
+from game.ai import engine_for, make_engine
+from game.records import GameRecord
+from game.ultimate import ULTIMATE_SIZE, UltimateEngine, UltimateGame, create_game
+
+
+def play(game, moves):
+    for move in moves:
+        assert game.make_move(*move), move
+
+
+def test_moves_send_the_opponent_to_a_small_board():
+    game = UltimateGame()
+    play(game, [(4, 4)])
+    # The centre cell of the centre board sends O to the centre board
+    assert game.active == 4
+    assert sorted(game.legal_moves()) == [(r, c) for r in range(3, 6) for c in range(3, 6)
+                                          if (r, c) != (4, 4)]
+    assert not game.make_move(0, 0)
+    play(game, [(3, 3)])
+    assert game.active == 0 and game.is_legal(0, 0) and not game.is_legal(4, 5)
+
+
+def test_small_boards_claim_the_meta_board_and_undo_restores_everything():
+    game = UltimateGame()
+    # X wins the top-left small board with a move that sends O back into it
+    play(game, [(0, 2), (0, 6), (0, 1), (0, 3), (0, 0)])
+    assert game.meta == [0b1, 0] and game.closed == 0b1
+    # Sent to a decided board, O may play anywhere open
+    assert game.active is None and not game.is_legal(2, 2) and game.is_legal(8, 8)
+    seen = game.hash
+    game.undo_move()
+    assert game.meta == [0, 0] and game.closed == 0 and game.active == 0
+    game.redo_move()
+    assert game.hash == seen and game.meta == [0b1, 0]
+
+
+def test_random_games_keep_hash_and_rules_consistent():
+    rng = random.Random(5)
+    for _ in range(50):
+        game = UltimateGame()
+        states = []
+        while not game.is_over():
+            states.append((game.hash, game.active, game.closed, tuple(game.meta), game.turn))
+            play(game, [rng.choice(game.legal_moves())])
+        if game.winner:
+            start, end = game.winning_line_coords()
+            assert start[0] % 3 == 1 and end[1] % 3 == 1
+        else:
+            assert game.is_board_full()
+        record = GameRecord.from_game(game, 'x', 'o')
+        replayed = GameRecord.unpack_from(record.pack(), 0)[0].to_game()
+        assert replayed.hash == game.hash and replayed.winner == game.winner
+        while game.history:
+            game.undo_move()
+            assert (game.hash, game.active, game.closed, tuple(game.meta), game.turn) == states.pop()
+
+
+def test_engine_finds_the_winning_move_and_beats_random():
+    game = UltimateGame()
+    # X holds the top-left and centre small boards and can take the
+    # bottom-right one, and with it the diagonal, at (8, 8)
+    game.boards = [0b111 | 0b111 << 36 | 0b10001 << 72, 0b11000 << 9 | 0b11000 << 18]
+    game.meta = [0b10001, 0]
+    game.closed = 0b10001
+    game.active = 8
+    assert UltimateEngine(time_limit=None, max_depth=2).choose_move(game) == (8, 8)
+
+    rng = random.Random(2)
+    random_player = make_engine('random', 2)
+    for side in (0, 1):
+        game = create_game(*ULTIMATE_SIZE)
+        engine = engine_for(game)
+        engine.time_limit = 0.02
+        while not game.is_over():
+            player = engine if game.turn == side else random_player
+            play(game, [player.choose_move(game) if player is engine else rng.choice(game.legal_moves())])
+        assert game.winner == 'XO'[side]
+
+
+def test_engine_speed():
+    game = UltimateGame()
+    play(game, [(4, 4), (3, 3), (0, 0), (1, 1)])
+    engine = UltimateEngine(time_limit=0.3)
+    engine.choose_move(game)
+    assert engine.last_depth >= 4
+    assert engine.positions_per_second > 100_000